@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""
+A trigram index over the child IOC.cfg files, for narrowing down the files
+that grep_more_ioc search has to read.
+
+Usage: python cfg_index.py [-h] [hutch]
+"""
+###############################################################################
+# %% Imports
+###############################################################################
+
+import argparse
+import os.path
+import re
+import sqlite3
+from array import array
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from constants import CACHE_DIR, CONFIG_DIR
+from grep_more_ioc import MAX_WORKERS, find_ioc, fix_dir
+
+try:
+    # sre_parse is deprecated and moved to re._parser in python 3.11
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+###############################################################################
+# %% Global settings
+###############################################################################
+
+# The trigram index of the child IOC.cfg files
+INDEX_FILE = os.path.join(CACHE_DIR, 'cfg_index.sqlite')
+
+# The posting list of each trigram is the packed ids of the files that have
+# it. Each file keeps its concatenated trigrams to update the postings when
+# it changes. Files that can't be decoded have no trigrams, so they
+# are always searched.
+_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    trigrams TEXT
+);
+CREATE TABLE IF NOT EXISTS postings (
+    trigram TEXT PRIMARY KEY,
+    file_ids BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+# array typecode of the packed file ids
+_ID_TYPE = 'q'
+# Rows per sqlite query, under the default variable limit
+_CHUNK = 500
+
+# Any subset of a pattern's trigrams still gives a superset of its matches,
+# this keeps the queries under the sqlite variable limit
+_MAX_QUERY_TRIGRAMS = 64
+
+_REPEATS = tuple(getattr(sre_parse, name) for name in
+                 ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+                 if hasattr(sre_parse, name))
+
+###############################################################################
+# %% Functions
+###############################################################################
+
+
+def trigrams(text: str) -> set[str]:
+    """Returns the lowercase trigrams of 'text'"""
+    text = text.lower()
+    return {text[i:i+3] for i in range(len(text) - 2)}
+
+
+def _required_trigrams(items) -> set[str]:
+    """
+    Returns the trigrams of the literal text that every match of the
+    parsed regex 'items' must contain.
+    """
+    grams = set()
+    run = []
+    for op, av in list(items) + [(None, None)]:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        # the literal run ends here, only use it if ascii so lowercasing
+        # can't change its length
+        text = ''.join(run)
+        if text.isascii():
+            grams.update(trigrams(text))
+        run = []
+        if op is sre_parse.SUBPATTERN:
+            grams.update(_required_trigrams(av[-1]))
+        elif op in _REPEATS and av[0] >= 1:
+            grams.update(_required_trigrams(av[2]))
+        elif op is sre_parse.BRANCH:
+            # only what all of the branches share is required
+            grams.update(set.intersection(*[_required_trigrams(b)
+                                            for b in av[1]]))
+    return grams
+
+
+def regex_query(patt: str) -> Optional[list[set[str]]]:
+    """
+    Converts a regex pattern to a trigram query. A file can only have a
+    match if it has all the trigrams of at least one of the alternatives.
+
+    Parameters
+    ----------
+    patt : str
+        The regex pattern.
+
+    Returns
+    -------
+    list[set[str]]
+        The trigram sets of the alternatives of 'patt'. None if 'patt' has
+        an alternative without literal text, meaning any file can match.
+    """
+    try:
+        items = list(sre_parse.parse(patt))
+    except (re.error, RecursionError):
+        return None
+    branches = [items]
+    # split top level alternations like 'IP|MOTOR' into separate queries
+    while len(branches) == 1 and len(branches[0]) == 1:
+        op, av = branches[0][0]
+        if op is sre_parse.BRANCH:
+            branches = [list(b) for b in av[1]]
+        elif op is sre_parse.SUBPATTERN:
+            branches = [list(av[-1])]
+        else:
+            break
+    query = [_required_trigrams(b) for b in branches]
+    if any(len(grams) == 0 for grams in query):
+        return None
+    return [set(sorted(grams)[:_MAX_QUERY_TRIGRAMS]) for grams in query]
+
+
+def _stat(file: str) -> Optional[tuple[int, int]]:
+    """Returns the (mtime_ns, size) of 'file', None if it doesn't exist"""
+    try:
+        result = os.stat(file)
+    except OSError:
+        return None
+    return result.st_mtime_ns, result.st_size
+
+
+def _read_trigrams(file: str) -> Optional[set[str]]:
+    """
+    Returns the trigrams of 'file' read as search_file reads it, None if
+    it can't be read as utf-8.
+    """
+    try:
+        with open(file, 'r', encoding='utf-8') as _f:
+            return trigrams(_f.read())
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+class CfgIndex:
+    """
+    A trigram -> file index of the child IOC.cfg files, stored in sqlite.
+
+    Files are only re-read by update when their mtime or size changes.
+    Files that are missing from the index are always search candidates,
+    so that the search still warns about missing IOC.cfg files.
+
+    Parameters
+    ----------
+    db_file : str, optional
+        The sqlite file of the index. The default is INDEX_FILE.
+    """
+
+    def __init__(self, db_file: str = None):
+        if db_file is None:
+            db_file = INDEX_FILE
+        os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        self.db_file = db_file
+        self._db = sqlite3.connect(db_file)
+        self._db.executescript(_INDEX_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Closes the sqlite connection"""
+        self._db.close()
+
+    def _files(self) -> dict[str, tuple[int, int, int, bool]]:
+        """Returns {path: (id, mtime_ns, size, indexed)} of all files"""
+        return {row[0]: row[1:] for row in self._db.execute(
+            'SELECT path, id, mtime_ns, size, trigrams IS NOT NULL'
+            ' FROM files')}
+
+    def _postings(self, grams: list[str]) -> dict[str, set[int]]:
+        """Returns the file ids of each of 'grams' that is in the index"""
+        grams = list(grams)
+        result = {}
+        for i in range(0, len(grams), _CHUNK):
+            chunk = grams[i:i+_CHUNK]
+            for gram, file_ids in self._db.execute(
+                    'SELECT trigram, file_ids FROM postings'
+                    f' WHERE trigram IN ({", ".join("?" * len(chunk))})',
+                    chunk):
+                result[gram] = set(array(_ID_TYPE, file_ids))
+        return result
+
+    def update(self, files: list[str]) -> dict[str, int]:
+        """
+        Brings the index up to date for 'files'. New and changed files are
+        read concurrently, files that no longer exist are removed.
+
+        Returns
+        -------
+        dict[str, int]
+            The number of 'updated', 'removed', 'missing' and 'unchanged'
+            files.
+        """
+        files = sorted(set(files))
+        known = self._files()
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            stats = dict(zip(files, executor.map(_stat, files)))
+            changed = [f for f in files if stats[f] is not None
+                       and (f not in known or known[f][1:3] != stats[f])]
+            new_grams = list(executor.map(_read_trigrams, changed))
+        removed = [f for f in files if stats[f] is None and f in known]
+        # {trigram: (file ids to add, file ids to remove)}
+        edits = defaultdict(lambda: (set(), set()))
+        with self._db:
+            for file in removed + [f for f in changed if f in known]:
+                file_id = known[file][0]
+                old_grams, = self._db.execute(
+                    'SELECT trigrams FROM files WHERE id = ?',
+                    (file_id,)).fetchone()
+                old_grams = old_grams or ''
+                for i in range(0, len(old_grams), 3):
+                    edits[old_grams[i:i+3]][1].add(file_id)
+            self._db.executemany('DELETE FROM files WHERE path = ?',
+                                 [(f,) for f in removed])
+            for file, grams in zip(changed, new_grams):
+                file_id = self._db.execute(
+                    'INSERT OR REPLACE INTO files'
+                    ' (id, path, mtime_ns, size, trigrams)'
+                    ' VALUES (?, ?, ?, ?, ?)',
+                    (known.get(file, (None,))[0], file, *stats[file],
+                     None if grams is None else ''.join(sorted(grams)))
+                ).lastrowid
+                for gram in grams or ():
+                    edits[gram][0].add(file_id)
+            self._write_postings(edits)
+        missing = sum(stats[f] is None for f in files)
+        return {'updated': len(changed), 'removed': len(removed),
+                'missing': missing - len(removed),
+                'unchanged': len(files) - len(changed) - missing}
+
+    def _write_postings(self, edits: dict[str, tuple[set[int], set[int]]]):
+        """Applies the (added, removed) file ids to each trigram's posting"""
+        postings = self._postings(edits)
+        rows = []
+        empty = []
+        for gram, (added, removed) in edits.items():
+            file_ids = postings.get(gram, set()).difference(removed) | added
+            if len(file_ids) == 0:
+                empty.append((gram,))
+                continue
+            rows.append((gram, array(_ID_TYPE, sorted(file_ids)).tobytes()))
+        self._db.executemany('INSERT OR REPLACE INTO postings'
+                             ' (trigram, file_ids) VALUES (?, ?)', rows)
+        self._db.executemany('DELETE FROM postings WHERE trigram = ?', empty)
+
+    def candidates(self, files: list[str], patt: str) -> set[str]:
+        """
+        Returns the files that may have a line matching the regex 'patt'.
+        The index should be updated for 'files' first.
+
+        Parameters
+        ----------
+        files : list[str]
+            The files to search.
+        patt : str
+            The regex pattern of the search.
+
+        Returns
+        -------
+        set[str]
+            The subset of 'files' that has to be searched.
+        """
+        files = set(files)
+        query = regex_query(patt)
+        if query is None:
+            return files
+        ids = {row[0]: path for path, row in self._files().items()
+               if path in files and row[3]}
+        # only the indexed files can be ruled out
+        result = files.difference(ids.values())
+        for grams in query:
+            postings = self._postings(grams)
+            if len(postings) < len(grams):
+                continue
+            matches = set.intersection(*postings.values())
+            result.update(ids[i] for i in matches if i in ids)
+        return result
+
+
+def child_cfgs(hutch: str) -> list[str]:
+    """Returns the child IOC.cfg path of every IOC in 'hutch'"""
+    data = find_ioc(hutch, '')
+    if data is None:
+        return []
+    return [f"{fix_dir(d['dir'])}{d['id']}.cfg" for d in data]
+
+###############################################################################
+# %% Arg Parser
+###############################################################################
+
+
+def build_parser():
+    """
+    Builds the parser for the index builder
+    """
+    parser = argparse.ArgumentParser(
+        prog='cfg_index',
+        description='Builds or updates the trigram index of the child'
+                    ' IOC.cfg files used by "grep_more_ioc search -i".')
+    parser.add_argument('hutch', type=str, nargs='?', default='all',
+                        help='3 letter hutch code to index, the default is'
+                        ' "all".\n'
+                        f'Valid arguments: "all" or the hutches with an'
+                        f' iocmanager.cfg\nin {CONFIG_DIR}')
+    return parser
+
+###############################################################################
+# %% Main
+###############################################################################
+
+
+def main():
+    """
+    Main entry point of the program.
+    """
+    args = build_parser().parse_args()
+    files = child_cfgs(args.hutch)
+    with CfgIndex() as index:
+        counts = index.update(files)
+    print(f'Indexed {len(files)} child IOC.cfg files in {INDEX_FILE}: '
+          + ', '.join(f'{n} {k}' for k, n in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
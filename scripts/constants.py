@@ -7,20 +7,95 @@ Constants used in grep_more_ioc and getPVAliases
 ###############################################################################
 
 import glob as gb
+import json
+import os.path
+import tempfile
+import time
 
 ###############################################################################
 # %% Constants
 ###############################################################################
 
-# Check the directories for the iocmanager config file
-VALID_HUTCH = sorted([d for d in gb.glob('/cds/group/pcds/pyps/config'
-                                         + '/*/')
-                      if gb.glob(d + 'iocmanager.cfg')])
-# Trim to 3 letter hutch code, include 'all' = '*'
-VALID_HUTCH = ['all'] + [s.rsplit(r'/', maxsplit=2)[-2] for s in VALID_HUTCH]
+# Root of the PCDS group area, override with PCDS_ROOT to run against
+# another tree, like the one made by ioc_fixtures
+PCDS_ROOT = os.environ.get('PCDS_ROOT', '/cds/group/pcds')
+
+# Directory holding a <hutch>/iocmanager.cfg for each hutch
+CONFIG_DIR = os.path.join(PCDS_ROOT, 'pyps', 'config')
+
+# Directory the short 'ioc/...' IOC dirs are relative to
+EPICS_DIR = os.path.join(PCDS_ROOT, 'epics')
+
+# Per-user cache for parsed iocmanager.cfg files, honors XDG_CACHE_HOME
+CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME',
+                                        os.path.expanduser('~/.cache')),
+                         'engineering_tools')
+
+# Seconds before the cached hutch list is rediscovered from CONFIG_DIR
+HUTCH_CACHE_TTL = 3600
 
 # Keys from iocmanager. Found in /cds/group/pcds/config/*/iocmanager/utils.py
 # Update this as needed
 DEF_IMGR_KEYS = ['procmgr_config', 'hosts', 'dir', 'id', 'cmd',
                  'flags', 'port', 'host', 'disable', 'history',
                  'delay', 'alias', 'hard']
+
+# Hutch list for this process, see get_valid_hutch
+_VALID_HUTCH = None
+
+###############################################################################
+# %% Functions
+###############################################################################
+
+
+def discover_hutches() -> list[str]:
+    """
+    Checks the directories in CONFIG_DIR for the iocmanager config file.
+    Returns 'all' followed by the hutch codes that have one.
+    """
+    hutch_dirs = sorted([d for d in gb.glob(CONFIG_DIR + '/*/')
+                         if os.path.isfile(d + 'iocmanager.cfg')])
+    # Trim to 3 letter hutch code, include 'all' = '*'
+    return ['all'] + [s.rsplit(r'/', maxsplit=2)[-2] for s in hutch_dirs]
+
+
+def get_valid_hutch(ttl: float = HUTCH_CACHE_TTL,
+                    refresh: bool = False) -> list[str]:
+    """
+    Returns the valid hutch codes, including 'all'.
+
+    The directory walk in discover_hutches is slow over NFS, so it only
+    runs on first use and its result is cached in CACHE_DIR for 'ttl'
+    seconds. With 'refresh', the hutches are always rediscovered.
+    """
+    global _VALID_HUTCH
+    if _VALID_HUTCH is not None and not refresh:
+        return _VALID_HUTCH
+    cache_file = os.path.join(CACHE_DIR, 'valid_hutch.json')
+    try:
+        if not refresh and time.time() - os.path.getmtime(cache_file) < ttl:
+            with open(cache_file, 'r', encoding='utf-8') as _f:
+                cache = json.load(_f)
+            if cache['config_dir'] == CONFIG_DIR:
+                _VALID_HUTCH = cache['hutches']
+                return _VALID_HUTCH
+    except (OSError, ValueError, KeyError):
+        pass
+    _VALID_HUTCH = discover_hutches()
+    # Best effort, a failed write only means rediscovering next time
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8',
+                                         dir=CACHE_DIR, delete=False) as _f:
+            json.dump({'config_dir': CONFIG_DIR, 'hutches': _VALID_HUTCH}, _f)
+        os.replace(_f.name, cache_file)
+    except OSError:
+        pass
+    return _VALID_HUTCH
+
+
+def __getattr__(name: str):
+    """Keeps VALID_HUTCH available as a lazily discovered constant"""
+    if name == 'VALID_HUTCH':
+        return get_valid_hutch()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -8,15 +8,39 @@ A script for gathering alias associations from an IOC
 
 import argparse
 import copy
+import gzip
+import io
 import os.path
 import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Union
 
 from colorama import Fore, Style
-from constants import VALID_HUTCH
-from grep_more_ioc import (clean_ansi, find_ioc, find_parent_ioc, fix_dir,
-                           search_file, simple_prompt)
-from prettytable import PrettyTable
+from constants import CONFIG_DIR
+from grep_more_ioc import (MAX_WORKERS, ParentResolver, clean_ansi, find_ioc,
+                           fix_dir, simple_prompt)
+from st_cmd_loader import load_st_cmd
+from stage_profile import add_profile_arguments, profiled, stage
+from term_table import TermTable
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+###############################################################################
+# %% Global settings
+###############################################################################
+
+# Parsed alias.db files, as {path: ((mtime_ns, size), (text, template))}
+_ALIAS_TEMPLATES = {}
+# Records or aliases with these can't be put into a parsed alias template
+_UNSAFE_SUBSTITUTION = re.compile(r'[\s",\\]')
+
+# The file the aliases are saved to, and its suffix for each compression
+DUMP_FILE = 'record_alias_dump.txt'
+COMPRESSIONS = {'gzip': '.gz', 'zstd': '.zst'}
 
 ###############################################################################
 # %% Functions
@@ -57,23 +81,24 @@ def request_dir(prompt: str,
 
 
 def build_table(input_data: list[dict], columns: list[str] = None,
-                **kwargs) -> PrettyTable:
+                align: str = 'c') -> TermTable:
     """
-    Build a prettytable from a list of dicts/JSON.
+    Build a table from a list of dicts/JSON, printed like a PrettyTable.
     input_data must be a list(dict)
     Parameters
     ----------
     input_data: list[dict]
-        The data to generate a PrettyTable from.
+        The data to generate a table from.
     columns: list, optional
-        Columns for the PrettyTable headers. The default is None.
-    **kwargs:
-        kwargs to pass tohe PrettyTable() for extra customization.
+        Columns for the table headers. The default is None.
+    align: str, optional
+        'l', 'c' or 'r' alignment of the columns. The default is 'c'.
 
     Returns
     -------
-    PrettyTable
-        PrettyTable object ready for terminal printing.
+    TermTable
+        Table ready for terminal printing, use its print() method to page
+        long tables.
 
     """
 
@@ -85,20 +110,16 @@ def build_table(input_data: list[dict], columns: list[str] = None,
         cols = sorted(list(set(col_list)))
     else:
         cols = columns
-    # initialize the table
-    _tbl = PrettyTable()
-    # add the headers
-    for c in cols:
-        _tbl.add_column(c, [], **kwargs)
-    # add the data, strip ANSI color from color headers if any
-    for _d in input_data:
-        _tbl.add_row([_d.get(clean_ansi(c), '') for c in cols])
-    return _tbl
+    # strip ANSI color from color headers if any
+    keys = [clean_ansi(c) for c in cols]
+    return TermTable(cols, ([_d.get(k, '') for k in keys]
+                            for _d in input_data), align=align)
 
 
 def acquire_aliases(dir_path: str, ioc: str) -> list[dict]:
     """
-    Scans the st.cmd of the child IOC for the main PV aliases.
+    Scans the st.cmd of the child IOC for the main PV aliases, following
+    its includes and macros, see st_cmd_loader.
     Returns a list of dicts for the associations. This is the
     top level PV name.
     E.g. LM1K2:MCS2:01:m1 <--> LM2K2:INJ_MP1_MR1
@@ -121,11 +142,65 @@ def acquire_aliases(dir_path: str, ioc: str) -> list[dict]:
     if os.path.exists(_f) is False:
         print(f'{_f} does not exist')
         return ''
-    search_result = search_file(file=_f, patt=r'db/alias.db')
-    _temp = re.findall(r'"RECORD=.*"', search_result)
-    output = [re.sub(r'\"|\)|RECORD\=|ALIAS\=', '', s).split(',')
-              for s in _temp]
-    return [{'record': s[0], 'alias': s[-1]} for s in output]
+    with stage('st.cmd'):
+        return [{'record': load.macros['RECORD'],
+                 'alias': load.macros['ALIAS']}
+                for load in load_st_cmd(_f)
+                if load.file.endswith('db/alias.db')
+                and 'RECORD' in load.macros and 'ALIAS' in load.macros]
+
+
+def load_alias_template(parent_release: str) -> Optional[tuple[str, list]]:
+    """
+    Reads the parent db/alias.db and parses it into a template, keeping
+    the result until the file's mtime or size changes.
+
+    Parameters
+    ----------
+    parent_release : str
+        Path to the parent IOC's release.
+
+    Returns
+    -------
+    tuple[str, list[list[str]]]
+        The alias.db text with the 'alias(' wrapping removed, and the
+        template: the fields of each alias with the $(RECORD) and $(ALIAS)
+        macros left in. None if the file does not exist.
+    """
+    _target_file = f'{parent_release}/db/alias.db'
+    try:
+        _stat = os.stat(_target_file)
+    except OSError:
+        return None
+    key = (_stat.st_mtime_ns, _stat.st_size)
+    cached = _ALIAS_TEMPLATES.get(_target_file)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    with open(_target_file, encoding='utf-8') as _f:
+        _temp = _f.read()
+    # remove the 'alias' prefix from the tuple
+    _temp = re.sub(r'alias\(| +', '', _temp)
+    _temp = re.sub(r'\)\s*\n', '\n', _temp)
+    template = [s.replace('"', '').split(',') for s in _temp.split()]
+    _ALIAS_TEMPLATES[_target_file] = (key, (_temp, template))
+    return _temp, template
+
+
+def expand_alias_template(template: tuple[str, list], record: str,
+                          alias: str) -> list[list[str]]:
+    """
+    Substitutes a record and its alias into a template from
+    load_alias_template.
+    """
+    _temp, fields = template
+    if _UNSAFE_SUBSTITUTION.search(record + alias) is not None:
+        # these change how the substituted text is split, so do it the
+        # slow way on the whole text
+        _temp = re.sub(r'\$\(RECORD\)', record, _temp)
+        _temp = re.sub(r'\$\(ALIAS\)', alias, _temp)
+        return [s.replace('"', '').split(',') for s in _temp.split()]
+    return [[f.replace('$(RECORD)', record).replace('$(ALIAS)', alias)
+             for f in field] for field in fields]
 
 
 def process_alias_template(parent_release: str, record: str,
@@ -151,21 +226,179 @@ def process_alias_template(parent_release: str, record: str,
         DESCRIPTION.
 
     """
+    with stage('alias template'):
+        template = load_alias_template(parent_release)
+        if template is None:
+            print(f'{parent_release} does not exist')
+            return None
+        return expand_alias_template(template, record, alias)
 
-    _target_file = f'{parent_release}/db/alias.db'
-    if os.path.exists(_target_file):
-        with open(_target_file, encoding='utf-8') as _f:
-            _temp = _f.read()
-    else:
-        print(f'{parent_release} does not exist')
-        return None
-    # remove the 'alias' prefix from the tuple
-    _temp = re.sub(r'alias\(| +', '', _temp)
-    _temp = re.sub(r'\)\s*\n', '\n', _temp)
-    # then make the substitutions
-    _temp = re.sub(r'\$\(RECORD\)', record, _temp)
-    _temp = re.sub(r'\$\(ALIAS\)', alias, _temp)
-    return [s.replace('"', '').split(',') for s in _temp.split()]
+
+def process_alias_templates(parent_release: str,
+                            alias_dicts: list[dict]) -> list[list[str]]:
+    """
+    process_alias_template for all the record <--> alias dicts from
+    acquire_aliases at once, reading the parent db/alias.db only once.
+
+    Returns
+    -------
+    list[list[str]]
+        The process_alias_template result of each dict, in order. None if
+        the parent's alias.db does not exist.
+    """
+    with stage('alias template'):
+        template = load_alias_template(parent_release)
+        if template is None:
+            print(f'{parent_release} does not exist')
+            return None
+        return [expand_alias_template(template, a['record'], a['alias'])
+                for a in alias_dicts]
+
+
+def format_alias_chunk(alias_list: list[list[str]]) -> str:
+    """
+    Formats the PV <--> alias pairs from process_alias_template as they
+    are saved in record_alias_dump.txt, padded for 61 char record names.
+    """
+    return '\n'.join([f"{al[0]:<61}{al[-1]:<61}" for al in alias_list])
+
+
+class AliasDumpWriter:
+    """
+    Writes the formatted PV <--> alias chunks to the record_alias_dump.txt
+    of a directory as they are accepted, flushing each one, so only one
+    chunk is held in memory and an interrupted session keeps what was
+    already saved. The chunks are separated by newlines.
+
+    Parameters
+    ----------
+    dest : str or callable
+        Directory to save to, created if needed. If callable, it is called
+        to get the directory when the first chunk is written, so nothing is
+        asked for or created unless there is something to save.
+    compression : str, optional
+        'gzip' or 'zstd' to compress the file, which gets a .gz or .zst
+        suffix. The default is None, plain text.
+    """
+
+    def __init__(self, dest: Union[str, Callable[[], str]],
+                 compression: str = None):
+        if compression is not None and compression not in COMPRESSIONS:
+            raise ValueError(f'Unknown compression {compression!r}, choose'
+                             f' from {", ".join(COMPRESSIONS)}')
+        if compression == 'zstd' and zstandard is None:
+            raise ValueError('zstd compression needs the zstandard package')
+        self._dest = dest
+        self.compression = compression
+        self.file = None
+        self.chunks = 0
+        self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _open(self):
+        dest = self._dest() if callable(self._dest) else self._dest
+        os.makedirs(dest, exist_ok=True)
+        self.file = os.path.join(
+            dest, DUMP_FILE + COMPRESSIONS.get(self.compression, ''))
+        if self.compression == 'gzip':
+            self._f = gzip.open(self.file, 'wt', encoding='utf-8')
+        elif self.compression == 'zstd':
+            self._f = io.TextIOWrapper(
+                zstandard.ZstdCompressor().stream_writer(
+                    open(self.file, 'wb')), encoding='utf-8')
+        else:
+            self._f = open(self.file, 'w', encoding='utf-8')
+
+    def write(self, chunk: str):
+        """Appends a chunk from format_alias_chunk to the file"""
+        with stage('write'):
+            if self._f is None:
+                self._open()
+            if self.chunks > 0:
+                self._f.write('\n')
+            self._f.write(chunk)
+            self._f.flush()
+        self.chunks += 1
+
+    def close(self):
+        """Closes the file, if any chunk was written"""
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+def dump_aliases(ioc: dict, dest: str = None,
+                 compression: str = None) -> dict:
+    """
+    Gathers all the PV aliases of a child IOC without prompting, the same
+    as saving all sets in the interactive mode, and writes them to
+    'dest'/record_alias_dump.txt.
+
+    Parameters
+    ----------
+    ioc : dict
+        The find_ioc record of the child IOC, with its 'parent_ioc'.
+    dest : str, optional
+        Directory to save the dump to, created if needed. The default is
+        None, for a dry run.
+    compression : str, optional
+        Compression of the dump, see AliasDumpWriter. The default is None.
+
+    Returns
+    -------
+    dict
+        Summary of the dump: the IOC 'id', number of 'records' and 'PVs',
+        the 'file' written and the 'status'.
+    """
+    summary = {'id': ioc['id'], 'records': 0, 'PVs': 0, 'file': '',
+               'status': ''}
+    alias_dicts = acquire_aliases(ioc['dir'], ioc['id'])
+    if len(alias_dicts) == 0:
+        summary['status'] = 'No aliases in st.cmd'
+        return summary
+    summary['records'] = len(alias_dicts)
+    alias_lists = process_alias_templates(ioc['parent_ioc'], alias_dicts)
+    if alias_lists is None:
+        summary['status'] = 'No parent alias.db'
+        return summary
+    summary['PVs'] = sum(len(alias_list) for alias_list in alias_lists)
+    if dest is None:
+        summary['status'] = 'Dry run'
+        return summary
+    with AliasDumpWriter(dest, compression) as writer:
+        for alias_list in alias_lists:
+            writer.write(format_alias_chunk(alias_list))
+    summary['file'] = writer.file
+    summary['status'] = 'Saved'
+    return summary
+
+
+def batch_dump_aliases(data: list[dict], base_dir: str, dry_run: bool = False,
+                       compression: str = None) -> list[dict]:
+    """
+    Runs dump_aliases for all of the enabled child IOCs in 'data' on up to
+    MAX_WORKERS threads. Each IOC is saved to 'base_dir'/{id}_alias, like
+    the interactive default.
+
+    Returns
+    -------
+    list[dict]
+        The dump_aliases summary of each enabled IOC, in order.
+    """
+    iocs = [_ioc for _ioc in data if _ioc.get('disable') is not True]
+    dests = [None if dry_run else os.path.join(base_dir, f"{_ioc['id']}_alias")
+             for _ioc in iocs]
+    if len(iocs) == 0:
+        return []
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS,
+                                            len(iocs))) as executor:
+        return list(executor.map(dump_aliases, iocs, dests,
+                                 [compression] * len(iocs)))
 
 
 def show_temp_table(input_data: list, col_list: list):
@@ -184,7 +417,7 @@ def show_temp_table(input_data: list, col_list: list):
 
     # prompt user for initial confirmation
     print(f'{Fore.LIGHTGREEN_EX}Found the following:{Style.RESET_ALL}')
-    print(build_table(temp, col_list))
+    build_table(temp, col_list).print()
 
 
 ###############################################################################
@@ -206,11 +439,25 @@ parser.add_argument('patt', type=str,
 parser.add_argument('hutch', type=str,
                     help='3 letter hutch code. Use "all" to search through '
                     'all hutches.\n'
-                    f'Valid arguments: {", ".join(VALID_HUTCH)}')
+                    f'Valid arguments: "all" or the hutches with an'
+                    f' iocmanager.cfg\nin {CONFIG_DIR}')
 parser.add_argument('-d', '--dry_run', action='store_true',
                     default=False,
                     help="Forces a dry run for the script. "
                     "No files are saved.")
+parser.add_argument('-b', '--batch', action='store_true',
+                    default=False,
+                    help="Saves all the aliases of every enabled child IOC "
+                    "without prompting,\nto OUTPUT_DIR/{ioc}_alias/"
+                    "record_alias_dump.txt, and prints a summary.")
+parser.add_argument('-o', '--output_dir', type=str, default=os.getcwd(),
+                    help="Base directory for the --batch dumps. "
+                    "Default is the current directory.")
+parser.add_argument('-z', '--compress', type=str, default=None,
+                    choices=list(COMPRESSIONS),
+                    help="Compresses record_alias_dump.txt with gzip or zstd."
+                    "\nzstd needs the zstandard package.")
+add_profile_arguments(parser)
 
 ###############################################################################
 # %% Main
@@ -223,6 +470,16 @@ def main():
     """
     # parse args
     args = parser.parse_args()
+    if (args.compress == 'zstd') & (zstandard is None):
+        parser.error('zstd compression needs the zstandard package')
+    with profiled(args.profile, args.profile_out, name='getPVAliases'):
+        run(args)
+
+
+def run(args: argparse.Namespace):
+    """
+    Gathers the PV aliases with the parsed command line arguments, see main.
+    """
     # search ioc_cfg and build the dataset
     data = find_ioc(args.hutch, args.patt)
     if data is None:
@@ -232,8 +489,10 @@ def main():
         sys.exit()
 
     # find the parent directories
-    for _d in data:
-        _d['parent_ioc'] = find_parent_ioc(_d['id'], _d['dir'])
+    releases = (ParentResolver(persistent=True)
+                .resolve_all([(_d['id'], _d['dir']) for _d in data]))
+    for _d, release in zip(data, releases):
+        _d['parent_ioc'] = release
 
     # Hard code the column order for the find_ioc output
     column_list = ['id', 'dir',
@@ -245,105 +504,119 @@ def main():
         column_list = ['hutch'] + column_list
     show_temp_table(data, column_list)
 
+    if args.batch is True:
+        print(f'{Fore.RED}Skipping disabled child IOCs{Style.RESET_ALL}')
+        summary = batch_dump_aliases(data, args.output_dir,
+                                     dry_run=args.dry_run,
+                                     compression=args.compress)
+        print(f'{Fore.LIGHTGREEN_EX}Batch summary:{Style.RESET_ALL}')
+        build_table(summary, ['id', 'records', 'PVs', 'status', 'file'],
+                    align='l').print()
+        sys.exit()
+
     ans = simple_prompt('Proceed? (Y/n): ', default='Y')
     # Abort if user gets cold feet
     if ans is False:
         sys.exit()
     print(f'{Fore.RED}Skipping disabled child IOCs{Style.RESET_ALL}')
 
-    # initialize the final output to write to file
-    final_output = []
-
-    # iterate through all the child ioc dictionaries
-    for _ioc in data:
-        if _ioc.get('disable') is not True:
-            # first acquire the base alias dictionary
-            alias_dicts = acquire_aliases(_ioc['dir'], _ioc['id'])
-            # show the record aliases to the user
-            print(Fore.LIGHTGREEN_EX
-                  + 'The following substitutions were found in the st.cmd:'
-                  + Style.RESET_ALL)
-            print(build_table(alias_dicts, ['record', 'alias'], align='l'))
-            # optional skip for all resulting PV aliases
-            save_all = (simple_prompt(
-                'Do you want to save all resulting PV <--> alias '
-                + 'associations found in this st.cmd?\n'
-                + 'This will append '
-                + Fore.LIGHTYELLOW_EX
-                + f'{len(alias_dicts)}'
-                + Style.RESET_ALL
-                + ' record <--> alias sets to your final output (y/N): '))
-
-            # initialize flags
-            skip_all = None
-            show_pvs = None
-            save_data = None
-
-            # initialize a default file directory for dumping aliases
-            default_dest = os.getcwd() + '/' + f"{_ioc['id']}_alias"
-            # now iterate through the alias dicts for PV alias substitutions
-            for i, a in enumerate(alias_dicts):
-                # then iterate through all the PVs from root PV
-                alias_list = process_alias_template(_ioc['parent_ioc'],
-                                                    a['record'], a['alias'])
-                # capture output based on 61 char max record name
-                _chunk = [f"{al[0]:<61}{al[-1]:<61}" for al in alias_list]
-                # Demonstrate PV aliases on first iteration
-                if (i == 0) | ((show_pvs is True) & (skip_all is False)):
-                    # show output to user, building a temp list of dict first
-                    _temp = [{'PV': al[0], 'Alias': al[-1]}
-                             for al in alias_list]
-                    print(Fore.LIGHTGREEN_EX
-                          + 'The following PV aliases are built:'
-                          + Style.RESET_ALL)
-                    print(build_table(_temp, ['PV', 'Alias'], align='l'))
-                    del _temp
-
-                # If doing a dry run, skip this block
-                if args.dry_run is False:
-                    # Respect the skip flag
-                    if skip_all is True:
-                        continue
-                    # ask user for input
-                    if save_all is False:
-                        save_data = (simple_prompt(
-                            'Would you like to save this PV set? (y/N): '))
-                        if save_data is True:
-                            # give the user an option to be lazy again
-                            save_all = (simple_prompt(
-                                        'Would you like to apply this for'
-                                        + ' ALL remaining sets? (y/N): '))
-                            # Avoid some terminal spam using these flags
-                            show_pvs = not save_all
-                            skip_all = False
-                        if save_data is False:
-                            skip_all = (simple_prompt(
-                                'Skip all further substitutions? (Y/n): ',
-                                default='Y'))
-                            # Avoid some terminal spam using this flag
-                            show_pvs = not skip_all
-                            continue
-                else:
-                    # Set flags to surpress prompts during dry run
-                    save_data = False
-                if (save_data or save_all) and (args.dry_run is False):
-                    final_output.append('\n'.join(_chunk))
-                del _chunk
-
-    # write to file, else do nothing
-    if (len(final_output) > 0) & (args.dry_run is False):
-        dest = request_dir('Choose base file destination',
-                           default_dest)
+    def choose_dest() -> str:
+        """
+        Asks for the destination once the first set is saved, defaulting
+        to the directory named after the last child IOC, as it did when
+        all the sets were saved at the end
+        """
+        last_id = [_ioc['id'] for _ioc in data
+                   if _ioc.get('disable') is not True][-1]
+        default_dest = os.getcwd() + '/' + f'{last_id}_alias'
+        dest = request_dir('Choose base file destination', default_dest)
         # make sure the destination exists and mkdir if it doesn't
         if os.path.exists(dest) is False:
             print(Fore.LIGHTBLUE_EX
                   + f'Making directory: {dest}' + Style.RESET_ALL)
-            os.mkdir(dest)
-        file_dest = dest + "/record_alias_dump.txt"
-        with open(file_dest, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(final_output))
-        default_dest = dest
-    del final_output
+        return dest
+
+    # accepted sets are written as they come, and kept if interrupted
+    with AliasDumpWriter(choose_dest, args.compress) as writer:
+        # iterate through all the child ioc dictionaries
+        for _ioc in data:
+            if _ioc.get('disable') is not True:
+                # first acquire the base alias dictionary
+                alias_dicts = acquire_aliases(_ioc['dir'], _ioc['id'])
+                # show the record aliases to the user
+                print(Fore.LIGHTGREEN_EX
+                      + 'The following substitutions were found in the st.cmd:'
+                      + Style.RESET_ALL)
+                build_table(alias_dicts, ['record', 'alias'],
+                            align='l').print()
+                # optional skip for all resulting PV aliases
+                save_all = (simple_prompt(
+                    'Do you want to save all resulting PV <--> alias '
+                    + 'associations found in this st.cmd?\n'
+                    + 'This will append '
+                    + Fore.LIGHTYELLOW_EX
+                    + f'{len(alias_dicts)}'
+                    + Style.RESET_ALL
+                    + ' record <--> alias sets to your final output (y/N): '))
+
+                # initialize flags
+                skip_all = None
+                show_pvs = None
+                save_data = None
+
+                # now iterate through the alias dicts for PV substitutions
+                for i, a in enumerate(alias_dicts):
+                    # then iterate through all the PVs from root PV
+                    alias_list = process_alias_template(
+                        _ioc['parent_ioc'], a['record'], a['alias'])
+                    # capture output based on 61 char max record name
+                    _chunk = format_alias_chunk(alias_list)
+                    # Demonstrate PV aliases on first iteration
+                    if (i == 0) | ((show_pvs is True) & (skip_all is False)):
+                        # show output to user, building a temp list first
+                        _temp = [{'PV': al[0], 'Alias': al[-1]}
+                                 for al in alias_list]
+                        print(Fore.LIGHTGREEN_EX
+                              + 'The following PV aliases are built:'
+                              + Style.RESET_ALL)
+                        build_table(_temp, ['PV', 'Alias'], align='l').print()
+                        del _temp
+
+                    # If doing a dry run, skip this block
+                    if args.dry_run is False:
+                        # Respect the skip flag
+                        if skip_all is True:
+                            continue
+                        # ask user for input
+                        if save_all is False:
+                            save_data = (simple_prompt(
+                                'Would you like to save this PV set? (y/N): '))
+                            if save_data is True:
+                                # give the user an option to be lazy again
+                                save_all = (simple_prompt(
+                                            'Would you like to apply this for'
+                                            + ' ALL remaining sets? (y/N): '))
+                                # Avoid some terminal spam using these flags
+                                show_pvs = not save_all
+                                skip_all = False
+                            if save_data is False:
+                                skip_all = (simple_prompt(
+                                    'Skip all further substitutions? (Y/n): ',
+                                    default='Y'))
+                                # Avoid some terminal spam using this flag
+                                show_pvs = not skip_all
+                                continue
+                    else:
+                        # Set flags to surpress prompts during dry run
+                        save_data = False
+                    if (save_data or save_all) and (args.dry_run is False):
+                        writer.write(_chunk)
+                    del _chunk
+
+    if writer.file is not None:
+        print(Fore.LIGHTGREEN_EX
+              + f'Saved {writer.chunks} PV sets to {writer.file}'
+              + Style.RESET_ALL)
 
     sys.exit()
 
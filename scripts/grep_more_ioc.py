@@ -7,31 +7,193 @@ A tool for enhancing the grep_ioc CLI tool for ECS-Delivery team
 ###############################################################################
 
 import argparse
+import ast
+import csv
 import glob as gb
 import json
+import mmap
 import os.path
 import re
+import stat
 import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import groupby
+from numbers import Real
 from shutil import get_terminal_size
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-import pandas as pd
 from colorama import Fore, Style
-from constants import DEF_IMGR_KEYS, VALID_HUTCH
+from constants import (CACHE_DIR, CONFIG_DIR, DEF_IMGR_KEYS, EPICS_DIR,
+                       get_valid_hutch)
+from stage_profile import add_profile_arguments, profiled, stage, timed_iter
+
+# pandas is slow to import, so it is only loaded to render a DataFrame
+if TYPE_CHECKING:
+    import pandas as pd
 
 ###############################################################################
 # %% Global settings
 ###############################################################################
-# Change max rows displayed to prevent truncating the dataframe
-# We'll assume 1000 rows as an upper limit
 
-pd.set_option("display.max_rows", 1000)
+# Parsed procmgr_config entries per iocmanager.cfg path, kept for the
+# lifetime of the process as {path: (mtime_ns, size, entries)}
+_PROCMGR_CACHE = {}
+# Bump when the parsed format changes to invalidate the on-disk caches
+_PROCMGR_CACHE_VERSION = 3
+
+# Tokens of the pseudo-python procmgr_config literal in iocmanager.cfg
+_PROCMGR_START = re.compile(r'^procmgr_config\s*=\s*(?=\[)', re.MULTILINE)
+_PROCMGR_TOKENS = re.compile(r"""
+    (?:\s+|\#[^\n]*)*
+    (?:(?P<str>'(?:[^'\\\n]|\\.)*'|"(?:[^"\\\n]|\\.)*")
+  | (?P<num>[-+]?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)
+  | (?P<name>[A-Za-z_]\w*)
+  | (?P<punct>[\[\]{}:,])
+  | (?P<error>.)
+  | (?P<end>$))
+""", re.VERBOSE | re.DOTALL)
+_PROCMGR_NAMES = {'True': True, 'False': False, 'None': None}
+
+# Any non-ASCII byte, searched for in place without copying an mmap
+_NON_ASCII = re.compile(rb'[\x80-\xff]')
+
+# Upper bound on the files read concurrently by find_ioc and search_files
+MAX_WORKERS = 8
+
+# Output formats of grep_more_ioc, 'table' being the DataFrame print
+OUTPUT_FORMATS = ['table', 'jsonl', 'csv', 'tsv']
+# Columns of the jsonl/csv/tsv output, in order
+FORMAT_COLUMNS = (['hutch']
+                  + [k for k in DEF_IMGR_KEYS
+                     if k not in ('procmgr_config', 'hosts')])
+
 
 ###############################################################################
 # %% Functions
 ###############################################################################
 
 
+class SearchPattern:
+    """
+    A search_file regex pattern, compiled once for scanning many files.
+
+    Besides the str regex, ASCII patterns get an equivalent multiline bytes
+    regex for scanning memory-mapped files. Patterns anchored to the start
+    or end of the whole string can't be scanned across lines and only get
+    the str regex.
+    """
+
+    def __init__(self, patt: str):
+        self.regex = re.compile(patt)
+        self.bregex = None
+        if patt.isascii() and not re.search(r'\\[AZ]', patt):
+            try:
+                self.bregex = re.compile(patt.encode('ascii'), re.MULTILINE)
+            except re.error:
+                pass
+        # Lookarounds and inline flags can see past the line, so their
+        # matches are always confirmed against the line itself
+        self.confirm = '(?' in patt
+        # Classes and escapes that match differently in bytes and str on
+        # non-ASCII text
+        self.ascii_only = (re.search(r'\\[wWdDsSbBx0-7]|\.|\[\^|\(\?',
+                                     patt) is not None)
+
+    def usable_on(self, data: mmap.mmap) -> bool:
+        """
+        Whether the bytes regex gives the same lines as reading 'data'
+        as text, which also translates '\\r' line endings.
+        """
+        return (self.bregex is not None and data.find(b'\r') == -1
+                and not (self.ascii_only
+                         and _NON_ASCII.search(data) is not None))
+
+
+def _scan_lines(file: str, pattern: SearchPattern):
+    """
+    Yields each line of 'file' that the pattern matches.
+
+    Candidate lines are found by running the bytes regex over the
+    memory-mapped file, so non-matching lines are never decoded.
+    Candidates whose match runs past the end of the line are confirmed
+    with the str regex to keep the per-line semantics.
+    """
+    regex = pattern.regex
+    with open(file, 'rb') as _f:
+        size = os.fstat(_f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(_f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            text_only = not pattern.usable_on(data)
+            pos = 0 if not text_only else size
+            while pos < size:
+                match = pattern.bregex.search(data, pos)
+                if match is None:
+                    break
+                # expand the match to the line that holds it
+                start = data.rfind(b'\n', 0, match.start()) + 1
+                if start >= size:
+                    break
+                end = data.find(b'\n', match.start())
+                end = size if end == -1 else end
+                pos = end + 1
+                line = data[start:pos].decode('utf-8')
+                if ((match.end() <= end and not pattern.confirm)
+                        or regex.search(line)):
+                    yield line
+    if text_only:
+        with open(file, 'r', encoding='utf-8') as _f:
+            for line in _f:
+                if regex.search(line):
+                    yield line
+
+
+def scan_file(file: str, pattern: SearchPattern,
+              result_only: bool = False,
+              color_wrap: Fore = None) -> Optional[list[str]]:
+    """
+    Searches a file with a compiled SearchPattern.
+
+    Parameters
+    ----------
+    file: str
+        The file to read and search. Encoding must be utf-8
+    pattern: SearchPattern
+        The compiled regex pattern to search for.
+    result_only: str, optional
+        Whether to return only the re.findall result instead of
+        the whole line. The default is False.
+    color_wrap: Fore, optional
+        Color wrapping using Colorama.Fore. The default is None.
+
+    Returns
+    -------
+    list[str]
+        The formatted matching lines, or None if "file" does not exist.
+    """
+    color = ''
+    reset = ''
+    if color_wrap is not None:
+        color = color_wrap
+        reset = Style.RESET_ALL
+    if os.path.isfile(file) is False:
+        return None
+    output = []
+    template = color + r'\g<0>' + reset
+    for line in _scan_lines(file, pattern):
+        if result_only:
+            # only output the matches with colors wrapped
+            # make sure to reformat into a single str
+            _temp = ' '.join([color + match + reset
+                             for match in pattern.regex.findall(line)])
+            output.append(_temp+'\n')
+        else:
+            output.append(pattern.regex.sub(template, line))
+    return output
+
+
 def search_file(*, file: str, output: list = None,
                 patt: str = None, prefix: str = '',
                 result_only: bool = False,
@@ -66,27 +228,36 @@ def search_file(*, file: str, output: list = None,
     """
     if output is None:
         output = []
-    color = ''
-    reset = ''
-    if color_wrap is not None:
-        color = color_wrap
-        reset = Style.RESET_ALL
-    if os.path.isfile(file) is False:
+    result = scan_file(file, SearchPattern(patt), result_only=result_only,
+                       color_wrap=color_wrap)
+    if result is None:
         if not quiet:
             print(f'{file} does not exist')
         return ''
-    with open(file, 'r', encoding='utf-8') as _f:
-        for line in _f.readlines():
-            if re.search(patt, line):
-                if result_only:
-                    # only output the matches with colors wrapped
-                    # make sure to reformat into a single str
-                    _temp = ' '.join([color + match + reset
-                                     for match in re.findall(patt, line)])
-                    output.append(_temp+'\n')
-                else:
-                    output.append(re.sub(patt, color + r'\g<0>' + reset, line))
-        return prefix + prefix.join(output)
+    output.extend(result)
+    return prefix + prefix.join(output)
+
+
+def search_files(files: list[str], patt: str, result_only: bool = False,
+                 color_wrap: Fore = None) -> list[Optional[list[str]]]:
+    """
+    Searches many files for the same pattern. The pattern is compiled
+    once and the files are scanned concurrently on up to MAX_WORKERS
+    threads, see scan_file.
+
+    Returns
+    -------
+    list[list[str]]
+        The scan_file result of each file, in the same order as 'files'.
+    """
+    if len(files) == 0:
+        return []
+    scan = partial(scan_file, pattern=SearchPattern(patt),
+                   result_only=result_only, color_wrap=color_wrap)
+    with stage('search'), \
+            ThreadPoolExecutor(max_workers=min(MAX_WORKERS,
+                                               len(files))) as executor:
+        return list(executor.map(scan, files))
 
 
 def search_procmgr(*, file: str, patt: str = None, output: list = None,
@@ -153,7 +324,8 @@ def print_skip_comments(file: str):
 def simple_prompt(prompt: str, default: str = 'N'):
     """Simple yes/no prompt which defaults to No"""
     while True:
-        p = input(prompt).strip().lower()
+        with stage('prompt'):
+            p = input(prompt).strip().lower()
         if p in ['']:
             p = default.lower()
         if p[0] == 'y':
@@ -232,10 +404,313 @@ def fix_json(raw_data: str, keys: list[str] = None) -> list[str]:
     return result
 
 
-def find_ioc(hutch: str = None, patt: str = None,
-             valid_hutch: list[str] = VALID_HUTCH) -> list[dict]:
+def _procmgr_cache_file(file: str) -> str:
+    """Path of the on-disk cache for an iocmanager.cfg file."""
+    hutch = os.path.basename(os.path.dirname(os.path.abspath(file)))
+    return os.path.join(CACHE_DIR, 'iocmanager', f'{hutch}.json')
+
+
+def _read_procmgr_cache(file: str, mtime_ns: int, size: int) -> list:
     """
-    A pythonic grep_ioc for gathering IOC details from the cfg file
+    Returns the cached entries for 'file' if the on-disk cache matches
+    its current mtime and size, otherwise None.
+    """
+    try:
+        with open(_procmgr_cache_file(file), 'r', encoding='utf-8') as _f:
+            cache = json.load(_f)
+    except (OSError, ValueError):
+        return None
+    if (cache.get('version') != _PROCMGR_CACHE_VERSION
+            or cache.get('file') != os.path.abspath(file)
+            or cache.get('mtime_ns') != mtime_ns
+            or cache.get('size') != size):
+        return None
+    return [tuple(entry) for entry in cache['entries']]
+
+
+def _write_procmgr_cache(file: str, mtime_ns: int, size: int,
+                         entries: list):
+    """
+    Atomically writes the parsed entries to the on-disk cache.
+    The cache is best effort, so failures are silently ignored.
+    """
+    cache_file = _procmgr_cache_file(file)
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8',
+                                         dir=os.path.dirname(cache_file),
+                                         delete=False) as _f:
+            json.dump({'version': _PROCMGR_CACHE_VERSION,
+                       'file': os.path.abspath(file), 'mtime_ns': mtime_ns,
+                       'size': size, 'entries': entries}, _f)
+        os.replace(_f.name, cache_file)
+    except OSError:
+        pass
+
+
+class _ProcmgrParser:
+    """
+    Single pass tokenizer and recursive descent parser for the
+    procmgr_config list literal. Dict keys may be bare names, as they are
+    in iocmanager.cfg, and every key is kept. An entry that can't be
+    parsed is skipped, with its error kept in 'errors'.
+    """
+
+    def __init__(self, text: str, pos: int):
+        self._text = text
+        self._tokens = _PROCMGR_TOKENS.finditer(text, pos)
+        self.errors = []
+
+    def _next(self) -> tuple[str, str, int, int]:
+        """
+        Returns the next (kind, text, start, end) token, skipping
+        whitespace and comments.
+        """
+        match = next(self._tokens)
+        kind = match.lastgroup
+        token = (kind, match.group(kind), match.start(kind), match.end(kind))
+        if kind == 'error':
+            raise ValueError(f'Unexpected {token[1]!r} at offset {token[2]}')
+        if kind == 'end':
+            raise ValueError('Unexpected end of file')
+        return token
+
+    def _separator(self, close: str) -> tuple[str, str, int, int]:
+        """
+        Consumes the ',' between items and returns the token after it,
+        which may be the closing bracket.
+        """
+        token = self._next()
+        if token[1] == ',':
+            return self._next()
+        if token[1] != close:
+            raise ValueError(f'Expected "," or "{close}" at offset'
+                             f' {token[2]}')
+        return token
+
+    def _value(self, token: tuple[str, str, int, int]):
+        """Parses the value starting at 'token'."""
+        kind, text = token[:2]
+        if kind == 'str':
+            return ast.literal_eval(text) if '\\' in text else text[1:-1]
+        if kind == 'num':
+            if '.' in text or 'e' in text.lower():
+                return float(text)
+            return int(text)
+        if kind == 'name' and text in _PROCMGR_NAMES:
+            return _PROCMGR_NAMES[text]
+        if text == '[':
+            return self._list()
+        if text == '{':
+            return self._dict()[0]
+        raise ValueError(f'Unexpected {text!r} at offset {token[2]}')
+
+    def _list(self) -> list:
+        """Parses a list after its opening bracket."""
+        result = []
+        token = self._next()
+        while token[1] != ']':
+            result.append(self._value(token))
+            token = self._separator(']')
+        return result
+
+    def _dict(self) -> tuple[dict, int]:
+        """
+        Parses a dict after its opening brace. Also returns the offset
+        just past the closing brace.
+        """
+        result = {}
+        token = self._next()
+        while token[1] != '}':
+            kind, key, start, _ = token
+            if kind == 'str':
+                key = self._value(token)
+            elif kind != 'name':
+                raise ValueError(f'Invalid key {key!r} at offset {start}')
+            if self._next()[1] != ':':
+                raise ValueError(f'Expected ":" after {key!r}')
+            result[key] = self._value(self._next())
+            token = self._separator('}')
+        return result, token[3]
+
+    def _skip_dict(self, pos: int) -> bool:
+        """
+        Restarts tokenizing at the '{' at offset 'pos' and consumes tokens
+        up to its matching '}'. Returns False if the text ends first.
+        """
+        self._tokens = _PROCMGR_TOKENS.finditer(self._text, pos)
+        depth = 0
+        for match in self._tokens:
+            kind = match.lastgroup
+            if kind == 'end':
+                return False
+            if match.group(kind) == '{':
+                depth += 1
+            elif match.group(kind) == '}':
+                depth -= 1
+                if depth == 0:
+                    return True
+        return False
+
+    def parse(self) -> list[tuple[tuple[int, int], dict]]:
+        """
+        Parses the top level list of dicts, returning each dict with its
+        (start, end) offsets in the text. The dicts that fail to parse are
+        left out, see 'errors'. If the list itself is malformed, the dicts
+        before the error are returned.
+        """
+        result = []
+        try:
+            self._next()
+            token = self._next()
+            while token[1] != ']':
+                if token[1] != '{':
+                    raise ValueError(f'Expected "{{" at offset {token[2]}')
+                try:
+                    record, end = self._dict()
+                except ValueError as e:
+                    self.errors.append(e)
+                    if not self._skip_dict(token[2]):
+                        return result
+                else:
+                    result.append(((token[2], end), record))
+                token = self._separator(']')
+        except ValueError as e:
+            self.errors.append(e)
+        return result
+
+
+def parse_procmgr(file: str) -> list[tuple[str, dict]]:
+    """
+    Parses every procmgr_config entry of an iocmanager.cfg file in a
+    single pass, keeping all of the keys in each entry. Entries that can't
+    be parsed are reported and left out.
+
+    Parameters
+    ----------
+    file : str
+        The iocmanager.cfg file to parse.
+
+    Returns
+    -------
+    list[tuple[str, dict]]
+        (raw_text, record) pairs, where raw_text is the single line entry
+        that find_ioc regex patterns are matched against and record is the
+        parsed dict.
+    """
+    return _parse_procmgr(file)[0]
+
+
+def _parse_procmgr(file: str) -> tuple[list[tuple[str, dict]], bool]:
+    """
+    parse_procmgr, also returning whether the whole procmgr_config was
+    parsed without errors.
+    """
+    with stage('read'), open(file, 'r', encoding='utf-8') as _f:
+        raw_text = _f.read()
+    with stage('procmgr slice'):
+        start = _PROCMGR_START.search(raw_text)
+    if start is None:
+        return [], True
+    with stage('parse procmgr'):
+        parser = _ProcmgrParser(raw_text, start.end())
+        entries = parser.parse()
+        for e in parser.errors:
+            print(f'Parse Error:\t {e}\n'
+                  + f'Cannot decode all of procmgr_config in {file}')
+        # join the inline breaks, like search_procmgr does, for regex
+        # matching
+        return ([(raw_text[i:j].replace(',\n ', ','), record)
+                 for (i, j), record in entries], len(parser.errors) == 0)
+
+
+def load_procmgr(file: str, use_cache: bool = True) -> list[tuple[str, dict]]:
+    """
+    Cached wrapper around parse_procmgr.
+
+    Results are kept in memory and on disk under CACHE_DIR, and are
+    invalidated whenever the mtime or size of 'file' changes. Results with
+    parse errors are not cached, so the errors are reported on every run.
+
+    Parameters
+    ----------
+    file : str
+        The iocmanager.cfg file to load.
+    use_cache : bool, optional
+        Whether to use and update the caches. The default is True.
+
+    Returns
+    -------
+    list[tuple[str, dict]]
+        See parse_procmgr. Returns None if 'file' is invalid.
+    """
+    if not (os.path.exists(file) and ('iocmanager.cfg' in file)):
+        print(f'{file} does not exist or is otherwise invalid.')
+        return None
+    if not use_cache:
+        return parse_procmgr(file)
+    _stat = os.stat(file)
+    mtime_ns, size = _stat.st_mtime_ns, _stat.st_size
+    cached = _PROCMGR_CACHE.get(file)
+    if cached is not None and cached[:2] == (mtime_ns, size):
+        return cached[2]
+    with stage('procmgr cache'):
+        entries = _read_procmgr_cache(file, mtime_ns, size)
+    if entries is None:
+        entries, parsed = _parse_procmgr(file)
+        if not parsed:
+            return entries
+        with stage('procmgr cache'):
+            _write_procmgr_cache(file, mtime_ns, size, entries)
+    _PROCMGR_CACHE[file] = (mtime_ns, size, entries)
+    return entries
+
+
+def match_procmgr(file: str, patt: str, tag_hutch: bool = False,
+                  use_cache: bool = True) -> list[dict]:
+    """
+    Returns copies of the procmgr_config records in an iocmanager.cfg
+    whose single line entry matches the regex 'patt'.
+
+    Parameters
+    ----------
+    file : str
+        The iocmanager.cfg file to search.
+    patt : str
+        Regex pattern to search for.
+    tag_hutch : bool, optional
+        Whether to add the hutch the cfg belongs to as the 'hutch' key.
+        The default is False.
+    use_cache : bool, optional
+        Whether to use the parsed iocmanager.cfg cache, see load_procmgr.
+        The default is True.
+
+    Returns
+    -------
+    list[dict]
+        The matching records, empty if 'file' is invalid.
+    """
+    entries = load_procmgr(file, use_cache=use_cache)
+    if entries is None:
+        return []
+    with stage('match'):
+        _patt = re.compile(r'{.*' + patt + r'.*}')
+        # copy the matches so callers can't modify the cached records
+        matches = [dict(record) for raw, record in entries
+                   if _patt.search(raw)]
+    if tag_hutch:
+        hutch = os.path.basename(os.path.dirname(file))
+        for _d in matches:
+            _d['hutch'] = hutch
+    return matches
+
+
+def iter_ioc(hutch: str = None, patt: str = None,
+             valid_hutch: list[str] = None,
+             use_cache: bool = True, tag_hutch: bool = None):
+    """
+    Generator version of find_ioc that yields the matching records of each
+    iocmanager.cfg as soon as that file is parsed, in order of the files.
 
     Parameters
     ----------
@@ -246,19 +721,31 @@ def find_ioc(hutch: str = None, patt: str = None,
         Regex pattern to search for. The default is None.
     valid_hutch: list[str], optional
         List of valid hutch codes to use. The default is taken
-        from the directories in '/cds/group/pcds/pyps/config'
+        from the directories in CONFIG_DIR, see get_valid_hutch, and
+        rediscovered once if 'hutch' is not in the cached list.
+    use_cache: bool, optional
+        Whether to use the parsed iocmanager.cfg cache, see load_procmgr.
+        The default is True.
+    tag_hutch: bool, optional
+        Whether to add the 'hutch' key to the records. The default is
+        to only add it when searching 'all' hutches.
 
     Raises
     ------
     ValueError
         Hutch code is invalid or regex pattern is missing.
 
-    Returns
-    -------
-    list[dict]
-        List of dictionaries generated by the JSON loading
-
+    Yields
+    ------
+    dict
+        The procmgr_config record of each matching IOC.
     """
+    if valid_hutch is None:
+        with stage('discover'):
+            valid_hutch = get_valid_hutch()
+            # the cached list may predate a newly added hutch
+            if hutch is not None and hutch not in valid_hutch:
+                valid_hutch = get_valid_hutch(refresh=True)
     # check hutches
     if (hutch is None) | (hutch not in tuple(valid_hutch)):
         print('Invalid entry. Please choose a valid hutch:\n'
@@ -267,43 +754,67 @@ def find_ioc(hutch: str = None, patt: str = None,
     # create file paths
     if hutch in tuple(valid_hutch):
         if hutch == 'all':
-            path = gb.glob('/cds/group/pcds/pyps/config/*/iocmanager.cfg')
+            with stage('discover'):
+                path = gb.glob(f'{CONFIG_DIR}/*/iocmanager.cfg')
         else:
-            path = [f'/cds/group/pcds/pyps/config/{hutch}/iocmanager.cfg']
+            path = [f'{CONFIG_DIR}/{hutch}/iocmanager.cfg']
     # check patt and generate the regex pattern
     if patt is None:
         print('No regex pattern supplied')
         raise ValueError
-    # initialize output list
-    result = []
-    # iterate and capture results.
-    for _file in path:
-        prefix = ''
-        if len(path) != 1:
-            prefix = _file+':'
-        output = search_procmgr(file=_file, patt=patt, prefix=prefix)
-        if output != prefix:
-            result.append(output)
-    # reconstruct the list of str
-    _temp = ''.join(result)
-    if len(_temp) == 0:
+    if tag_hutch is None:
+        tag_hutch = (hutch == 'all')
+    if len(path) == 0:
+        return
+    # read and search every cfg concurrently, since NFS latency dominates
+    scan = partial(match_procmgr, patt=patt, tag_hutch=tag_hutch,
+                   use_cache=use_cache)
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS,
+                                            len(path))) as executor:
+        # map keeps the results in the same order as the paths
+        for matches in timed_iter(executor.map(scan, sorted(path)),
+                                  'wait for iocmanager.cfg'):
+            yield from matches
+
+
+def find_ioc(hutch: str = None, patt: str = None,
+             valid_hutch: list[str] = None,
+             use_cache: bool = True) -> list[dict]:
+    """
+    A pythonic grep_ioc for gathering IOC details from the cfg file
+
+    Parameters
+    ----------
+    hutch: str, optional
+        3 letter lowercase hutch code. May also include 'all'.
+        The default is None.
+    patt: str, optional
+        Regex pattern to search for. The default is None.
+    valid_hutch: list[str], optional
+        List of valid hutch codes to use. The default is taken
+        from the directories in CONFIG_DIR, see get_valid_hutch.
+    use_cache: bool, optional
+        Whether to use the parsed iocmanager.cfg cache, see load_procmgr.
+        The default is True.
+
+    Raises
+    ------
+    ValueError
+        Hutch code is invalid or regex pattern is missing.
+
+    Returns
+    -------
+    list[dict]
+        List of dictionaries generated by the JSON loading
+
+    """
+    output = list(iter_ioc(hutch, patt, valid_hutch=valid_hutch,
+                           use_cache=use_cache))
+    if len(output) == 0:
         print(f'{Fore.RED}No results found for {Style.RESET_ALL}{patt}'
               + f'{Fore.RED} in{Style.RESET_ALL} '
               + f'{hutch}')
         return None
-    # capture the hutch from the cfg path if hutch = all
-    if hutch == 'all':
-        hutch_cfgs = re.findall(r'/.*cfg\:', _temp)
-        hutch_cfgs = [''.join(re.findall(r'(?<=/)\w+(?=/ioc)', s))
-                      for s in hutch_cfgs]
-    # strip the file information
-    _temp = re.sub(r'.*cfg\:', '', _temp)
-    # now convert back to json and load
-    output = [try_json_loads(s) for s in fix_json(_temp)]
-    # and add the hutches back into the dicts if searching across all cfgs
-    if hutch == 'all':
-        for _i, _d in enumerate(output):
-            _d['hutch'] = hutch_cfgs[_i]
     return output
 
 
@@ -326,7 +837,7 @@ def fix_dir(dir_path: str) -> str:
 
     # catches the short form path
     if dir_path.startswith('ioc/'):
-        output_dir = '/cds/group/pcds/epics/'+dir_path
+        output_dir = f'{EPICS_DIR}/{dir_path}'
     # for the rare, old child IOCs that only exist in their parent's release
     elif 'common' in dir_path:
         output_dir = dir_path + '/children'
@@ -339,6 +850,134 @@ def fix_dir(dir_path: str) -> str:
     return output_dir
 
 
+class ParentResolver:
+    """
+    Resolves child IOCs to their parent's RELEASE.
+
+    Each child IOC.cfg is stat'ed and read at most once per resolver, and
+    the RELEASE found is cached by (path, mtime_ns, size) so unchanged
+    files are not read again. With 'persistent', that cache is also kept
+    on disk under CACHE_DIR between runs.
+
+    Parameters
+    ----------
+    persistent : bool, optional
+        Whether to load and save the on-disk cache. The default is False.
+    revalidate : bool, optional
+        Whether to stat the child IOC.cfg again on every resolution, so a
+        long-lived resolver picks up changed files. The RELEASE is still
+        only read again if the mtime or size changed. The default is False.
+    """
+
+    # Returned in place of a RELEASE when the child IOC.cfg is missing
+    MISSING = 'Invalid. Child does not exist.'
+    # The RELEASE pointer line in a child IOC.cfg
+    RELEASE_PATTERN = SearchPattern('^RELEASE')
+
+    def __init__(self, persistent: bool = False, revalidate: bool = False):
+        self.persistent = persistent
+        self.revalidate = revalidate
+        # {cfg path: (mtime_ns, size, release)}
+        self._releases = {}
+        # {cfg path: release or None}, as of the last resolution
+        self._resolved = {}
+        self._dirty = False
+        if persistent:
+            self._load()
+
+    @staticmethod
+    def child_cfg(file: str, path: str) -> str:
+        """Returns the child IOC.cfg path of IOC 'file' in dir 'path'"""
+        return f'{fix_dir(path)}{file}.cfg'
+
+    def _cache_file(self) -> str:
+        return os.path.join(CACHE_DIR, 'parent_release.json')
+
+    def _load(self):
+        try:
+            with open(self._cache_file(), 'r', encoding='utf-8') as _f:
+                cache = json.load(_f)
+            self._releases = {cfg: tuple(value)
+                              for cfg, value in cache.items()}
+        except (OSError, ValueError, AttributeError, TypeError):
+            pass
+
+    def save(self):
+        """Writes the on-disk cache if it is persistent and has changed."""
+        if not (self.persistent and self._dirty):
+            return
+        # Best effort, a failed write only means reading the cfgs next time
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8',
+                                             dir=CACHE_DIR,
+                                             delete=False) as _f:
+                json.dump(self._releases, _f)
+            os.replace(_f.name, self._cache_file())
+            self._dirty = False
+        except OSError:
+            pass
+
+    def _read(self, cfg: str) -> Optional[str]:
+        """
+        Stats 'cfg' and returns its RELEASE, only reading the file when
+        the cached RELEASE is stale. Returns None if 'cfg' does not exist.
+        """
+        try:
+            _stat = os.stat(cfg)
+            if not stat.S_ISREG(_stat.st_mode):
+                return None
+            key = (_stat.st_mtime_ns, _stat.st_size)
+            cached = self._releases.get(cfg)
+            if cached is not None and cached[:2] == key:
+                return cached[2]
+            lines = _scan_lines(cfg, self.RELEASE_PATTERN)
+            release = ''.join(lines).strip().rsplit('=', maxsplit=1)[-1]
+        except (OSError, UnicodeDecodeError):
+            return None
+        self._releases[cfg] = key + (release,)
+        self._dirty = True
+        return release
+
+    def resolve_all(self, iocs: list[tuple[str, str]]) -> list[str]:
+        """
+        Resolves many (ioc, dir) pairs at once. The child IOC.cfg files
+        not seen yet, or all of them with 'revalidate', are checked
+        concurrently on up to MAX_WORKERS threads.
+
+        Returns
+        -------
+        list[str]
+            The parent release of each pair, in the same order as 'iocs'.
+        """
+        cfgs = [self.child_cfg(file, path) for file, path in iocs]
+        todo = sorted(set(cfgs) if self.revalidate
+                      else set(cfgs).difference(self._resolved))
+        # a thread pool costs more than a single stat
+        if len(todo) == 1:
+            with stage('parents'):
+                self._resolved[todo[0]] = self._read(todo[0])
+                self.save()
+        elif len(todo) > 1:
+            with stage('parents'), \
+                    ThreadPoolExecutor(max_workers=min(MAX_WORKERS,
+                                                       len(todo))) as executor:
+                self._resolved.update(zip(todo, executor.map(self._read,
+                                                             todo)))
+                self.save()
+        return [self.MISSING if self._resolved[cfg] is None
+                else self._resolved[cfg] for cfg in cfgs]
+
+    def resolve(self, file: str, path: str) -> str:
+        """Returns the parent release of a single IOC, see resolve_all."""
+        return self.resolve_all([(file, path)])[0]
+
+    def exists(self, file: str, path: str) -> bool:
+        """Whether the child IOC.cfg exists, as of its last resolution."""
+        self.resolve(file, path)
+        return self._resolved[self.child_cfg(file, path)] is not None
+
+
 def find_parent_ioc(file: str, path: str) -> str:
     """
     Searches the child IOC for the parent's release pointer
@@ -357,22 +996,182 @@ def find_parent_ioc(file: str, path: str) -> str:
         Path to the parent IOC's release.
 
     """
-    file_dir = fix_dir(path)
-    if os.path.exists(f'{file_dir}{file}.cfg') is False:
-        return 'Invalid. Child does not exist.'
-    parent_ioc_release = search_file(file=f'{file_dir}{file}.cfg',
-                                     patt='^RELEASE').strip()
-    return parent_ioc_release.rsplit('=', maxsplit=1)[-1]
+    return _PARENT_RESOLVER.resolve(file, path)
+
 
+# Shared by find_parent_ioc, which stats the child IOC.cfg on every call
+_PARENT_RESOLVER = ParentResolver(revalidate=True)
 
-def print_frame2term(dataframe: pd.DataFrame = None,):
-    """Wrapper for displaying the dataframe to proper terminal size"""
+
+class IocTable:
+    """
+    A minimal column store for find_ioc records, used in place of a
+    pandas.DataFrame so that listing IOCs doesn't need to import pandas.
+
+    Parameters
+    ----------
+    columns : dict[str, list]
+        The values of each column, in column order. All columns must have
+        the same length.
+    """
+
+    def __init__(self, columns: dict[str, list]):
+        self._columns = dict(columns)
+
+    @classmethod
+    def from_records(cls, records: list[dict]) -> 'IocTable':
+        """
+        Builds the table like pandas.json_normalize, then fills the gaps
+        the same way as the grep_more_ioc DataFrame: a missing 'disable'
+        is False, a missing 'delay' is 0 and anything else missing is ''.
+        Like pandas, numeric columns with gaps are turned into floats.
+        """
+        keys = dict.fromkeys(key for record in records for key in record)
+        columns = {}
+        for key in keys:
+            values = [record.get(key) for record in records]
+            fill = {'disable': False, 'delay': 0}.get(key, '')
+            if None in values:
+                if all(isinstance(v, Real) and not isinstance(v, bool)
+                       for v in values if v is not None):
+                    values = [v if v is None else float(v) for v in values]
+                    fill = float(fill) if key == 'delay' else fill
+                values = [fill if v is None else v for v in values]
+            columns[key] = values
+        # pad the disable column based on the grep_ioc output
+        if 'disable' not in columns:
+            columns['disable'] = len(records)*[False]
+        return cls(columns)
+
+    @property
+    def columns(self) -> list[str]:
+        """The column names, in order"""
+        return list(self._columns)
+
+    def __len__(self) -> int:
+        return len(next(iter(self._columns.values()), []))
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._columns
+
+    def __getitem__(self, key: str) -> list:
+        return self._columns[key]
+
+    def insert(self, loc: int, key: str, values: list):
+        """Inserts, or moves if 'key' exists, a column at position 'loc'"""
+        self._columns.pop(key, None)
+        items = list(self._columns.items())
+        items.insert(loc, (key, list(values)))
+        self._columns = dict(items)
+
+    def filter(self, mask: list[bool]) -> 'IocTable':
+        """Returns a new table with only the rows where 'mask' is True"""
+        return IocTable({key: [v for v, keep in zip(values, mask) if keep]
+                         for key, values in self._columns.items()})
+
+    def rows(self, *keys: str) -> list[tuple]:
+        """Returns the values of the 'keys' columns for each row"""
+        return list(zip(*(self._columns[key] for key in keys)))
+
+    def to_frame(self) -> 'pd.DataFrame':
+        """Converts the table to a pandas.DataFrame"""
+        with stage('DataFrame'):
+            import pandas as pd
+            return pd.DataFrame(self._columns)
+
+
+def short_release(release: str, dir_path: str) -> str:
+    """
+    Abbreviates a parent IOC release from find_parent_ioc for display.
+
+    Parameters
+    ----------
+    release : str
+        The parent IOC's release.
+    dir_path : str
+        The child IOC's directory, as in iocmanager.cfg.
+
+    Returns
+    -------
+    str
+        The release path relative to the common IOC dir, or the child's
+        dir for children living in their parent's release.
+    """
+    # catch parent IOCs running out of dev
+    if 'epics-dev' in release:
+        return release
+    # abbreviate path for standard IOC releases
+    if 'common' in release:
+        return release.rsplit(r'common/', maxsplit=1)[-1]
+    # check for children living in parent's dir
+    if '$$UP(PATH)' in release:
+        return dir_path.rsplit(r'/children', maxsplit=1)[0]
+    # else use the full path that's found
+    return release
+
+
+def write_records(records, columns: list[str], fmt: str = 'jsonl',
+                  file=None):
+    """
+    Writes records one line at a time as they are produced, flushing
+    after each so the output can be piped without buffering.
+
+    Parameters
+    ----------
+    records : Iterable[dict]
+        The records to write.
+    columns : list[str]
+        The keys to write, in order. Missing keys are written as null in
+        jsonl and empty in csv/tsv.
+    fmt : str, optional
+        One of OUTPUT_FORMATS, except 'table'. The default is 'jsonl'.
+    file : TextIO, optional
+        Where to write the records. The default is sys.stdout.
+
+    Returns
+    -------
+    int
+        The number of records written.
+    """
+    if file is None:
+        file = sys.stdout
+    count = 0
+    if fmt == 'jsonl':
+        for record in records:
+            file.write(json.dumps({c: record.get(c) for c in columns}) + '\n')
+            file.flush()
+            count += 1
+        return count
+    writer = csv.writer(file, delimiter='\t' if fmt == 'tsv' else ',',
+                        lineterminator='\n')
+    writer.writerow(columns)
+    for record in records:
+        values = [record.get(c) for c in columns]
+        # keep lists, like the history, as a single json encoded field
+        writer.writerow(['' if v is None
+                         else json.dumps(v) if isinstance(v, (list, dict))
+                         else v for v in values])
+        file.flush()
+        count += 1
+    return count
+
+
+def print_frame2term(dataframe: 'pd.DataFrame' = None,):
+    """
+    Wrapper for displaying the dataframe to proper terminal size, paged
+    when it is taller than the terminal.
+    """
+    import pandas as pd
+    from term_table import page_lines
+
+    # Show every row and column, the pager handles tall frames
     with pd.option_context('display.max_rows', None,
                            'display.max_columns', None,
                            'display.width',
                            get_terminal_size(fallback=(120, 50))[0],
                            ):
-        print(dataframe)
+        with stage('render'):
+            page_lines(str(dataframe).splitlines())
 
 ###############################################################################
 # %% Arg Parser
@@ -399,12 +1198,21 @@ def build_parser():
     parser.add_argument('hutch', type=str,
                         help='3 letter hutch code. Use "all" to search through'
                         ' all hutches.\n'
-                        f'Valid arguments: {", ".join(VALID_HUTCH)}')
+                        f'Valid arguments: "all" or the hutches with an'
+                        f' iocmanager.cfg\nin {CONFIG_DIR}')
     parser.add_argument('-d', '--ignore_disabled',
                         action='store_true',
                         default=False,
                         help='Flag for excluding based'
                         + ' on the "disabled" state.')
+    parser.add_argument('-f', '--format', choices=OUTPUT_FORMATS,
+                        default='table',
+                        help='Output format. jsonl, csv and tsv stream each'
+                        ' IOC record\nwith the columns: '
+                        + ', '.join(FORMAT_COLUMNS)
+                        + '\nand "release" with "print -r". Other'
+                        ' subcommands are ignored.')
+    add_profile_arguments(parser)
     # subparsers
     subparsers = parser.add_subparsers(
         help='Required subcommands after capturing IOC information:')
@@ -459,6 +1267,11 @@ def build_parser():
                         type=str, help='PATT to use for regex search in file',
                         metavar='PATT')
 
+    search.add_argument('-i', '--index', action='store_true', default=False,
+                        help='Only read the files that may match, using the'
+                        ' trigram index\nof the child IOC.cfg files.'
+                        ' The index is updated first.')
+
     search.add_argument('-n', '--no_color', action='store_true',
                         default=False,
                         help="Don't wrap the search results with a color")
@@ -486,12 +1299,66 @@ def build_parser():
 ###############################################################################
 
 
-def main():
+def _add_releases(records, resolver: ParentResolver):
+    """
+    Adds the abbreviated parent release to the records of each hutch,
+    resolving a hutch's child IOCs all at once.
+    """
+    for _, group in groupby(records, key=lambda r: r['hutch']):
+        group = list(group)
+        releases = resolver.resolve_all([(r['id'], r['dir']) for r in group])
+        for record, release in zip(group, releases):
+            record['release'] = short_release(release, record['dir'])
+            yield record
+
+
+def main(argv: list[str] = None, parser: argparse.ArgumentParser = None):
     """
     Main entry point of the program. For using with CLI tools.
+
+    Parameters
+    ----------
+    argv : list[str], optional
+        The command line arguments. The default is sys.argv[1:].
+    parser : argparse.ArgumentParser, optional
+        A parser from build_parser to reuse. The default is a new one.
+    """
+    if parser is None:
+        parser = build_parser()
+    args = parser.parse_args(argv)
+    with profiled(args.profile, args.profile_out, name='grep_more_ioc'):
+        run(args)
+
+
+def run(args: argparse.Namespace):
+    """
+    Runs grep_more_ioc with the parsed command line arguments, see main.
     """
-    parser = build_parser()
-    args = parser.parse_args()
+# --------------------------------------------------------------------------- #
+# %%% format
+# --------------------------------------------------------------------------- #
+    # stream the records instead of building the table
+    if args.format != 'table':
+        records = iter_ioc(args.hutch, args.patt, tag_hutch=True)
+        # pad the disable key, like in the table
+        records = ({**r, 'disable': r.get('disable', False)} for r in records)
+        if args.ignore_disabled is True:
+            records = (r for r in records if r['disable'] is not True)
+        columns = FORMAT_COLUMNS
+        if getattr(args, 'release', False):
+            columns = columns + ['release']
+            records = _add_releases(records, ParentResolver(persistent=True))
+        try:
+            with stage('render'):
+                count = write_records(records, columns, fmt=args.format)
+        except BrokenPipeError:
+            # the reader exited early, e.g. head, so stop quietly
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            sys.exit(1)
+        if count == 0:
+            print('No IOCs were found.', file=sys.stderr)
+        sys.exit()
+
     # read grep_ioc output
     data = find_ioc(args.hutch, args.patt)
 
@@ -500,72 +1367,42 @@ def main():
         print(f'{Fore.RED}No IOCs were found.\nExiting . . .{Style.RESET_ALL}')
         sys.exit()
 
-    # create the dataframe after fixing the json format
-    df = pd.json_normalize(data)
-
-    # reorder the dataframe if searching all hutches
-    if args.hutch == 'all':
-        df.insert(0, 'hutch', df.pop('hutch'))
-
-    # pad the disable column based on the grep_ioc output
-    if 'disable' not in df.columns:
-        df['disable'] = df.index.size*[False]
-    # handle stupid pandas 3.0 future warnings early
-    with pd.option_context('future.no_silent_downcasting', True):
-        if 'disable' in df.columns:
-            df['disable'] = (df['disable'].infer_objects().fillna(False))
-
-    # Fill the NaN with empty strings for rarely used keys
-    # handle stupid pandas 3.0 future warnings early
-    with pd.option_context('future.no_silent_downcasting', True):
-        for _col in df.columns:
-            if _col not in ['delay']:
-                df[_col] = df[_col].infer_objects().fillna('')
-            else:
-                df[_col] = df[_col].infer_objects().fillna(0)
+    with stage('table'):
+        # create the table, padding the keys missing from some IOCs
+        table = IocTable.from_records(data)
+
+        # reorder the table if searching all hutches
+        if args.hutch == 'all':
+            table.insert(0, 'hutch', table['hutch'])
 
-    # check for the ignore_disabled flag
-    if args.ignore_disabled is True:
-        df = df[~df.disable].reset_index(drop=True)
+        # check for the ignore_disabled flag
+        if args.ignore_disabled is True:
+            table = table.filter([not d for d in table['disable']])
 
 # --------------------------------------------------------------------------- #
 # %%% print
 # --------------------------------------------------------------------------- #
     # print the dataframe
     if hasattr(args, 'print'):
+        # shared by -r and -s so each child IOC.cfg is only read once
+        resolver = ParentResolver(persistent=True)
         if args.release is True:
             # intialize list for adding a new column
             output_list = []
+            iocs = table.rows('id', 'dir')
             # iterate through ioc and directory pairs
-            for f, d in df.loc[:, ['id', 'dir']].values:
-                search_result = find_parent_ioc(f, d)
-                # catch parent IOCs running out of dev
-                if 'epics-dev' in search_result:
-                    output_str = search_result
-                # abbreviate path for standard IOC releases
-                elif 'common' in search_result:
-                    output_str = (search_result
-                                  .rsplit(r'common/', maxsplit=1)[-1])
-                # check for children living in parent's dir
-                elif '$$UP(PATH)' in search_result:
-                    output_str = d.rsplit(r'/children', maxsplit=1)[0]
-                # else use the full path that's found
-                else:
-                    output_str = search_result
-                # add it to the list
-                output_list.append(output_str)
-            # Then, finally, add the column to the dataframe
-            df['Release Version'] = output_list
-            # put it next to the child dirs
-            df.insert(df.columns.tolist().index('dir')+1,
-                      'Release Version',
-                      df.pop('Release Version'))
+            for (_, d), search_result in zip(iocs,
+                                             resolver.resolve_all(iocs)):
+                output_list.append(short_release(search_result, d))
+            # Then, finally, add the column next to the child dirs
+            table.insert(table.columns.index('dir')+1,
+                         'Release Version', output_list)
 
         if not args.no_dataframe:
-            print_frame2term(df)
+            print_frame2term(table.to_frame())
 
         if args.skip_comments is True:
-            for ioc, d in df.loc[:, ['id', 'dir']].values:
+            for ioc, d in table.rows('id', 'dir'):
                 # fixes dirs if ioc_manager truncates the path due to
                 # common ioc dir path
                 target_dir = fix_dir(d)
@@ -578,11 +1415,13 @@ def main():
         if args.print_dirs is True:
             print(f'{Fore.LIGHTBLUE_EX}\nDumping directories:\n'
                   + Style.RESET_ALL)
-            for f, d in df.loc[:, ['id', 'dir']].values:
-                search_result = find_parent_ioc(f, d)
+            iocs = table.rows('id', 'dir')
+            for (f, d), search_result in zip(iocs,
+                                             resolver.resolve_all(iocs)):
+                exists = resolver.exists(f, d)
                 d = fix_dir(d)
                 # check for cases where child IOC.cfg DNE
-                if not os.path.exists(f'{d}{f}.cfg'):
+                if not exists:
                     child_ioc = ''
                     color_prefix = Fore.LIGHTRED_EX
                 else:
@@ -598,8 +1437,8 @@ def main():
         if args.print_history is True:
             print(f'{Fore.LIGHTMAGENTA_EX}\nDumping histories:\n'
                   + Style.RESET_ALL)
-            if 'history' in df.columns:
-                for f, h in df.loc[:, ['id', 'history']].values:
+            if 'history' in table:
+                for f, h in table.rows('id', 'history'):
                     print(f'{Fore.LIGHTYELLOW_EX}{f}{Style.RESET_ALL}'
                           + '\nhistory:\n\t'
                           + '\n\t'.join(h))
@@ -608,7 +1447,7 @@ def main():
                       + Style.RESET_ALL)
 
         if args.list:
-            print('\n'.join(df[args.list].astype(str).to_list()))
+            print('\n'.join(str(v) for v in table[args.list]))
 
 # --------------------------------------------------------------------------- #
 # %%% search
@@ -617,27 +1456,38 @@ def main():
     if hasattr(args, 'search'):
         # optionally print the dataframe
         if not args.only_search:
-            print_frame2term(df)
+            print_frame2term(table.to_frame())
         check_search = []
         _color = Fore.LIGHTRED_EX
         if args.no_color:
             _color = None
-        for ioc, d in df.loc[:, ['id', 'dir']].values:
-            target_dir = fix_dir(d)
-            # Search for pattern after moving into the directory
-            if args.search is not None:
-                search_result = (search_file(file=f'{target_dir}{ioc}.cfg',
-                                             patt=args.search,
-                                             result_only=args.only_results,
-                                             color_wrap=_color,
-                                             quiet=args.quiet)
-                                 .strip()
-                                 )
-                if len(search_result) > 0:
-                    if not args.no_filename:
-                        print(f'{Fore.LIGHTYELLOW_EX}{ioc}:{Style.RESET_ALL}')
-                    print(''.join(search_result.strip()))
-                    check_search.append(len(search_result))
+        iocs = table.rows('id', 'dir')
+        files = [f'{fix_dir(d)}{ioc}.cfg' for ioc, d in iocs]
+        candidates = files
+        if args.index:
+            # sqlite is only needed here
+            from cfg_index import CfgIndex
+            with stage('search index'), CfgIndex() as index:
+                index.update(files)
+                candidates = index.candidates(files, args.search)
+            candidates = [f for f in files if f in candidates]
+        # Search for pattern in every candidate child IOC.cfg at once
+        found = dict(zip(candidates,
+                         search_files(candidates, patt=args.search,
+                                      result_only=args.only_results,
+                                      color_wrap=_color)))
+        results = [found.get(file, []) for file in files]
+        for (ioc, _), file, result in zip(iocs, files, results):
+            if result is None:
+                if not args.quiet:
+                    print(f'{file} does not exist')
+                continue
+            search_result = ''.join(result).strip()
+            if len(search_result) > 0:
+                if not args.no_filename:
+                    print(f'{Fore.LIGHTYELLOW_EX}{ioc}:{Style.RESET_ALL}')
+                print(''.join(search_result.strip()))
+                check_search.append(len(search_result))
         if len(check_search) == 0:
             print(Fore.RED + 'No search results found' + Style.RESET_ALL)
 # --------------------------------------------------------------------------- #
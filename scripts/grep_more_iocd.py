@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+"""
+A resident grep_more_ioc service, answering queries over a Unix socket
+with the iocmanager.cfg files already parsed in memory.
+
+Usage: python grep_more_iocd.py {serve,query,status,stop} [-h]
+"""
+###############################################################################
+# %% Imports
+###############################################################################
+
+import argparse
+import glob as gb
+import io
+import json
+import os.path
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+
+from constants import CACHE_DIR, CONFIG_DIR, get_valid_hutch
+
+###############################################################################
+# %% Global settings
+###############################################################################
+
+# Where the service listens by default, one per user like the caches
+SOCKET_FILE = os.path.join(CACHE_DIR, 'grep_more_ioc.sock')
+
+# Seconds between checks of the iocmanager.cfg files for changes
+POLL_INTERVAL = 5.0
+
+###############################################################################
+# %% Server
+###############################################################################
+
+
+class _QueryHandler(socketserver.StreamRequestHandler):
+    """
+    Answers each json request line of a connection with a json line:
+    {'argv': [...], 'columns': int} runs grep_more_ioc, while
+    {'command': 'ping' | 'stop'} checks on or stops the service.
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                command = request.get('command', 'query')
+                if command == 'query':
+                    response = self.server.run_query(
+                        [str(arg) for arg in request['argv']],
+                        request.get('columns'))
+                elif command in ('ping', 'stop'):
+                    response = {'stdout': '', 'stderr': '', 'code': 0,
+                                'pid': os.getpid()}
+                else:
+                    raise ValueError(f'Unknown command {command!r}')
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                command = None
+                response = {'stdout': '', 'code': 2,
+                            'stderr': f'Invalid request: {e}\n'}
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+            if command == 'stop':
+                # shutdown waits for serve_forever, so it can't run here
+                threading.Thread(target=self.server.shutdown).start()
+                return
+
+
+class QueryServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Runs grep_more_ioc.main for each query with its output captured.
+
+    grep_more_ioc keeps the parsed iocmanager.cfg files in memory, and a
+    watcher thread re-parses them as soon as they change, so queries don't
+    wait on parsing. Queries run one at a time since the output capture
+    is process wide.
+
+    Parameters
+    ----------
+    socket_path : str
+        The Unix socket to listen on.
+    poll : float, optional
+        Seconds between checks of the iocmanager.cfg files. The default
+        is POLL_INTERVAL.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, poll: float = POLL_INTERVAL):
+        # imported here so the client doesn't pay for it
+        import grep_more_ioc
+        self._grep_more_ioc = grep_more_ioc
+        self.poll = poll
+        self.lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._cfgs = None
+        self._parser = None
+        super().__init__(socket_path, _QueryHandler)
+        os.chmod(socket_path, 0o600)
+        self.refresh()
+        self._watcher = threading.Thread(target=self._watch, daemon=True)
+        self._watcher.start()
+
+    def refresh(self):
+        """
+        Re-parses the changed iocmanager.cfg files, and rediscovers the
+        hutches when a file is added or removed.
+        """
+        cfgs = sorted(gb.glob(f'{CONFIG_DIR}/*/iocmanager.cfg'))
+        with self.lock:
+            if cfgs != self._cfgs:
+                get_valid_hutch(refresh=True)
+                # the help lists the hutches, otherwise it's reused as is
+                self._parser = self._grep_more_ioc.build_parser()
+                self._cfgs = cfgs
+            for file in cfgs:
+                self._grep_more_ioc.load_procmgr(file)
+
+    def _watch(self):
+        while not self._stopped.wait(self.poll):
+            try:
+                self.refresh()
+            except Exception:
+                traceback.print_exc()
+
+    def run_query(self, argv: list[str], columns: int = None) -> dict:
+        """
+        Runs grep_more_ioc with the command line arguments 'argv'.
+
+        Parameters
+        ----------
+        argv : list[str]
+            The grep_more_ioc command line arguments.
+        columns : int, optional
+            The client's terminal width, for printing the table.
+
+        Returns
+        -------
+        dict
+            The 'stdout', 'stderr' and exit 'code' of the query.
+        """
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        with self.lock, redirect_stdout(stdout), redirect_stderr(stderr):
+            env_columns = os.environ.get('COLUMNS')
+            if columns is not None:
+                os.environ['COLUMNS'] = str(columns)
+            try:
+                self._grep_more_ioc.main(argv, parser=self._parser)
+                code = 0
+            except SystemExit as e:
+                # same as the interpreter handles sys.exit
+                code = e.code
+                if code is None:
+                    code = 0
+                elif not isinstance(code, int):
+                    print(code, file=sys.stderr)
+                    code = 1
+            except Exception:
+                traceback.print_exc()
+                code = 1
+            finally:
+                if env_columns is None:
+                    os.environ.pop('COLUMNS', None)
+                else:
+                    os.environ['COLUMNS'] = env_columns
+        return {'stdout': stdout.getvalue(), 'stderr': stderr.getvalue(),
+                'code': code}
+
+    def server_close(self):
+        self._stopped.set()
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def serve(socket_path: str = SOCKET_FILE, poll: float = POLL_INTERVAL):
+    """
+    Serves grep_more_ioc queries on 'socket_path' until stopped, see
+    QueryServer.
+    """
+    if os.path.exists(socket_path):
+        try:
+            with QueryClient(socket_path) as client:
+                pid = client.request({'command': 'ping'})['pid']
+            print(f'grep_more_iocd is already running with pid {pid}'
+                  f' on {socket_path}', file=sys.stderr)
+            sys.exit(1)
+        except (OSError, ValueError):
+            # left behind by a service that didn't stop cleanly
+            os.unlink(socket_path)
+    os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+    with QueryServer(socket_path, poll=poll) as server:
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(
+            target=server.shutdown).start())
+        print(f'grep_more_iocd listening on {socket_path}', file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+###############################################################################
+# %% Client
+###############################################################################
+
+
+class QueryClient:
+    """
+    A connection to a running grep_more_iocd, which can be reused for
+    many queries.
+
+    Parameters
+    ----------
+    socket_path : str, optional
+        The Unix socket of the service. The default is SOCKET_FILE.
+    timeout : float, optional
+        Seconds to wait on the service. The default is None, no timeout.
+
+    Raises
+    ------
+    OSError
+        The service isn't running.
+    """
+
+    def __init__(self, socket_path: str = SOCKET_FILE, timeout: float = None):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        try:
+            self._sock.connect(socket_path)
+        except OSError:
+            self._sock.close()
+            raise
+        self._file = self._sock.makefile('rwb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Closes the connection"""
+        self._file.close()
+        self._sock.close()
+
+    def request(self, request: dict) -> dict:
+        """Sends a request and returns the service's response"""
+        self._file.write(json.dumps(request).encode('utf-8') + b'\n')
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError('grep_more_iocd closed the connection')
+        return json.loads(line)
+
+    def query(self, argv: list[str]) -> tuple[str, str, int]:
+        """
+        Runs a grep_more_ioc query on the service.
+
+        Parameters
+        ----------
+        argv : list[str]
+            The grep_more_ioc command line arguments.
+
+        Returns
+        -------
+        tuple[str, str, int]
+            The stdout, stderr and exit code of the query.
+        """
+        columns = None
+        if sys.stdout.isatty():
+            columns = os.get_terminal_size(sys.stdout.fileno()).columns
+        response = self.request({'argv': list(argv), 'columns': columns})
+        return response['stdout'], response['stderr'], response['code']
+
+
+def query(argv: list[str], socket_path: str = SOCKET_FILE):
+    """
+    Prints the output of a grep_more_ioc query and exits with its code,
+    as the CLI does. Runs the query in this process when the service
+    isn't running.
+    """
+    try:
+        with QueryClient(socket_path) as client:
+            stdout, stderr, code = client.query(argv)
+    except OSError:
+        import grep_more_ioc
+        grep_more_ioc.main(argv)
+        sys.exit()
+    sys.stdout.write(stdout)
+    sys.stderr.write(stderr)
+    sys.exit(code)
+
+###############################################################################
+# %% Arg Parser
+###############################################################################
+
+
+def build_parser():
+    """
+    Builds the parser & subparsers for the main function
+    """
+    parser = argparse.ArgumentParser(
+        prog='grep_more_iocd',
+        description='A resident grep_more_ioc that keeps the iocmanager.cfg'
+                    ' files parsed in memory and answers queries over a Unix'
+                    ' socket.',
+        epilog='e.g. grep_more_iocd query mcs2 all print -n -l id')
+    parser.add_argument('-S', '--socket', type=str, default=SOCKET_FILE,
+                        help=f'Unix socket to use. Default: {SOCKET_FILE}')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_cmd = subparsers.add_parser('serve',
+                                      help='Run the service in the'
+                                      ' foreground.')
+    serve_cmd.add_argument('-p', '--poll', type=float, default=POLL_INTERVAL,
+                           help='Seconds between checks of the'
+                           ' iocmanager.cfg files for changes.'
+                           f' Default: {POLL_INTERVAL}')
+
+    query_cmd = subparsers.add_parser('query',
+                                      help='Run a grep_more_ioc query on the'
+                                      ' service, or in this process if it'
+                                      " isn't running.")
+    query_cmd.add_argument('argv', nargs=argparse.REMAINDER,
+                           help='grep_more_ioc arguments')
+
+    subparsers.add_parser('status', help='Check if the service is running.')
+    subparsers.add_parser('stop', help='Stop the service.')
+    return parser
+
+###############################################################################
+# %% Main
+###############################################################################
+
+
+def main():
+    """
+    Main entry point of the program.
+    """
+    argv = sys.argv[1:]
+    # everything after 'query' is for grep_more_ioc, including its options
+    query_argv = None
+    if 'query' in argv:
+        query_argv = argv[argv.index('query')+1:]
+        argv = argv[:argv.index('query')+1]
+    args = build_parser().parse_args(argv)
+    if query_argv is not None:
+        args.argv = query_argv
+    if args.command == 'serve':
+        serve(args.socket, poll=args.poll)
+    elif args.command == 'query':
+        query(args.argv, args.socket)
+    else:
+        command = 'ping' if args.command == 'status' else args.command
+        try:
+            with QueryClient(args.socket, timeout=10) as client:
+                pid = client.request({'command': command})['pid']
+        except OSError:
+            print(f'grep_more_iocd is not running on {args.socket}')
+            sys.exit(1)
+        if args.command == 'status':
+            print(f'grep_more_iocd is running with pid {pid}')
+        else:
+            print(f'Stopped grep_more_iocd with pid {pid}')
+
+
+if __name__ == '__main__':
+    main()
@@ -55,29 +55,73 @@ Example commands:
 
 "ioc-deploy rebuild -n ioc-common-foo -r R1.0.0"
 "ioc-deploy rebuild -p /cds/group/pcds/epics/ioc/common/foo/R1.0.0"
+
+To deploy many IOCs at once, list them in a manifest file with one
+"name release [path]" entry per line and pass it with --manifest.
+All entries are checked first, then they are deployed in parallel
+with a log file for each IOC and a status table at the end.
+
+Example command:
+
+"ioc-deploy --manifest release-day.txt --jobs 8"
+
+Tag listings from github are cached for a few minutes, so repeated runs
+don't list the same repo again. Set $IOC_DEPLOY_TAG_CACHE_TTL to the cache
+lifetime in seconds, or 0 to always list the tags from github.
+Clones can also reuse a bare mirror cache of each repo, see --mirror-dir.
+
+make runs in parallel with a job count picked from the free cores, or set
+with --make-jobs. The make output of deploys and rebuilds is also kept in a
+log file, and the build time of each top-level directory is reported.
+If a parallel make fails, it is re-run serially for readable errors.
 """
 
 import argparse
 import enum
+import json
 import logging
 import os
 import os.path
+import re
 import stat
 import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from tempfile import TemporaryDirectory
-from typing import List, Tuple
+from tempfile import TemporaryDirectory, mkstemp
+from typing import Dict, List, Optional, Tuple
 
 EPICS_SITE_TOP_DEFAULT = "/cds/group/pcds/epics"
 GITHUB_ORG_DEFAULT = "pcdshub"
+GIT_URL_BASE_DEFAULT = "git@github.com:"
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "ioc-deploy"
+MIRROR_DIR_DEFAULT = ""
+TAG_CACHE_FILE = str(CACHE_DIR / "tags.json")
+TAG_CACHE_TTL_DEFAULT = 300.0
+TAG_CACHE_TTL = float(os.environ.get("IOC_DEPLOY_TAG_CACHE_TTL", TAG_CACHE_TTL_DEFAULT))
+MAKE_LOG_DIR_DEFAULT = str(CACHE_DIR / "logs")
 CHMOD_SYMLINKS = os.chmod in os.supports_follow_symlinks
 PERMS_CMD = "update-perms"
 REBUILD_CMD = "rebuild"
 ALL_SUBCOMMANDS = (PERMS_CMD, REBUILD_CMD)
+MANIFEST_JOBS_DEFAULT = 4
+PERMS_JOBS_DEFAULT = 8
+PERMS_ERRORS_SHOWN = 10
+# Matches the top-level recursion of make, e.g. make[1]: Entering directory '/path/iocBoot'
+MAKE_DIR_RE = re.compile(r"^make\[1\]: (Entering|Leaving) directory [`'](.*)'$")
 
 logger = logging.getLogger("ioc-deploy")
 
+# Bare mirrors already fetched in this run, and a lock for each mirror
+_fetched_mirrors = set()
+_mirror_locks = {}
+_mirror_locks_lock = threading.Lock()
+
+# Guards the read-modify-write of TAG_CACHE_FILE
+_tag_cache_lock = threading.Lock()
+
 
 if sys.version_info >= (3, 7, 0):
     import dataclasses
@@ -99,6 +143,12 @@ if sys.version_info >= (3, 7, 0):
         verbose: bool
         version: bool
         permissions: str
+        manifest: str
+        jobs: int
+        log_dir: str
+        mirror_dir: str
+        git_url_base: str
+        make_jobs: int
 
     @dataclasses.dataclass(frozen=True)
     class DeployInfo:
@@ -110,11 +160,25 @@ if sys.version_info >= (3, 7, 0):
         pkg_name: str
         rel_name: str
 
+    @dataclasses.dataclass(frozen=True)
+    class DeployResult:
+        """
+        Outcome of one IOC deploy from a manifest.
+        """
+
+        name: str
+        release: str
+        deploy_dir: str
+        status: str
+        seconds: float
+        log_file: str
+
 else:
     from types import SimpleNamespace
 
     CliArgs = SimpleNamespace
     DeployInfo = SimpleNamespace
+    DeployResult = SimpleNamespace
 
 
 # Separate from class def because still supporting rhel7 built-in python3 at 3.6.8
@@ -130,6 +194,12 @@ DEFAULT_ARGS = CliArgs(
     verbose=False,
     version=False,
     permissions="",
+    manifest="",
+    jobs=MANIFEST_JOBS_DEFAULT,
+    log_dir="",
+    mirror_dir=os.environ.get("IOC_DEPLOY_MIRROR_DIR", MIRROR_DIR_DEFAULT),
+    git_url_base=os.environ.get("IOC_DEPLOY_GIT_URL_BASE", GIT_URL_BASE_DEFAULT),
+    make_jobs=int(os.environ.get("IOC_DEPLOY_MAKE_JOBS", 0)),
 )
 
 
@@ -243,6 +313,32 @@ def get_parser(subparser: str = "") -> argparse.ArgumentParser:
             default=argparse.SUPPRESS,
             help="Display additional debug information.",
         )
+    # arguments for the actions that run make
+    for parser in main_parser, rebuild_parser:
+        parser.add_argument(
+            "--make-jobs",
+            action="store",
+            type=int,
+            default=argparse.SUPPRESS,
+            help=(
+                "The number of parallel make jobs for each IOC. "
+                "The default, 0, uses the cores that aren't busy "
+                "according to the load average, split between the IOCs of a --manifest. "
+                "This can also be set with $IOC_DEPLOY_MAKE_JOBS."
+            ),
+        )
+        parser.add_argument(
+            "--log-dir",
+            action="store",
+            default=argparse.SUPPRESS,
+            help=(
+                "The directory for the per-IOC logs of a --manifest deploy, "
+                "and for the make logs of single deploys and rebuilds. "
+                "For --manifest, this defaults to ioc-deploy-logs-<date>-<time> "
+                "in the current directory. "
+                "Otherwise, it defaults to $XDG_CACHE_HOME/ioc-deploy/logs."
+            ),
+        )
     # main_parser unique arguments that should go last
     main_parser.add_argument(
         "--github_org",
@@ -255,6 +351,56 @@ def get_parser(subparser: str = "") -> argparse.ArgumentParser:
             f"With your current environment variables, this defaults to {DEFAULT_ARGS.github_org}."
         ),
     )
+    main_parser.add_argument(
+        "--manifest",
+        "-m",
+        action="store",
+        default=DEFAULT_ARGS.manifest,
+        help=(
+            "Deploy every IOC listed in this file instead of a single --name and --release. "
+            "Each line is 'name release [path]', where path works like --path-override. "
+            "Blank lines and lines starting with # are skipped. "
+            "All entries are checked, and any prompts answered, before the deploys start."
+        ),
+    )
+    main_parser.add_argument(
+        "--jobs",
+        "-j",
+        action="store",
+        type=int,
+        default=DEFAULT_ARGS.jobs,
+        help=(
+            "The number of --manifest IOCs to clone, make, and write-protect at the same time. "
+            f"This defaults to {MANIFEST_JOBS_DEFAULT}."
+        ),
+    )
+    main_parser.add_argument(
+        "--mirror-dir",
+        action="store",
+        default=DEFAULT_ARGS.mirror_dir,
+        help=(
+            "The directory of an optional bare mirror cache, e.g. a shared group directory. "
+            "Each repo is mirrored here with its full history, fetched once per run, "
+            "and used as a --reference for every clone so only new objects come from github. "
+            "Mirrors are never pruned, delete them to reclaim the space. "
+            "This defaults to $IOC_DEPLOY_MIRROR_DIR, "
+            "or no mirror cache if the environment variable is not set. "
+            "With your current environment variables, "
+            f"this defaults to {DEFAULT_ARGS.mirror_dir or 'no mirror cache'}."
+        ),
+    )
+    main_parser.add_argument(
+        "--git-url-base",
+        action="store",
+        default=DEFAULT_ARGS.git_url_base,
+        help=(
+            "The start of the url to clone repos from, followed by the org and the repo name. "
+            "Point this at a local directory of bare repos (e.g. file:///tmp/repos/) "
+            "for testing. "
+            f"This defaults to $IOC_DEPLOY_GIT_URL_BASE, or {GIT_URL_BASE_DEFAULT} "
+            "if the environment variable is not set."
+        ),
+    )
     if not subparser:
         return main_parser
     elif subparser == PERMS_CMD:
@@ -307,6 +453,19 @@ class ReturnCode(enum.IntEnum):
     NO_CONFIRM = 2
 
 
+class ThreadFilter(logging.Filter):
+    """
+    Only pass the log records made by one thread, the current one by default.
+    """
+
+    def __init__(self, ident: int = 0):
+        super().__init__()
+        self.ident = ident or threading.get_ident()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.thread == self.ident
+
+
 def main_deploy(args: CliArgs) -> int:
     """
     All main steps of the deploy script.
@@ -316,7 +475,7 @@ def main_deploy(args: CliArgs) -> int:
     Will either return an int return code or raise.
     """
     logger.info("Checking github connectivity")
-    if not get_github_available(verbose=args.verbose):
+    if not get_github_available(git_url_base=args.git_url_base, verbose=args.verbose):
         logger.error(
             "Github is not reachable, please check to make sure you're on a psbuild host."
         )
@@ -350,13 +509,15 @@ def main_deploy(args: CliArgs) -> int:
         deploy_dir=deploy_dir,
         dry_run=args.dry_run,
         verbose=args.verbose,
+        mirror_dir=args.mirror_dir,
+        git_url_base=args.git_url_base,
     )
     if rval != ReturnCode.SUCCESS:
         logger.error(f"Nonzero return value {rval} from git clone")
         return rval
 
     logger.info(f"Building IOC at {deploy_dir}")
-    rval = make_in(deploy_dir=deploy_dir, dry_run=args.dry_run)
+    rval = make_logged(deploy_dir=deploy_dir, args=args)
     if rval != ReturnCode.SUCCESS:
         logger.error(f"Nonzero return value {rval} from make")
         return rval
@@ -366,6 +527,249 @@ def main_deploy(args: CliArgs) -> int:
     return ReturnCode.SUCCESS
 
 
+def main_manifest(args: CliArgs) -> int:
+    """
+    All main steps of the deploy script for every IOC in a manifest.
+
+    This will be called when --manifest is included without a subparser.
+
+    Every entry is normalized with get_deploy_info one at a time first,
+    so any prompts (such as creating a missing tag) are answered before
+    anything is deployed. Nothing is deployed if any entry is invalid.
+    Then the IOCs are cloned, made, and write-protected on up to
+    args.jobs threads, each logging to its own file in args.log_dir,
+    and a status table is printed at the end.
+
+    Will either return an int return code or raise.
+    """
+    logger.info("Checking github connectivity")
+    if not get_github_available(git_url_base=args.git_url_base, verbose=args.verbose):
+        logger.error(
+            "Github is not reachable, please check to make sure you're on a psbuild host."
+        )
+        return ReturnCode.EXCEPTION
+
+    entries = read_manifest(args.manifest)
+    if TAG_CACHE_TTL > 0:
+        logger.info(f"Listing tags for {len(entries)} IOCs")
+        get_many_repo_tags(
+            repos=[(get_ioc_name(name), args.github_org) for name, _, _ in entries],
+            verbose=args.verbose,
+            git_url_base=args.git_url_base,
+            jobs=args.jobs,
+        )
+    logger.info(f"Checking repos and ioc deploy directories for {len(entries)} IOCs")
+    deploy_infos = []
+    errors = []
+    deploy_dirs = {}
+    for name, release, path_override in entries:
+        label = f"{name} {release}"
+        # TODO use dataclasses.replace once we're free of py3.6
+        kw = dict(vars(args))
+        kw.update(name=name, release=release, path_override=path_override, manifest="")
+        try:
+            deploy_info = get_deploy_info(CliArgs(**kw))
+        except (ValueError, RuntimeError, OSError, subprocess.CalledProcessError) as exc:
+            errors.append(f"{label}: {exc}")
+            continue
+        deploy_dir = deploy_info.deploy_dir
+        if not (deploy_dir and deploy_info.pkg_name and deploy_info.rel_name):
+            errors.append(f"{label}: something went wrong at package/tag normalization")
+        elif Path(deploy_dir).exists():
+            errors.append(f"{label}: deploy directory {deploy_dir} already exists")
+        elif deploy_dir in deploy_dirs:
+            errors.append(
+                f"{label}: deploy directory {deploy_dir} "
+                f"is also used by {deploy_dirs[deploy_dir]}"
+            )
+        else:
+            deploy_dirs[deploy_dir] = label
+            deploy_infos.append(deploy_info)
+    if errors:
+        for error in errors:
+            logger.error(error)
+        logger.error(
+            f"{len(errors)} of {len(entries)} manifest entries are invalid, "
+            "nothing was deployed"
+        )
+        return ReturnCode.EXCEPTION
+
+    for deploy_info in deploy_infos:
+        logger.info(
+            f"Deploying {args.github_org}/{deploy_info.pkg_name} at {deploy_info.rel_name} "
+            f"to {deploy_info.deploy_dir}"
+        )
+    if not args.auto_confirm:
+        user_text = input(
+            f"Confirm release sources and targets for all {len(deploy_infos)} IOCs? "
+            "yes/true or no/false\n"
+        )
+        if not is_yes(user_text, error_on_empty=False):
+            return ReturnCode.NO_CONFIRM
+
+    log_dir = Path(args.log_dir or f"ioc-deploy-logs-{time.strftime('%Y%m%d-%H%M%S')}")
+    log_dir.mkdir(parents=True, exist_ok=True)
+    make_jobs = get_make_jobs(args.make_jobs, concurrent=min(args.jobs, len(deploy_infos)))
+    logger.info(
+        f"Deploying {len(deploy_infos)} IOCs, {args.jobs} at a time "
+        f"with {make_jobs} make jobs each, logging to {log_dir}"
+    )
+    # Keep the workers' messages out of the terminal, they go to their logs
+    console_filter = ThreadFilter()
+    handlers = logging.getLogger().handlers
+    for handler in handlers:
+        handler.addFilter(console_filter)
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+            futures = {
+                executor.submit(
+                    deploy_from_manifest,
+                    deploy_info=deploy_info,
+                    args=args,
+                    log_file=str(
+                        log_dir / f"{deploy_info.pkg_name}-{deploy_info.rel_name}.log"
+                    ),
+                    make_jobs=make_jobs,
+                ): deploy_info.deploy_dir
+                for deploy_info in deploy_infos
+            }
+            for count, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                results[futures[future]] = result
+                logger.info(
+                    f"[{count}/{len(futures)}] {result.name} {result.release}: {result.status}"
+                )
+    finally:
+        for handler in handlers:
+            handler.removeFilter(console_filter)
+
+    results = [results[deploy_info.deploy_dir] for deploy_info in deploy_infos]
+    print_deploy_results(results)
+    if all(result.status in ("deployed", "dry run") for result in results):
+        logger.info("Manifest clone, make, and permission changes complete!")
+        return ReturnCode.SUCCESS
+    return ReturnCode.EXCEPTION
+
+
+def deploy_from_manifest(
+    deploy_info: DeployInfo, args: CliArgs, log_file: str, make_jobs: int = 1
+) -> DeployResult:
+    """
+    Clone, make, and write-protect one IOC from a manifest, like main_deploy.
+
+    This runs on a worker thread: its log messages and the output of git
+    and make go to log_file instead of the terminal.
+    Errors are logged and reported in the status instead of raised.
+    """
+    start = time.monotonic()
+    deploy_dir = deploy_info.deploy_dir
+    handler = logging.FileHandler(log_file)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-8s %(message)s"))
+    handler.addFilter(ThreadFilter())
+    logger.addHandler(handler)
+    step = "clone"
+    try:
+        with open(log_file, "a") as log:
+            logger.info(
+                f"Cloning {args.github_org}/{deploy_info.pkg_name} at {deploy_info.rel_name} "
+                f"to {deploy_dir}"
+            )
+            rval = clone_repo_tag(
+                name=deploy_info.pkg_name,
+                github_org=args.github_org,
+                release=deploy_info.rel_name,
+                deploy_dir=deploy_dir,
+                dry_run=args.dry_run,
+                verbose=args.verbose,
+                mirror_dir=args.mirror_dir,
+                git_url_base=args.git_url_base,
+                log=log,
+            )
+            if rval == ReturnCode.SUCCESS:
+                step = "make"
+                logger.info(f"Building IOC at {deploy_dir}")
+                rval = make_in(
+                    deploy_dir=deploy_dir, dry_run=args.dry_run, log=log, jobs=make_jobs
+                )
+            if rval == ReturnCode.SUCCESS:
+                step = "chmod"
+                logger.info(f"Applying write protection to {deploy_dir}")
+                set_permissions(deploy_dir=deploy_dir, allow_write=False, dry_run=args.dry_run)
+        if rval != ReturnCode.SUCCESS:
+            logger.error(f"Nonzero return value {rval} from {step}")
+            status = f"{step} failed ({rval})"
+        elif args.dry_run:
+            status = "dry run"
+        else:
+            status = "deployed"
+    except Exception as exc:
+        logger.error(exc)
+        logger.debug("Traceback", exc_info=True)
+        status = f"{step} failed: {exc}"
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+    return DeployResult(
+        name=deploy_info.pkg_name,
+        release=deploy_info.rel_name,
+        deploy_dir=deploy_dir,
+        status=status,
+        seconds=time.monotonic() - start,
+        log_file=log_file,
+    )
+
+
+def read_manifest(path: str) -> List[Tuple[str, str, str]]:
+    """
+    Read the (name, release, path_override) entries of a manifest file.
+
+    Each line is "name release [path]", separated by spaces, tabs, or commas.
+    Blank lines and lines starting with # are skipped.
+    The path_override is an empty string if not provided.
+
+    Raises a ValueError if a line is malformed or there are no entries.
+    """
+    entries = []
+    with open(path, "r") as fd:
+        for lineno, line in enumerate(fd, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            words = line.replace(",", " ").split()
+            if len(words) not in (2, 3):
+                raise ValueError(
+                    f"{path}:{lineno}: expected 'name release [path]', got '{line}'"
+                )
+            words.append("")
+            entries.append(tuple(words[:3]))
+    if not entries:
+        raise ValueError(f"No IOCs listed in manifest {path}")
+    return entries
+
+
+def print_deploy_results(results: List[DeployResult]) -> None:
+    """
+    Print a table of the status, duration, and log file of each manifest deploy.
+    """
+    rows = [("name", "release", "status", "time", "log")]
+    for result in results:
+        rows.append(
+            (
+                result.name,
+                result.release,
+                result.status,
+                f"{result.seconds:.0f}s",
+                result.log_file,
+            )
+        )
+    widths = [max(len(row[col]) for row in rows) for col in range(len(rows[0]))]
+    print()
+    for row in rows:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+    print()
+
+
 def main_perms(args: CliArgs) -> int:
     """
     All main steps of the only-apply-permissions action.
@@ -392,7 +796,8 @@ def main_perms(args: CliArgs) -> int:
         if not is_yes(user_text, error_on_empty=False):
             return ReturnCode.NO_CONFIRM
 
-    return set_permissions(deploy_dir=deploy_dir, allow_write=allow_write, dry_run=args.dry_run)
+    set_permissions(deploy_dir=deploy_dir, allow_write=allow_write, dry_run=args.dry_run)
+    return ReturnCode.SUCCESS
 
 
 def main_rebuild(args: CliArgs) -> int:
@@ -410,7 +815,7 @@ def main_rebuild(args: CliArgs) -> int:
         if not is_yes(user_text, error_on_empty=False):
             return ReturnCode.NO_CONFIRM
     set_permissions(deploy_dir=deploy_dir, allow_write=True, dry_run=args.dry_run)
-    rval = make_in(deploy_dir=deploy_dir, dry_run=args.dry_run)
+    rval = make_logged(deploy_dir=deploy_dir, args=args)
     if rval != ReturnCode.SUCCESS:
         logger.error(f"Nonzero return value {rval} from make")
         return rval
@@ -473,8 +878,8 @@ def get_deploy_info(args: CliArgs) -> DeployInfo:
         release = args.release
 
     # Force name into ioc-area-suffix structure before finalize_tag
-    if name and (len(name) < 5 or name[:4] != "ioc-"):
-        new_name = f"ioc-common-{name}"
+    new_name = get_ioc_name(name)
+    if new_name != name:
         logger.warning(f"{name} is not an ioc name, trying {new_name}")
         name = new_name
 
@@ -487,6 +892,8 @@ def get_deploy_info(args: CliArgs) -> DeployInfo:
             release=release,
             auto_confirm=args.auto_confirm,
             verbose=args.verbose,
+            mirror_dir=args.mirror_dir,
+            git_url_base=args.git_url_base,
         )
 
     if name:
@@ -495,6 +902,8 @@ def get_deploy_info(args: CliArgs) -> DeployInfo:
             github_org=args.github_org,
             ioc_dir=args.ioc_dir,
             verbose=args.verbose,
+            mirror_dir=args.mirror_dir,
+            git_url_base=args.git_url_base,
         )
 
     if not args.path_override:
@@ -503,6 +912,15 @@ def get_deploy_info(args: CliArgs) -> DeployInfo:
     return DeployInfo(deploy_dir=deploy_dir, pkg_name=name, rel_name=release)
 
 
+def get_ioc_name(name: str) -> str:
+    """
+    Return name in the ioc-area-suffix structure, as a common IOC if it isn't already.
+    """
+    if name and (len(name) < 5 or name[:4] != "ioc-"):
+        return f"ioc-common-{name}"
+    return name
+
+
 def get_local_target(args: CliArgs) -> str:
     """
     Normalize user inputs and figure out which directory to modify.
@@ -542,7 +960,14 @@ def find_casing_in_dir(dir: str, name: str) -> str:
     raise RuntimeError(f"Did not find {name} in {dir}")
 
 
-def finalize_name(name: str, github_org: str, ioc_dir: str, verbose: bool) -> str:
+def finalize_name(
+    name: str,
+    github_org: str,
+    ioc_dir: str,
+    verbose: bool,
+    mirror_dir: str = "",
+    git_url_base: str = GIT_URL_BASE_DEFAULT,
+) -> str:
     """
     Fix name's casing if necessary, checking existing deployments and github as needed.
     """
@@ -565,7 +990,11 @@ def finalize_name(name: str, github_org: str, ioc_dir: str, verbose: bool) -> st
     except RuntimeError:
         logger.info("This is a new area, checking readme for casing")
         name = casing_from_readme_clone(
-            name=name, github_org=github_org, verbose=verbose
+            name=name,
+            github_org=github_org,
+            verbose=verbose,
+            mirror_dir=mirror_dir,
+            git_url_base=git_url_base,
         )
         logger.info(f"Using casing: {name}")
         return name
@@ -576,7 +1005,11 @@ def finalize_name(name: str, github_org: str, ioc_dir: str, verbose: bool) -> st
     except RuntimeError:
         logger.info("This is a new ioc, checking readme for casing")
         casing = casing_from_readme_clone(
-            name=name, github_org=github_org, verbose=verbose
+            name=name,
+            github_org=github_org,
+            verbose=verbose,
+            mirror_dir=mirror_dir,
+            git_url_base=git_url_base,
         )
         # Use suffix from readme but keep area from directory search
         suffix = split_ioc_name(casing)[2]
@@ -594,11 +1027,98 @@ def split_ioc_name(name: str) -> Tuple[str, str, str]:
     return tuple(name.split("-", maxsplit=2))
 
 
-def casing_from_readme_clone(name: str, github_org: str, verbose: bool) -> str:
+def casing_from_readme_clone(
+    name: str,
+    github_org: str,
+    verbose: bool,
+    mirror_dir: str = "",
+    git_url_base: str = GIT_URL_BASE_DEFAULT,
+) -> str:
+    readme_text = read_remote_readme(
+        name=name,
+        github_org=github_org,
+        verbose=verbose,
+        mirror_dir=mirror_dir,
+        git_url_base=git_url_base,
+    )
+    if readme_text:
+        logger.debug("Successfully read repo readme for casing check")
+    else:
+        logger.debug("Unable to read repo readme for casing check")
+    return casing_from_readme_text(name=name, readme_text=readme_text)
+
+
+def read_remote_readme(
+    name: str,
+    github_org: str,
+    verbose: bool,
+    mirror_dir: str = "",
+    git_url_base: str = GIT_URL_BASE_DEFAULT,
+) -> str:
+    """
+    Return the text of the readme files at the top of the repo's default branch.
+
+    Only the readme is needed, so we try the cheapest source first:
+    - the repo's bare mirror in mirror_dir, if one already exists,
+      which only needs a fetch of the new objects
+    - a blobless clone, which fetches the trees and then only the readme blobs
+    - a full shallow clone, if the blobless clone fails
+
+    The bytes fetched and time taken by each are logged at debug level.
+
+    Raises a ValueError if the repo can't be cloned.
+    """
+    start = time.monotonic()
+    # Creating a mirror is a full clone, leave that to the deploy's clone
+    if mirror_dir and (
+        Path(get_mirror_path(name=name, github_org=github_org, mirror_dir=mirror_dir)) / "HEAD"
+    ).exists():
+        mirror = update_mirror(
+            name=name,
+            github_org=github_org,
+            mirror_dir=mirror_dir,
+            verbose=verbose,
+            git_url_base=git_url_base,
+        )
+        if mirror:
+            try:
+                readme_text = readme_from_git_dir(git_dir=mirror, verbose=verbose)
+            except subprocess.CalledProcessError as exc:
+                logger.debug(f"Unable to read readme from mirror {mirror}: {exc}")
+            else:
+                logger.debug(
+                    f"Read readme from mirror {mirror} in {time.monotonic() - start:.2f}s"
+                )
+                return readme_text
+    with TemporaryDirectory() as tmpdir:
+        git_dir = str(Path(tmpdir) / name / ".git")
+        try:
+            _clone(
+                name=name,
+                github_org=github_org,
+                working_dir=tmpdir,
+                verbose=verbose,
+                git_url_base=git_url_base,
+                blobless=True,
+            )
+            readme_text = readme_from_git_dir(git_dir=git_dir, verbose=verbose)
+        except subprocess.CalledProcessError as exc:
+            logger.debug(f"Blobless clone failed, trying a full clone: {exc}")
+        else:
+            logger.debug(
+                f"Read readme from blobless clone: {get_dir_size(git_dir)} bytes "
+                f"in {time.monotonic() - start:.2f}s"
+            )
+            return readme_text
+    start = time.monotonic()
     with TemporaryDirectory() as tmpdir:
         try:
             _clone(
-                name=name, github_org=github_org, working_dir=tmpdir, verbose=verbose
+                name=name,
+                github_org=github_org,
+                working_dir=tmpdir,
+                verbose=verbose,
+                git_url_base=git_url_base,
             )
         except subprocess.CalledProcessError as exc:
             raise ValueError(
@@ -610,10 +1130,53 @@ def casing_from_readme_clone(name: str, github_org: str, verbose: bool) -> str:
         for readme_path in (Path(tmpdir) / name).glob(pattern):
             with open(readme_path, "r") as fd:
                 readme_text += fd.read()
-            logger.debug("Successfully read repo readme for casing check")
-        if not readme_text:
-            logger.debug("Unable to read repo readme for casing check")
-    return casing_from_readme_text(name=name, readme_text=readme_text)
+        git_size = get_dir_size(str(Path(tmpdir) / name / ".git"))
+        logger.debug(
+            f"Read readme from full clone: {git_size} bytes in {time.monotonic() - start:.2f}s"
+        )
+    return readme_text
+
+
+def readme_from_git_dir(git_dir: str, verbose: bool = False) -> str:
+    """
+    Return the text of the readme files at the top of HEAD in a git dir.
+
+    In a blobless clone, git fetches just these blobs on demand.
+    Raises a subprocess.CalledProcessError if git fails.
+    """
+    kwds = {
+        "check": True,
+        "stdout": subprocess.PIPE,
+        "universal_newlines": True,
+    }
+    if not verbose:
+        kwds["stderr"] = subprocess.PIPE
+    cmd = ["git", "--git-dir", git_dir, "ls-tree", "HEAD"]
+    logger.debug(f"Calling '{' '.join(cmd)}' with kwargs {kwds}")
+    readme_text = ""
+    for line in subprocess.run(cmd, **kwds).stdout.splitlines():
+        # <mode> <type> <object>\t<file name>
+        info, file_name = line.split("\t", maxsplit=1)
+        if info.split()[1] != "blob" or not file_name.lower().startswith("readme"):
+            continue
+        cmd = ["git", "--git-dir", git_dir, "cat-file", "blob", f"HEAD:{file_name}"]
+        logger.debug(f"Calling '{' '.join(cmd)}' with kwargs {kwds}")
+        readme_text += subprocess.run(cmd, **kwds).stdout
+    return readme_text
+
+
+def get_dir_size(path: str) -> int:
+    """
+    Return the total size in bytes of the files in a directory tree.
+    """
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                ...
+    return total
 
 
 def casing_from_readme_text(name: str, readme_text: str) -> str:
@@ -654,7 +1217,13 @@ def casing_from_text(uncased: str, casing_source: str) -> str:
 
 
 def finalize_tag(
-    name: str, github_org: str, release: str, auto_confirm: bool, verbose: bool
+    name: str,
+    github_org: str,
+    release: str,
+    auto_confirm: bool,
+    verbose: bool,
+    mirror_dir: str = "",
+    git_url_base: str = GIT_URL_BASE_DEFAULT,
 ) -> str:
     """
     Check if release is present in the org.
@@ -674,17 +1243,29 @@ def finalize_tag(
             name=name,
             github_org=github_org,
             verbose=verbose,
+            git_url_base=git_url_base,
         )
     except subprocess.CalledProcessError as exc:
         raise ValueError(
             f"Unable to access {github_org}/{name}, "
             "please make sure you have the correct access rights and the repository exists."
         ) from exc
-    for rel in release_permutations(release=release):
-        logger.debug(f"Trying variant {rel}")
-        if rel in tags:
-            logger.info(f"Release {rel} exists in {github_org}/{name}")
-            return rel
+    rel = find_release(release=release, tags=tags)
+    if not rel and TAG_CACHE_TTL > 0:
+        # The cached listing may predate a tag pushed in the last few minutes
+        logger.debug(f"No variant of {release} in the cached tags, listing them again")
+        tags = get_repo_tags(
+            name=name,
+            github_org=github_org,
+            verbose=verbose,
+            git_url_base=git_url_base,
+            use_cache=False,
+        )
+        update_tag_cache(update={get_repo_url(name, github_org, git_url_base): tags})
+        rel = find_release(release=release, tags=tags)
+    if rel:
+        logger.info(f"Release {rel} exists in {github_org}/{name}")
+        return rel
 
     logger.warning(f"Unable to find {release} in {github_org}/{name}")
     if release[0] == "R":
@@ -705,7 +1286,12 @@ def finalize_tag(
         logger.info(f"Cloning {github_org}/{name}")
         try:
             _clone(
-                name=name, github_org=github_org, working_dir=tmpdir, verbose=verbose
+                name=name,
+                github_org=github_org,
+                working_dir=tmpdir,
+                verbose=verbose,
+                mirror_dir=mirror_dir,
+                git_url_base=git_url_base,
             )
         except subprocess.CalledProcessError as exc:
             raise ValueError(
@@ -773,6 +1359,19 @@ def release_permutations(release: str) -> List[str]:
     return try_release
 
 
+def find_release(release: str, tags: List[str]) -> str:
+    """
+    Return the first variant of release that is in tags, see release_permutations.
+
+    Returns an empty string if there are none.
+    """
+    for rel in release_permutations(release=release):
+        logger.debug(f"Trying variant {rel}")
+        if rel in tags:
+            return rel
+    return ""
+
+
 def get_target_dir(name: str, ioc_dir: str, release: str) -> str:
     """
     Return the directory we'll deploy the IOC in.
@@ -791,9 +1390,16 @@ def clone_repo_tag(
     deploy_dir: str,
     dry_run: bool,
     verbose: bool,
+    mirror_dir: str = "",
+    git_url_base: str = GIT_URL_BASE_DEFAULT,
+    log=None,
 ) -> int:
     """
     Create a shallow clone of the git repository in the correct location.
+
+    If mirror_dir is set, objects are copied from the repo's bare mirror there.
+
+    If log is an open file, git's output is written to it.
     """
     # Make sure the parent dir exists
     parent_dir = Path(deploy_dir).resolve().parent
@@ -813,21 +1419,139 @@ def clone_repo_tag(
             release=release,
             target_dir=deploy_dir,
             verbose=verbose,
+            mirror_dir=mirror_dir,
+            git_url_base=git_url_base,
+            log=log,
         ).returncode
 
 
-def make_in(deploy_dir: str, dry_run: bool) -> int:
+def make_in(deploy_dir: str, dry_run: bool, log=None, jobs: int = 1, echo: bool = False) -> int:
     """
     Shell out to make in the deploy dir
+
+    make runs with up to jobs parallel jobs.
+    If log is an open file, make's output is written to it,
+    and also to the terminal if echo is True.
+    The wall time of each top-level directory make recurses into is logged.
+
+    If a parallel make fails, it is run again serially so that the errors
+    aren't interleaved with the output of the other jobs.
     """
     if dry_run:
         logger.info(f"Dry-run: skipping make in {deploy_dir}")
         return ReturnCode.SUCCESS
-    else:
-        return subprocess.run(["make"], cwd=deploy_dir).returncode
+    rval = _make(deploy_dir=deploy_dir, jobs=jobs, log=log, echo=echo)
+    if rval != ReturnCode.SUCCESS and jobs > 1:
+        logger.warning(f"Parallel make failed with return value {rval}, re-running serially")
+        rval = _make(deploy_dir=deploy_dir, jobs=1, log=log, echo=echo)
+        if rval == ReturnCode.SUCCESS:
+            logger.warning(
+                "Serial make succeeded after the parallel make failed, "
+                "the Makefiles may be missing dependencies between directories"
+            )
+    return rval
+
+
+def _make(deploy_dir: str, jobs: int, log=None, echo: bool = False) -> int:
+    """
+    Run make once in deploy_dir for make_in, timing the top-level directories.
+    """
+    cmd = ["make"]
+    if jobs > 1:
+        cmd += [f"--jobs={jobs}", f"--load-average={get_cpu_count()}"]
+    kwds = {"cwd": deploy_dir}
+    if log is not None:
+        kwds["stdout"] = subprocess.PIPE
+        kwds["stderr"] = subprocess.STDOUT
+    logger.debug(f"Calling '{' '.join(cmd)}' with kwargs {kwds}")
+    start = time.monotonic()
+    if log is None:
+        return subprocess.run(cmd, **kwds).returncode
+
+    log.write(f"+ {' '.join(cmd)}\n")
+    log.flush()
+    # {directory: [time entered, total seconds]}
+    timings = {}
+    with subprocess.Popen(cmd, **kwds) as proc:
+        for raw_line in proc.stdout:
+            line = raw_line.decode(errors="replace")
+            log.write(line)
+            if echo:
+                sys.stdout.write(line)
+                sys.stdout.flush()
+            match = MAKE_DIR_RE.match(line.rstrip("\n"))
+            if match is None:
+                continue
+            timing = timings.setdefault(os.path.relpath(match.group(2), deploy_dir), [0.0, 0.0])
+            if match.group(1) == "Entering":
+                timing[0] = time.monotonic()
+            else:
+                timing[1] += time.monotonic() - timing[0]
+    log.flush()
+    for directory, (_, seconds) in timings.items():
+        logger.info(f"make {directory}: {seconds:.1f}s")
+    logger.info(
+        f"make with {jobs} job{'s' if jobs > 1 else ''} returned {proc.returncode} "
+        f"in {time.monotonic() - start:.1f}s"
+    )
+    return proc.returncode
+
+
+def make_logged(deploy_dir: str, args: CliArgs) -> int:
+    """
+    make_in for a single deploy or rebuild: show make's output and keep it in a log file.
+
+    The log goes in args.log_dir, or MAKE_LOG_DIR_DEFAULT if not provided.
+    """
+    if args.dry_run:
+        return make_in(deploy_dir=deploy_dir, dry_run=True)
+    log_dir = Path(args.log_dir or MAKE_LOG_DIR_DEFAULT)
+    log_dir.mkdir(parents=True, exist_ok=True)
+    deploy_path = Path(deploy_dir).resolve()
+    log_file = log_dir / (
+        f"{deploy_path.parent.name}-{deploy_path.name}-{time.strftime('%Y%m%d-%H%M%S')}.log"
+    )
+    jobs = get_make_jobs(args.make_jobs)
+    logger.info(f"Running make with {jobs} job{'s' if jobs > 1 else ''}, logging to {log_file}")
+    with open(log_file, "w") as log:
+        rval = make_in(deploy_dir=deploy_dir, dry_run=False, log=log, jobs=jobs, echo=True)
+    if rval != ReturnCode.SUCCESS:
+        logger.error(f"See {log_file} for the make output")
+    return rval
+
 
+def get_make_jobs(make_jobs: int, concurrent: int = 1) -> int:
+    """
+    Return the number of parallel make jobs to use for each of concurrent builds.
 
-def set_permissions(deploy_dir: str, allow_write: bool, dry_run: bool) -> None:
+    A positive make_jobs is used as is.
+    Otherwise, the cores we may run on that aren't busy according to the
+    1-minute load average are split between the builds, with at least 1 each.
+    """
+    if make_jobs > 0:
+        return make_jobs
+    try:
+        load = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        # Not available on this os
+        load = 0.0
+    return max(int(get_cpu_count() - load) // max(concurrent, 1), 1)
+
+
+def get_cpu_count() -> int:
+    """
+    Return the number of cores this process may run on.
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        # Not available on this os
+        return os.cpu_count() or 1
+
+
+def set_permissions(
+    deploy_dir: str, allow_write: bool, dry_run: bool, jobs: int = PERMS_JOBS_DEFAULT
+) -> Dict[str, int]:
     """
     Apply or remove write permissions from a deploy repo.
 
@@ -838,22 +1562,51 @@ def set_permissions(deploy_dir: str, allow_write: bool, dry_run: bool) -> None:
     allow_write=False involves removing the "w" permissions from all files and directories
     for the owner, group, and other users.
     We will also remove write permissions from the top-level direcotry.
+
+    Only the entries whose mode needs to change are chmodded, using up to
+    jobs threads so that large releases on NFS don't wait on each call in turn.
+    Every entry is still attempted if some fail, then the first error is raised.
+
+    Returns the number of entries "changed", "unchanged" and "failed".
     """
+    counts = {"changed": 0, "unchanged": 0, "failed": 0}
     if dry_run and not os.path.isdir(deploy_dir):
         # Dry run has nothing to do if we didn't build the dir
         # Most things past this point will error out
         logger.info("Dry-run: skipping permission changes on never-made directory")
-        return
-    try:
-        set_one_permission(deploy_dir, allow_write=allow_write, dry_run=dry_run)
-
-        for dirpath, dirnames, filenames in os.walk(deploy_dir):
-            for name in dirnames + filenames:
-                full_path = os.path.join(dirpath, name)
-                set_one_permission(full_path, allow_write=allow_write, dry_run=dry_run)
-    except OSError as exc:
-        logger.error(f"OSError while changing permissions: {exc}")
-        error_path = Path(exc.filename)
+        return counts
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        futures = []
+        for path, mode in walk_modes(deploy_dir, errors=errors):
+            new_mode = get_new_mode(mode, allow_write=allow_write)
+            if new_mode == mode:
+                counts["unchanged"] += 1
+            elif dry_run:
+                logger.info(f"Dry-run: would change {path} from {oct(mode)} to {oct(new_mode)}")
+                counts["changed"] += 1
+            else:
+                logger.debug(f"Changing {path} from {oct(mode)} to {oct(new_mode)}")
+                futures.append(executor.submit(chmod_one, path, new_mode))
+        for future in futures:
+            try:
+                future.result()
+            except OSError as exc:
+                errors.append(exc)
+            else:
+                counts["changed"] += 1
+    counts["failed"] = len(errors)
+    logger.info(
+        f"Permissions of {counts['changed']} entries changed, "
+        f"{counts['unchanged']} unchanged, {counts['failed']} failed"
+    )
+    if errors:
+        exc = errors[0]
+        for error in errors[:PERMS_ERRORS_SHOWN]:
+            logger.error(f"OSError while changing permissions: {error}")
+        if len(errors) > PERMS_ERRORS_SHOWN:
+            logger.error(f"... and {len(errors) - PERMS_ERRORS_SHOWN} more")
+        error_path = Path(exc.filename or deploy_dir)
         logger.error(
             f"Please contact file owner {error_path.owner()} "
             "or someone with sudo permissions if you'd like to change the permissions here."
@@ -866,38 +1619,65 @@ def set_permissions(deploy_dir: str, allow_write: bool, dry_run: bool) -> None:
             f"For example, you might try 'sudo chmod -R {suggest} {deploy_dir}' "
             "from a server you have sudo access on."
         )
-        raise
+        raise exc
 
     logger.info("Write protection change complete!")
+    return counts
 
 
-def set_one_permission(path: str, allow_write: bool, dry_run: bool) -> None:
+def walk_modes(top: str, errors: List[OSError]):
     """
-    Given some file, adjust the permissions as needed for this script.
-
-    If allow_write is True, allow owner and group writes.
-    If allow_write is False, prevent all writes.
+    Yield (path, mode) for top and for everything under it, without following symlinks.
 
-    During a dry run, log what would be changed at info level without
-    making any changes. This log will be present at debug level
-    for verbose mode during real changes.
+    This reuses the os.scandir entries so each path costs a single lstat.
+    Symlinks are skipped if the os can't chmod them without following them.
+    Errors reading a path are appended to errors and that path is skipped.
     """
-    if os.path.islink(path) and not CHMOD_SYMLINKS:
-        logger.debug(f"Skip {path}, os doesn't support follow_symlinks in chmod.")
+    try:
+        yield top, os.stat(top, follow_symlinks=False).st_mode
+    except OSError as exc:
+        errors.append(exc)
         return
-    mode = os.stat(path, follow_symlinks=False).st_mode
+    dirs = [top]
+    while dirs:
+        try:
+            with os.scandir(dirs.pop()) as it:
+                entries = list(it)
+        except OSError as exc:
+            errors.append(exc)
+            continue
+        for entry in entries:
+            if not CHMOD_SYMLINKS and entry.is_symlink():
+                logger.debug(f"Skip {entry.path}, os doesn't support follow_symlinks in chmod.")
+                continue
+            try:
+                mode = entry.stat(follow_symlinks=False).st_mode
+            except OSError as exc:
+                errors.append(exc)
+                continue
+            yield entry.path, mode
+            if stat.S_ISDIR(mode):
+                dirs.append(entry.path)
+
+
+def get_new_mode(mode: int, allow_write: bool) -> int:
+    """
+    Return the mode with owner and group writes allowed, or with all writes prevented.
+    """
     if allow_write:
-        new_mode = mode | stat.S_IWUSR | stat.S_IWGRP
+        return mode | stat.S_IWUSR | stat.S_IWGRP
     else:
-        new_mode = mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
-    if dry_run:
-        logger.info(f"Dry-run: would change {path} from {oct(mode)} to {oct(new_mode)}")
+        return mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+
+
+def chmod_one(path: str, mode: int) -> None:
+    """
+    chmod path without following symlinks where the os supports it.
+    """
+    if CHMOD_SYMLINKS:
+        os.chmod(path, mode, follow_symlinks=False)
     else:
-        logger.debug(f"Changing {path} from {oct(mode)} to {oct(new_mode)}")
-        if CHMOD_SYMLINKS:
-            os.chmod(path, new_mode, follow_symlinks=False)
-        else:
-            os.chmod(path, new_mode)
+        os.chmod(path, mode)
 
 
 def get_version() -> str:
@@ -928,25 +1708,124 @@ def _clone(
     working_dir: str = "",
     target_dir: str = "",
     verbose: bool = False,
+    mirror_dir: str = "",
+    git_url_base: str = GIT_URL_BASE_DEFAULT,
+    blobless: bool = False,
+    log=None,
 ) -> subprocess.CompletedProcess:
     """
     Clone the repo or raise a subprocess.CalledProcessError
+
+    If mirror_dir is set, the repo's bare mirror there is brought up to date
+    first and used as a reference, so only objects missing from the mirror are
+    fetched. The clone is dissociated from the mirror afterwards.
+
+    If blobless is True, no files are checked out and file contents are only
+    fetched when git needs them.
+
+    If log is an open file, git's output is written to it.
     """
-    cmd = ["git", "clone", f"git@github.com:{github_org}/{name}", "--depth", "1"]
+    cmd = ["git", "clone", get_repo_url(name, github_org, git_url_base), "--depth", "1"]
     if release:
         cmd.extend(["-b", release])
+    if blobless:
+        cmd.extend(["--filter=blob:none", "--no-checkout"])
+    if mirror_dir:
+        mirror = update_mirror(
+            name=name,
+            github_org=github_org,
+            mirror_dir=mirror_dir,
+            verbose=verbose,
+            git_url_base=git_url_base,
+        )
+        if mirror:
+            cmd.extend(["--reference", mirror, "--dissociate"])
     if target_dir:
         cmd.append(target_dir)
     kwds = {"check": True}
     if working_dir:
         kwds["cwd"] = working_dir
-    if not verbose:
+    if log is not None:
+        kwds["stdout"] = log
+        kwds["stderr"] = subprocess.STDOUT
+    elif not verbose:
         kwds["stdout"] = subprocess.PIPE
         kwds["stderr"] = subprocess.PIPE
     logger.debug(f"Calling '{' '.join(cmd)}' with kwargs {kwds}")
     return subprocess.run(cmd, **kwds)
 
 
+def get_repo_url(name: str, github_org: str, git_url_base: str = GIT_URL_BASE_DEFAULT) -> str:
+    """
+    Return the url to clone a repo from, e.g. git@github.com:pcdshub/ioc-common-foo
+    """
+    return f"{git_url_base}{github_org}/{name}"
+
+
+def get_git_host(git_url_base: str = GIT_URL_BASE_DEFAULT) -> str:
+    """
+    Return the host name in a git url base, or an empty string for local urls.
+    """
+    if git_url_base.startswith("file://") or ":" not in git_url_base:
+        return ""
+    if "://" in git_url_base:
+        host = git_url_base.split("://", maxsplit=1)[1].split("/", maxsplit=1)[0]
+    else:
+        # scp-like syntax, e.g. git@github.com:
+        host = git_url_base.split(":", maxsplit=1)[0]
+    return host.rsplit("@", maxsplit=1)[-1].split(":", maxsplit=1)[0]
+
+
+def get_mirror_path(name: str, github_org: str, mirror_dir: str) -> str:
+    """
+    Return the path to the bare mirror of a repo in mirror_dir.
+
+    GitHub names are case-insensitive, so the path is all lowercase.
+    """
+    return str(Path(mirror_dir) / github_org.lower() / f"{name.lower()}.git")
+
+
+def update_mirror(
+    name: str,
+    github_org: str,
+    mirror_dir: str,
+    verbose: bool = False,
+    git_url_base: str = GIT_URL_BASE_DEFAULT,
+) -> str:
+    """
+    Create or fetch the bare mirror of a repo, at most once per run.
+
+    Returns the path to the mirror, or an empty string if it could not be
+    created or fetched, in which case clones go without it.
+    """
+    path = get_mirror_path(name=name, github_org=github_org, mirror_dir=mirror_dir)
+    with _mirror_locks_lock:
+        lock = _mirror_locks.setdefault(path, threading.Lock())
+    with lock:
+        if path in _fetched_mirrors:
+            return path
+        if (Path(path) / "HEAD").exists():
+            logger.debug(f"Fetching mirror {path}")
+            cmd = ["git", "-C", path, "fetch", "--prune", "origin"]
+        else:
+            logger.debug(f"Creating mirror {path}")
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            url = get_repo_url(name, github_org, git_url_base)
+            cmd = ["git", "clone", "--mirror", url, path]
+        kwds = {"check": True}
+        if not verbose:
+            kwds["stdout"] = subprocess.PIPE
+            kwds["stderr"] = subprocess.PIPE
+        logger.debug(f"Calling '{' '.join(cmd)}' with kwargs {kwds}")
+        try:
+            subprocess.run(cmd, **kwds)
+        except (subprocess.CalledProcessError, OSError) as exc:
+            logger.warning(f"Unable to update mirror {path}, cloning without it: {exc}")
+            return ""
+        _fetched_mirrors.add(path)
+    return path
+
+
 def _tag(
     release: str,
     message: str = "",
@@ -991,7 +1870,23 @@ def _push_tag(
         kwds["stdout"] = subprocess.PIPE
         kwds["stderr"] = subprocess.PIPE
     logger.debug(f"Calling '{' '.join(cmd)}' with kwargs {kwds}")
-    return subprocess.run(cmd, **kwds)
+    proc = subprocess.run(cmd, **kwds)
+    # The cached tag listing for this repo is now missing the new tag
+    try:
+        url = subprocess.run(
+            ["git", "remote", "get-url", "origin"],
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            cwd=working_dir or None,
+        ).stdout.strip()
+    except subprocess.CalledProcessError:
+        logger.debug("Unable to find the origin url, clearing the whole tag cache")
+        update_tag_cache(clear=True)
+    else:
+        update_tag_cache(remove=[url])
+    return proc
 
 
 def get_last_commit_info(
@@ -1015,13 +1910,20 @@ def get_last_commit_info(
     return subprocess.run(cmd, **kwds).stdout
 
 
-def get_github_available(verbose: bool = False) -> bool:
+def get_github_available(
+    git_url_base: str = GIT_URL_BASE_DEFAULT, verbose: bool = False
+) -> bool:
     """
-    Return whether or not github is available.
+    Return whether or not github, or the host in git_url_base, is available.
+
+    Local urls are always available.
     """
+    hostname = get_git_host(git_url_base)
+    if not hostname:
+        return True
     try:
         _ping(
-            hostname="github.com",
+            hostname=hostname,
             count=1,
             wait=1.0,
             tries=3,
@@ -1070,26 +1972,158 @@ def get_repo_tags(
     name: str,
     github_org: str,
     verbose: bool = False,
+    git_url_base: str = GIT_URL_BASE_DEFAULT,
+    use_cache: bool = True,
 ) -> List[str]:
     """
     Get a list of tags that exist in the github repo.
 
+    Listings are kept in TAG_CACHE_FILE for TAG_CACHE_TTL seconds, which can
+    be set with $IOC_DEPLOY_TAG_CACHE_TTL (0 disables the cache).
+    With use_cache=False the cache is neither read nor written.
+
     Raises a subprocess.CalledProcessError if the repo doesn't exist
     or we have insufficient permissions.
     """
-    lines = _ls_remote(name=name, github_org=github_org, verbose=verbose)
+    url = get_repo_url(name, github_org, git_url_base)
+    if use_cache:
+        tags = get_cached_tags(url)
+        if tags is not None:
+            logger.debug(f"Using cached tags for {url}")
+            return tags
+    lines = _ls_remote(
+        name=name, github_org=github_org, verbose=verbose, git_url_base=git_url_base
+    )
     tags = []
     for line in lines:
         if "refs/tags/" not in line:
             continue
         tags.append(line.split("refs/tags/")[-1])
+    if use_cache:
+        update_tag_cache(update={url: tags})
     return tags
 
 
+def get_many_repo_tags(
+    repos: List[Tuple[str, str]],
+    verbose: bool = False,
+    git_url_base: str = GIT_URL_BASE_DEFAULT,
+    jobs: int = MANIFEST_JOBS_DEFAULT,
+) -> Dict[Tuple[str, str], List[str]]:
+    """
+    Get the tags of many (name, github_org) repos at once.
+
+    Cached listings are reused, and the other remotes are listed on up to
+    jobs threads, then cached together.
+    Repos that can't be listed are left out of the result:
+    get_repo_tags will raise for them when they are needed.
+    """
+    results = {}
+    todo = []
+    for name, github_org in sorted(set(repos)):
+        tags = get_cached_tags(get_repo_url(name, github_org, git_url_base))
+        if tags is None:
+            todo.append((name, github_org))
+        else:
+            results[(name, github_org)] = tags
+    logger.debug(f"{len(results)} tag listings cached, listing {len(todo)} remotes")
+    if not todo:
+        return results
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = {
+            executor.submit(
+                get_repo_tags,
+                name=name,
+                github_org=github_org,
+                verbose=verbose,
+                git_url_base=git_url_base,
+                use_cache=False,
+            ): (name, github_org)
+            for name, github_org in todo
+        }
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except subprocess.CalledProcessError as exc:
+                logger.debug(f"Unable to list tags for {futures[future]}: {exc}")
+    update_tag_cache(
+        update={
+            get_repo_url(name, github_org, git_url_base): results[(name, github_org)]
+            for name, github_org in todo
+            if (name, github_org) in results
+        }
+    )
+    return results
+
+
+def get_cached_tags(url: str) -> Optional[List[str]]:
+    """
+    Return the cached tags of the repo at url, or None if they are missing or stale.
+    """
+    if TAG_CACHE_TTL <= 0:
+        return None
+    entry = _read_tag_cache().get(url)
+    if entry is None or not 0 <= time.time() - entry[0] < TAG_CACHE_TTL:
+        return None
+    return entry[1]
+
+
+def update_tag_cache(
+    update: Optional[Dict[str, List[str]]] = None,
+    remove: Optional[List[str]] = None,
+    clear: bool = False,
+) -> None:
+    """
+    Add the tags of some repo urls to TAG_CACHE_FILE, and remove others.
+
+    Stale entries are dropped, and the file is replaced atomically so
+    concurrent runs only ever see a complete cache.
+    Failing to write the cache is not an error.
+    """
+    if TAG_CACHE_TTL <= 0:
+        return
+    with _tag_cache_lock:
+        now = time.time()
+        cache = {}
+        if not clear:
+            cache = {
+                url: entry
+                for url, entry in _read_tag_cache().items()
+                if 0 <= now - entry[0] < TAG_CACHE_TTL
+            }
+        for url, tags in (update or {}).items():
+            cache[url] = [now, tags]
+        for url in remove or []:
+            cache.pop(url, None)
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            fd, tmp_file = mkstemp(dir=str(CACHE_DIR), prefix=".tags-", suffix=".json")
+            with os.fdopen(fd, "w") as tmp:
+                json.dump(cache, tmp)
+            os.replace(tmp_file, TAG_CACHE_FILE)
+        except OSError as exc:
+            logger.debug(f"Unable to write the tag cache {TAG_CACHE_FILE}: {exc}")
+
+
+def _read_tag_cache() -> Dict[str, list]:
+    """
+    Return the {url: [time, tags]} contents of TAG_CACHE_FILE, empty if unreadable.
+    """
+    try:
+        with open(TAG_CACHE_FILE, "r") as fd:
+            cache = json.load(fd)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict):
+        return {}
+    return cache
+
+
 def _ls_remote(
     name: str,
     github_org: str,
     verbose: bool = False,
+    git_url_base: str = GIT_URL_BASE_DEFAULT,
 ) -> List[str]:
     """
     Return git ls-remote's output or raise a subprocess.CalledProcessError
@@ -1108,7 +2142,7 @@ def _ls_remote(
         "ls-remote",
         "--tags",
         "--refs",
-        f"git@github.com:{github_org}/{name}",
+        get_repo_url(name, github_org, git_url_base),
     ]
     kwds = {
         "stdout": subprocess.PIPE,
@@ -1170,13 +2204,22 @@ def _main() -> int:
             print(get_version())
             return ReturnCode.SUCCESS
         logger.info("Checking inputs")
-        if not (args.name and args.release) and not args.path_override:
+        if args.manifest:
+            if args.name or args.release or args.path_override:
+                logger.error(
+                    "--manifest can't be combined with --name, --release, or --path-override. "
+                    "Check ioc-deploy --help for usage."
+                )
+                return ReturnCode.EXCEPTION
+        elif not (args.name and args.release) and not args.path_override:
             logger.error(
-                "Must provide both --name and --release, or --path-override. "
+                "Must provide both --name and --release, --path-override, or --manifest. "
                 "Check ioc-deploy --help for usage."
             )
             return ReturnCode.EXCEPTION
-        if not args.subparser:
+        if not args.subparser and args.manifest:
+            rval = main_manifest(args)
+        elif not args.subparser:
             rval = main_deploy(args)
         elif args.subparser == PERMS_CMD:
             rval = main_perms(args)
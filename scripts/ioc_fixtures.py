@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Builds a synthetic PCDS tree, for running and benchmarking grep_more_ioc
+and getPVAliases without /cds/group/pcds. Point the tools at it with
+PCDS_ROOT, see constants.
+
+Usage: python ioc_fixtures.py [-h] [-n IOCS] [-H HUTCHES] [-r RECORDS] root
+"""
+###############################################################################
+# %% Imports
+###############################################################################
+
+import argparse
+import os.path
+
+###############################################################################
+# %% Global settings
+###############################################################################
+
+# Hutch codes to use, more hutches than these are named h12, h13, ...
+HUTCHES = ['xpp', 'xcs', 'cxi', 'mfx', 'mec', 'tmo', 'rix', 'txi', 'ued',
+           'kfe', 'lfe', 'tst']
+
+# Child IOCs that share a release directory, as in a real motor release
+IOCS_PER_RELEASE = 10
+
+# Child IOCs that share a parent release
+IOCS_PER_PARENT = 100
+
+# The motor record fields aliased by the parent alias.db files
+ALIAS_FIELDS = ['RBV', 'VAL', 'DMOV', 'STOP', 'HLM', 'LLM', 'VELO', 'ACCL',
+                'DESC', 'EGU', 'MSTA']
+
+###############################################################################
+# %% Functions
+###############################################################################
+
+
+def procmgr_entry(ioc: str, host: str, port: int, dir_path: str,
+                  i: int) -> str:
+    """
+    Returns a procmgr_config entry in iocmanager's pseudo-python format.
+    Depending on 'i', it has a history on its own line, is disabled, or
+    has an alias and delay, like the entries of the real files.
+    """
+    entry = (f" {{id:'{ioc}', host: '{host}', port: {port},"
+             f" dir: '{dir_path}'")
+    if i % 4 == 0:
+        base = dir_path.rsplit('.', maxsplit=1)[0]
+        entry += f",\n  history: ['{base}.9', '{base}.8']"
+    if i % 5 == 0:
+        entry += ', disable: True'
+    if i % 7 == 0:
+        entry += ", alias: 'Synthetic IOC', delay: 5"
+    return entry + '}'
+
+
+def write_iocmanager_cfg(file: str, entries: list[str]) -> str:
+    """
+    Writes an iocmanager.cfg with the procmgr_config 'entries'. Returns
+    the path to the file.
+    """
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    with open(file, 'w', encoding='utf-8') as _f:
+        _f.write('COMMITHOST = "psbuild-rhel7"\n'
+                 + 'allow_console = True\n\n'
+                 + "hosts = [\n   'ioc-tst-00',\n]\n\n"
+                 + 'procmgr_config = [\n' + ',\n'.join(entries) + ',\n]\n')
+    return file
+
+
+def make_parent(release: str, n_fields: int):
+    """Writes a parent release with a motor db/alias.db"""
+    os.makedirs(os.path.join(release, 'db'), exist_ok=True)
+    with open(os.path.join(release, 'db', 'alias.db'), 'w',
+              encoding='utf-8') as _f:
+        _f.write('alias("$(RECORD)","$(ALIAS)")\n'
+                 + ''.join(f'alias("$(RECORD).{field}", "$(ALIAS).{field}")\n'
+                           for field in ALIAS_FIELDS[:n_fields]))
+
+
+def make_child(release: str, ioc: str, parent: str, n_records: int,
+               with_cfg: bool = True):
+    """
+    Writes the IOC.cfg of a child IOC pointing at 'parent', and its st.cmd
+    loading the parent alias.db for 'n_records' motors.
+    """
+    prefix = ioc.split('-')[1].upper()
+    number = ioc.rsplit('-', maxsplit=1)[-1]
+    boot = os.path.join(release, 'build', 'iocBoot', ioc)
+    os.makedirs(boot, exist_ok=True)
+    if with_cfg:
+        with open(os.path.join(release, f'{ioc}.cfg'), 'w',
+                  encoding='utf-8') as _f:
+            _f.write(f'RELEASE={parent}\n'
+                     '# Synthetic child IOC\n'
+                     'ENGINEER=nobody\n'
+                     f'LOCATION={prefix}:{number}\n'
+                     f'epicsEnvSet("IP", "172.21.{len(ioc)}.{len(number)}")\n'
+                     + ''.join(f'MOTOR({m}, {prefix}:MMS:{number}:m{m},'
+                               f' {prefix}:USR:{number}:m{m})\n'
+                               for m in range(n_records)))
+    with open(os.path.join(boot, 'envPaths'), 'w', encoding='utf-8') as _f:
+        _f.write(f'epicsEnvSet("TOP", "{release}")\n'
+                 f'epicsEnvSet("IOC_PARENT", "{parent}")\n')
+    with open(os.path.join(boot, 'st.cmd'), 'w', encoding='utf-8') as _f:
+        _f.write('#!../../bin/rhel7-x86_64/ims\n< envPaths\n'
+                 + ''.join('dbLoadRecords("$(IOC_PARENT)/db/alias.db",'
+                           f' "RECORD={prefix}:MMS:{number}:m{m},'
+                           f'ALIAS={prefix}:USR:{number}:m{m}")\n'
+                           for m in range(n_records)))
+
+
+def make_pcds_tree(root: str, n_iocs: int, n_hutches: int = 4,
+                   n_records: int = 3, missing_every: int = 9) -> dict:
+    """
+    Builds a synthetic PCDS tree under 'root' with the layout of
+    /cds/group/pcds.
+
+    Parameters
+    ----------
+    root : str
+        Directory to build the tree in, used as PCDS_ROOT.
+    n_iocs : int
+        Number of child IOCs, spread over the hutches.
+    n_hutches : int, optional
+        Number of hutches with an iocmanager.cfg. The default is 4.
+    n_records : int, optional
+        Number of aliased motor records in each st.cmd. The default is 3.
+    missing_every : int, optional
+        Every 'missing_every'th child IOC of a hutch has no IOC.cfg, as
+        happens for retired IOCs. The default is 9, 0 for none.
+
+    Returns
+    -------
+    dict
+        The number of 'hutches', 'iocs' and 'parents' made.
+    """
+    root = os.path.abspath(root)
+    epics = os.path.join(root, 'epics')
+    extra = [f'h{i:02d}' for i in range(len(HUTCHES), n_hutches)]
+    hutches = (HUTCHES + extra)[:n_hutches]
+    entries = {hutch: [] for hutch in hutches}
+    parents = set()
+    for i in range(n_iocs):
+        hutch = hutches[i % len(hutches)]
+        n = i // len(hutches)
+        ioc = f'ioc-{hutch}-ims-{n:05d}'
+        dir_path = f'ioc/{hutch}/ims/R1.0.{n // IOCS_PER_RELEASE}'
+        parent_n = i // IOCS_PER_PARENT
+        parent = os.path.join(epics, 'ioc', 'common', 'ims',
+                              f'R2.{parent_n}.0')
+        if parent_n not in parents:
+            make_parent(parent, 4 + parent_n % (len(ALIAS_FIELDS) - 3))
+            parents.add(parent_n)
+        make_child(os.path.join(epics, dir_path), ioc, parent, n_records,
+                   with_cfg=(missing_every == 0 or n % missing_every != 3))
+        entries[hutch].append(procmgr_entry(
+            ioc, f'ioc-{hutch}-mot{n % 8:02d}', 30000 + n % 1000, dir_path,
+            n))
+    for hutch in hutches:
+        write_iocmanager_cfg(os.path.join(root, 'pyps', 'config', hutch,
+                                          'iocmanager.cfg'), entries[hutch])
+    return {'hutches': len(hutches), 'iocs': n_iocs, 'parents': len(parents)}
+
+###############################################################################
+# %% Arg Parser
+###############################################################################
+
+
+def build_parser():
+    """
+    Builds the parser for the tree generator
+    """
+    parser = argparse.ArgumentParser(
+        prog='ioc_fixtures',
+        description='Builds a synthetic PCDS tree of iocmanager.cfg files,'
+                    ' child IOCs and parent releases. Use it with'
+                    ' PCDS_ROOT=<root> grep_more_ioc ...')
+    parser.add_argument('root', type=str,
+                        help='Directory to build the tree in.')
+    parser.add_argument('-n', '--iocs', type=int, default=100,
+                        help='Number of child IOCs. Default: 100')
+    parser.add_argument('-H', '--hutches', type=int, default=4,
+                        help='Number of hutches. Default: 4')
+    parser.add_argument('-r', '--records', type=int, default=3,
+                        help='Aliased records per st.cmd. Default: 3')
+    return parser
+
+###############################################################################
+# %% Main
+###############################################################################
+
+
+def main():
+    """
+    Main entry point of the program.
+    """
+    args = build_parser().parse_args()
+    counts = make_pcds_tree(args.root, args.iocs, n_hutches=args.hutches,
+                            n_records=args.records)
+    print(f'Made {counts["iocs"]} IOCs in {counts["hutches"]} hutches with'
+          f' {counts["parents"]} parent releases.\n'
+          f'export PCDS_ROOT={os.path.abspath(args.root)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+"""
+Snapshots of the IOC manager state of all hutches, and diffs between them
+
+Usage: python ioc_snapshot.py {take,list,diff} [-h]
+"""
+###############################################################################
+# %% Imports
+###############################################################################
+
+import argparse
+import hashlib
+import json
+import os.path
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from typing import Iterable, Optional
+
+from colorama import Fore, Style
+from constants import CACHE_DIR
+from grep_more_ioc import iter_ioc
+
+###############################################################################
+# %% Global settings
+###############################################################################
+
+# The snapshot database
+SNAPSHOT_FILE = os.path.join(CACHE_DIR, 'ioc_snapshots.sqlite')
+
+# Keys compared by default when diffing IOCs
+DIFF_KEYS = ['dir', 'host', 'port', 'disable']
+
+# Records are stored once per content hash. Each snapshot only stores the
+# IOCs that changed since the previous one, with a NULL record_hash for the
+# removed IOCs, and 'state' holds the IOCs of the latest snapshot.
+_SNAPSHOT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    hash TEXT PRIMARY KEY,
+    record TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    taken REAL NOT NULL,
+    content_hash TEXT NOT NULL,
+    n_records INTEGER NOT NULL,
+    n_changes INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    snapshot INTEGER NOT NULL,
+    ioc TEXT NOT NULL,
+    record_hash TEXT,
+    PRIMARY KEY (snapshot, ioc)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS changes_ioc ON changes (ioc, snapshot);
+CREATE TABLE IF NOT EXISTS state (
+    ioc TEXT PRIMARY KEY,
+    record_hash TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+###############################################################################
+# %% Functions
+###############################################################################
+
+
+def record_hash(record: dict) -> tuple[str, str]:
+    """Returns the content hash of a record and its canonical json"""
+    text = json.dumps(record, sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(text.encode('utf-8'),
+                           digest_size=16).hexdigest(), text
+
+
+def ioc_keys(records: Iterable[dict]) -> dict[str, dict]:
+    """
+    Keys the find_ioc records by 'hutch/id', numbering any repeated id
+    within a hutch as 'hutch/id#2' and so on.
+    """
+    result = {}
+    for record in records:
+        key = f"{record.get('hutch', '')}/{record.get('id', '')}"
+        n = 1
+        while (key if n == 1 else f'{key}#{n}') in result:
+            n += 1
+        result[key if n == 1 else f'{key}#{n}'] = record
+    return result
+
+
+def _diff_value(record: Optional[dict], key: str):
+    """The value of 'key' compared by diff, a missing disable is False"""
+    if record is None:
+        return None
+    if key == 'disable':
+        return record.get(key, False)
+    return record.get(key)
+
+
+class SnapshotStore:
+    """
+    Snapshots of find_ioc records stored in sqlite.
+
+    Records are deduplicated across snapshots by content hash, and each
+    snapshot only stores the IOCs that changed since the one before. This
+    keeps snapshots compact, and lets diff read only the IOCs that changed
+    between two snapshots.
+
+    Parameters
+    ----------
+    db_file : str, optional
+        The sqlite file of the store. The default is SNAPSHOT_FILE.
+    """
+
+    def __init__(self, db_file: str = None):
+        if db_file is None:
+            db_file = SNAPSHOT_FILE
+        os.makedirs(os.path.dirname(os.path.abspath(db_file)), exist_ok=True)
+        self.db_file = db_file
+        self._db = sqlite3.connect(db_file)
+        self._db.executescript(_SNAPSHOT_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Closes the sqlite connection"""
+        self._db.close()
+
+    def take(self, records: Iterable[dict], taken: float = None) -> int:
+        """
+        Stores a snapshot of 'records', see ioc_keys.
+
+        Parameters
+        ----------
+        records : Iterable[dict]
+            The find_ioc records of all hutches.
+        taken : float, optional
+            The unix time of the snapshot. The default is now.
+
+        Returns
+        -------
+        int
+            The id of the new snapshot.
+        """
+        if taken is None:
+            taken = time.time()
+        hashes = {}
+        texts = {}
+        for key, record in ioc_keys(records).items():
+            hashes[key], text = record_hash(record)
+            texts[hashes[key]] = text
+        content_hash = hashlib.blake2b(
+            json.dumps(sorted(hashes.items())).encode('utf-8'),
+            digest_size=16).hexdigest()
+        with self._db:
+            old = dict(self._db.execute('SELECT ioc, record_hash FROM state'))
+            changes = [(key, h) for key, h in hashes.items()
+                       if old.get(key) != h]
+            changes += [(key, None) for key in old if key not in hashes]
+            snapshot = self._db.execute(
+                'INSERT INTO snapshots'
+                ' (taken, content_hash, n_records, n_changes)'
+                ' VALUES (?, ?, ?, ?)',
+                (taken, content_hash, len(hashes), len(changes))).lastrowid
+            self._db.executemany(
+                'INSERT OR IGNORE INTO records (hash, record) VALUES (?, ?)',
+                [(h, texts[h]) for _, h in changes if h is not None])
+            self._db.executemany(
+                'INSERT INTO changes (snapshot, ioc, record_hash)'
+                ' VALUES (?, ?, ?)',
+                [(snapshot, key, h) for key, h in changes])
+            self._db.executemany('DELETE FROM state WHERE ioc = ?',
+                                 [(key,) for key, h in changes if h is None])
+            self._db.executemany(
+                'INSERT OR REPLACE INTO state (ioc, record_hash)'
+                ' VALUES (?, ?)',
+                [(key, h) for key, h in changes if h is not None])
+        return snapshot
+
+    def snapshots(self) -> list[tuple[int, float, str, int, int]]:
+        """
+        Returns the (id, taken, content_hash, n_records, n_changes) of
+        every snapshot, oldest first.
+        """
+        return self._db.execute(
+            'SELECT id, taken, content_hash, n_records, n_changes'
+            ' FROM snapshots ORDER BY id').fetchall()
+
+    def _records(self, hashes: Iterable[str]) -> dict[str, dict]:
+        """Returns the records of the content hashes"""
+        hashes = [h for h in set(hashes) if h is not None]
+        result = {}
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i+500]
+            result.update((h, json.loads(text)) for h, text in
+                          self._db.execute(
+                              'SELECT hash, record FROM records WHERE hash IN'
+                              f' ({", ".join("?" * len(chunk))})', chunk))
+        return result
+
+    def _hash_at(self, ioc: str, snapshot: int) -> Optional[str]:
+        """Returns the record hash of 'ioc' as of 'snapshot'"""
+        row = self._db.execute(
+            'SELECT record_hash FROM changes WHERE ioc = ? AND snapshot <= ?'
+            ' ORDER BY snapshot DESC LIMIT 1', (ioc, snapshot)).fetchone()
+        return None if row is None else row[0]
+
+    def records(self, snapshot: int) -> dict[str, dict]:
+        """Returns the records of a snapshot, keyed as in ioc_keys"""
+        hashes = dict(self._db.execute(
+            'SELECT ioc, record_hash FROM changes c WHERE snapshot = ('
+            ' SELECT MAX(snapshot) FROM changes'
+            ' WHERE ioc = c.ioc AND snapshot <= ?)', (snapshot,)))
+        records = self._records(hashes.values())
+        return {key: records[h] for key, h in sorted(hashes.items())
+                if h is not None}
+
+    def diff(self, old: int, new: int,
+             keys: list[str] = None) -> list[tuple[str, dict, dict]]:
+        """
+        Compares two snapshots, only reading the IOCs that changed between
+        them.
+
+        Parameters
+        ----------
+        old : int
+            The id of the snapshot to compare from.
+        new : int
+            The id of the snapshot to compare to.
+        keys : list[str], optional
+            Only report IOCs that differ in these keys. The default is
+            DIFF_KEYS, use an empty list to compare the whole records.
+
+        Returns
+        -------
+        list[tuple[str, dict, dict]]
+            The (ioc, old record, new record) of each IOC that differs,
+            sorted by ioc. The old record is None for added IOCs, and the
+            new record is None for removed IOCs.
+        """
+        if keys is None:
+            keys = DIFF_KEYS
+        first, last = sorted((old, new))
+        # the latest change of each IOC in between is its state at 'last'
+        hashes = dict(self._db.execute(
+            'SELECT ioc, record_hash FROM changes'
+            ' WHERE snapshot > ? AND snapshot <= ? ORDER BY snapshot',
+            (first, last)))
+        pairs = {ioc: (self._hash_at(ioc, first), h)
+                 for ioc, h in hashes.items()}
+        if old > new:
+            pairs = {ioc: (b, a) for ioc, (a, b) in pairs.items()}
+        pairs = {ioc: pair for ioc, pair in pairs.items() if pair[0] != pair[1]}
+        records = self._records(h for pair in pairs.values() for h in pair)
+        result = []
+        for ioc, (a, b) in sorted(pairs.items()):
+            rec_a, rec_b = records.get(a), records.get(b)
+            if (rec_a is None or rec_b is None or len(keys) == 0
+                    or any(_diff_value(rec_a, k) != _diff_value(rec_b, k)
+                           for k in keys)):
+                result.append((ioc, rec_a, rec_b))
+        return result
+
+    def resolve(self, ref: str) -> int:
+        """
+        Returns the snapshot id of 'ref', which is either an id or
+        'latest', 'latest~1' for the one before, and so on.
+
+        Raises
+        ------
+        ValueError
+            The snapshot does not exist.
+        """
+        ids = [row[0] for row in self._db.execute(
+            'SELECT id FROM snapshots ORDER BY id')]
+        if ref.startswith('latest'):
+            back = int(ref.split('~', maxsplit=1)[1]) if '~' in ref else 0
+            if back < len(ids):
+                return ids[-1-back]
+        elif ref.isdigit() and int(ref) in ids:
+            return int(ref)
+        raise ValueError(f'No snapshot {ref}')
+
+
+def print_diff(diff: list[tuple[str, dict, dict]], keys: list[str] = None):
+    """Prints the result of SnapshotStore.diff"""
+    if keys is None:
+        keys = DIFF_KEYS
+    for ioc, old, new in diff:
+        if old is None:
+            print(f'{Fore.LIGHTGREEN_EX}+ {ioc}{Style.RESET_ALL}  '
+                  + ', '.join(f'{k}={_diff_value(new, k)}'
+                              for k in keys or new))
+        elif new is None:
+            print(f'{Fore.LIGHTRED_EX}- {ioc}{Style.RESET_ALL}  '
+                  + ', '.join(f'{k}={_diff_value(old, k)}'
+                              for k in keys or old))
+        else:
+            changed = [k for k in (keys or dict.fromkeys([*old, *new]))
+                       if _diff_value(old, k) != _diff_value(new, k)]
+            print(f'{Fore.LIGHTYELLOW_EX}~ {ioc}{Style.RESET_ALL}  '
+                  + ', '.join(f'{k}: {_diff_value(old, k)} -> '
+                              f'{_diff_value(new, k)}' for k in changed))
+
+###############################################################################
+# %% Arg Parser
+###############################################################################
+
+
+def build_parser():
+    """
+    Builds the parser & subparsers for the main function
+    """
+    parser = argparse.ArgumentParser(
+        prog='ioc_snapshot',
+        description='Takes snapshots of the iocmanager.cfg records of all'
+                    ' hutches and shows what changed between them.',
+        epilog='Snapshots are referred to by id, or as latest, latest~1,'
+               ' latest~2, ...')
+    parser.add_argument('--db', type=str, default=SNAPSHOT_FILE,
+                        help=f'Snapshot database. Default: {SNAPSHOT_FILE}')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('take', help='Take a snapshot of all hutches.')
+
+    subparsers.add_parser('list', help='List the snapshots.')
+
+    diff = subparsers.add_parser('diff', help='Show the IOCs that changed'
+                                 ' between two snapshots.')
+    diff.add_argument('old', type=str, nargs='?', default='latest~1',
+                      help='Snapshot to compare from. Default: latest~1')
+    diff.add_argument('new', type=str, nargs='?', default='latest',
+                      help='Snapshot to compare to. Default: latest')
+    diff.add_argument('-a', '--all_keys', action='store_true',
+                      default=False,
+                      help='Compare every key instead of only '
+                      + ', '.join(DIFF_KEYS))
+    return parser
+
+###############################################################################
+# %% Main
+###############################################################################
+
+
+def main():
+    """
+    Main entry point of the program.
+    """
+    args = build_parser().parse_args()
+    with SnapshotStore(args.db) as store:
+        if args.command == 'take':
+            snapshot = store.take(iter_ioc('all', '', tag_hutch=True))
+            _, _, _, n_records, n_changes = store.snapshots()[-1]
+            print(f'Took snapshot {snapshot}: {n_records} IOCs,'
+                  f' {n_changes} changed')
+        elif args.command == 'list':
+            print(f'{"id":>6}  {"taken":<19}  {"IOCs":>6}  {"changed":>7}'
+                  '  content')
+            for snapshot, taken, content, n_records, n_changes in (
+                    store.snapshots()):
+                print(f'{snapshot:>6}  '
+                      f'{datetime.fromtimestamp(taken):%Y-%m-%d %H:%M:%S}  '
+                      f'{n_records:>6}  {n_changes:>7}  {content[:12]}')
+        elif args.command == 'diff':
+            try:
+                old, new = store.resolve(args.old), store.resolve(args.new)
+            except ValueError as e:
+                print(f'{Fore.RED}{e}{Style.RESET_ALL}')
+                sys.exit(1)
+            keys = [] if args.all_keys else DIFF_KEYS
+            diff = store.diff(old, new, keys)
+            print(f'{len(diff)} IOCs changed from snapshot {old} to {new}')
+            print_diff(diff, keys)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,560 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for grep_more_ioc, getPVAliases and ioc-deploy using synthetic
+data.
+
+Usage: python ioc_tools_bench.py {procmgr,startup,aliases,suite,readme,
+                                    clone} [-h]
+"""
+###############################################################################
+# %% Imports
+###############################################################################
+
+import argparse
+import glob as gb
+import json
+import os.path
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+import getPVAliases
+from getPVAliases import acquire_aliases, process_alias_templates
+from grep_more_ioc import (fix_json, parse_procmgr, search_procmgr,
+                           try_json_loads)
+from ioc_deploy import (_clone, clone_repo_tag, get_dir_size,
+                        readme_from_git_dir)
+from ioc_fixtures import make_pcds_tree, procmgr_entry, write_iocmanager_cfg
+
+###############################################################################
+# %% Synthetic data
+###############################################################################
+
+
+def make_procmgr_cfg(file: str, n_entries: int) -> str:
+    """
+    Writes an iocmanager.cfg with 'n_entries' procmgr_config entries in
+    the same pseudo-python format iocmanager uses, including the inline
+    breaks for long entries. Returns the path to the file.
+    """
+    return write_iocmanager_cfg(file, [
+        procmgr_entry(f'ioc-tst-bench{i:05d}', f'ioc-tst-{i % 50:02d}',
+                      30000 + i % 1000, f'ioc/tst/bench/R1.{i % 10}.0', i)
+        for i in range(n_entries)])
+
+
+def make_alias_ioc(root: str, n_records: int) -> tuple[str, str]:
+    """
+    Writes a parent release with a motor-like db/alias.db under 'root', and
+    a child IOC release whose st.cmd loads it for 'n_records' records.
+    The st.cmd uses unquoted macros in epicsEnvSet, cd and dbLoadRecords,
+    and loads the records from a script it includes relative to $(TOP).
+    Returns the (parent release, child release) paths.
+    """
+    parent = os.path.join(root, 'parent', 'R1.0.0')
+    child = os.path.join(root, 'child', 'R1.0.0')
+    os.makedirs(os.path.join(parent, 'db'))
+    os.makedirs(os.path.join(child, 'build', 'iocBoot', 'ioc-tst-bench'))
+    with open(os.path.join(parent, 'db', 'alias.db'), 'w',
+              encoding='utf-8') as _f:
+        _f.write('alias("$(RECORD)","$(ALIAS)")\n'
+                 + ''.join(f'alias("$(RECORD).{field}", "$(ALIAS).{field}")\n'
+                           for field in ('RBV', 'VAL', 'DMOV', 'STOP', 'HLM',
+                                         'LLM', 'VELO', 'ACCL', 'DESC',
+                                         'EGU', 'MSTA')))
+    boot = os.path.join(child, 'build', 'iocBoot', 'ioc-tst-bench')
+    with open(os.path.join(boot, 'st.cmd'), 'w', encoding='utf-8') as _f:
+        _f.write(f'epicsEnvSet("TOP", "{child}")\n'
+                 f'epicsEnvSet(PARENTS, {os.path.dirname(parent)})\n'
+                 'epicsEnvSet(IOC_PARENT, $(PARENTS)/R1.0.0)\n'
+                 'cd $(TOP)\n'
+                 '< build/iocBoot/ioc-tst-bench/aliases.cmd\n')
+    lines = []
+    for i in range(n_records):
+        db_file = ('$(IOC_PARENT)/db/alias.db' if i % 2 == 0
+                   else '"$(IOC_PARENT)/db/alias.db"')
+        lines.append(f'dbLoadRecords({db_file},'
+                     f' "RECORD=TST:MMS:{i:03d},ALIAS=TST:BENCH:MR{i}")\n')
+    with open(os.path.join(boot, 'aliases.cmd'), 'w', encoding='utf-8') as _f:
+        _f.writelines(lines)
+    return parent, child
+
+
+###############################################################################
+# %% Benchmarks
+###############################################################################
+
+
+def make_git_repo(root: str, blob_mb: int) -> str:
+    """
+    Makes a bare repo pcdshub/ioc-tst-bench under 'root' with a README and
+    a 'blob_mb' MB firmware blob, tagged R1.0.0 and serving blob filters
+    like GitHub. Returns the git url base to clone it with.
+    """
+    work = os.path.join(root, 'work')
+    bare = os.path.join(root, 'remote', 'pcdshub', 'ioc-tst-bench')
+    os.makedirs(work)
+    with open(os.path.join(work, 'README.md'), 'w', encoding='utf-8') as _f:
+        _f.write('# ioc-tst-BenchMark\n')
+    with open(os.path.join(work, 'firmware.bin'), 'wb') as _f:
+        _f.write(os.urandom(blob_mb * 2**20))
+    git = ['git', '-c', 'user.name=bench', '-c', 'user.email=bench@localhost']
+    for cmd in (['init', '-q'], ['add', '.'], ['commit', '-q', '-m', 'bench'],
+                ['tag', 'R1.0.0']):
+        subprocess.run(git + ['-C', work] + cmd, check=True)
+    subprocess.run(['git', 'clone', '-q', '--bare', work, bare], check=True)
+    subprocess.run(['git', '-C', bare, 'config', 'uploadpack.allowFilter',
+                    'true'], check=True)
+    return f'file://{os.path.join(root, "remote")}/'
+
+
+def legacy_parse_procmgr(file: str) -> list[dict]:
+    """The search_procmgr -> fix_json -> try_json_loads pipeline."""
+    return [try_json_loads(s)
+            for s in fix_json(search_procmgr(file=file, patt=''))]
+
+
+def print_timings(timings: dict[str, float], n_items: int, unit: str):
+    """Prints the best time of each benchmark relative to the first one."""
+    base = next(iter(timings.values()))
+    print(f'{"benchmark":<24}{"best (s)":>12}{f"us/{unit}":>12}'
+          f'{"speedup":>10}')
+    for name, best in timings.items():
+        print(f'{name:<24}{best:>12.4f}{1e6 * best / n_items:>12.2f}'
+              f'{base / best:>9.1f}x')
+
+
+def bench_procmgr(n_entries: int, repeat: int):
+    """Compares the procmgr_config parsers on a synthetic config."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        file = make_procmgr_cfg(os.path.join(tmpdir, 'iocmanager.cfg'),
+                                n_entries)
+        legacy = legacy_parse_procmgr(file)
+        parsed = [record for _, record in parse_procmgr(file)]
+        if legacy != parsed:
+            print('Parsers disagree on the synthetic config!')
+            sys.exit(1)
+        timings = {
+            name: min(timeit.repeat(lambda f=func: f(file),
+                                    number=1, repeat=repeat))
+            for name, func in (('fix_json pipeline', legacy_parse_procmgr),
+                               ('parse_procmgr', parse_procmgr))
+        }
+    print(f'procmgr_config parsing, {n_entries} entries:')
+    print_timings(timings, n_entries, 'entry')
+
+
+def legacy_process_alias_template(parent_release: str, record: str,
+                                  alias: str) -> list[list[str]]:
+    """process_alias_template re-reading the alias.db for each record."""
+    _target_file = f'{parent_release}/db/alias.db'
+    with open(_target_file, encoding='utf-8') as _f:
+        _temp = _f.read()
+    _temp = re.sub(r'alias\(| +', '', _temp)
+    _temp = re.sub(r'\)\s*\n', '\n', _temp)
+    _temp = re.sub(r'\$\(RECORD\)', record, _temp)
+    _temp = re.sub(r'\$\(ALIAS\)', alias, _temp)
+    return [s.replace('"', '').split(',') for s in _temp.split()]
+
+
+def bench_aliases(n_records: int, repeat: int):
+    """
+    Compares the per record alias.db processing with the cached template,
+    for a synthetic st.cmd with 'n_records' alias records.
+    """
+
+    def legacy(parent, alias_dicts):
+        return [legacy_process_alias_template(parent, a['record'], a['alias'])
+                for a in alias_dicts]
+
+    def cold(parent, alias_dicts):
+        getPVAliases._ALIAS_TEMPLATES.clear()
+        return process_alias_templates(parent, alias_dicts)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        parent, child = make_alias_ioc(tmpdir, n_records)
+        alias_dicts = acquire_aliases(child, 'ioc-tst-bench')
+        if len(alias_dicts) != n_records:
+            print(f'acquire_aliases found {len(alias_dicts)} of the'
+                  f' {n_records} records of the synthetic st.cmd!')
+            sys.exit(1)
+        if legacy(parent, alias_dicts) != cold(parent, alias_dicts):
+            print('Alias expansions disagree on the synthetic st.cmd!')
+            sys.exit(1)
+        timings = {
+            name: min(timeit.repeat(lambda f=func: f(parent, alias_dicts),
+                                    number=1, repeat=repeat))
+            for name, func in (('per record alias.db', legacy),
+                               ('template, cold cache', cold),
+                               ('template, warm cache',
+                                process_alias_templates))
+        }
+    print(f'alias.db expansion, {n_records} records:')
+    print_timings(timings, n_records, 'record')
+
+
+def bench_readme(blob_mb: int, repeat: int):
+    """
+    Compares the bytes fetched and time taken to read a repo's README for
+    ioc-deploy's casing check, with a full shallow clone and a blobless one.
+    """
+
+    def fetch(url_base, blobless):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            start = time.perf_counter()
+            _clone('ioc-tst-bench', 'pcdshub', working_dir=tmpdir,
+                   git_url_base=url_base, blobless=blobless)
+            git_dir = os.path.join(tmpdir, 'ioc-tst-bench', '.git')
+            if blobless:
+                readme_from_git_dir(git_dir)
+            return time.perf_counter() - start, get_dir_size(git_dir)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        url_base = make_git_repo(tmpdir, blob_mb)
+        results = {}
+        for name, blobless in (('full clone', False),
+                               ('blobless clone', True)):
+            runs = [fetch(url_base, blobless) for _ in range(repeat)]
+            results[name] = (min(t for t, _ in runs), runs[0][1])
+    print(f'README casing lookup, {blob_mb} MB blob:')
+    base = next(iter(results.values()))[0]
+    print(f'{"benchmark":<24}{"best (s)":>12}{"fetched (kB)":>14}'
+          f'{"speedup":>10}')
+    for name, (best, size) in results.items():
+        print(f'{name:<24}{best:>12.4f}{size / 1e3:>14.1f}'
+              f'{base / best:>9.1f}x')
+
+
+def bench_clone(blob_mb: int, repeat: int):
+    """
+    Times ioc-deploy's clone of a tag from a local bare repo, without a
+    mirror cache and with a cold and a warm one. Exits with an error if a
+    deployed checkout is not at the tag or misses the repo's files.
+    """
+
+    def deploy(url_base, mirror_dir):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            deploy_dir = os.path.join(tmpdir, 'ioc-tst-bench', 'R1.0.0')
+            start = time.perf_counter()
+            code = clone_repo_tag(name='ioc-tst-bench', github_org='pcdshub',
+                                  release='R1.0.0', deploy_dir=deploy_dir,
+                                  dry_run=False, verbose=False,
+                                  mirror_dir=mirror_dir,
+                                  git_url_base=url_base)
+            elapsed = time.perf_counter() - start
+            check_clone(deploy_dir, code)
+            return elapsed, get_dir_size(os.path.join(deploy_dir, '.git'))
+
+    def check_clone(deploy_dir, code):
+        describe = subprocess.run(
+            ['git', '-C', deploy_dir, 'describe', '--tags', '--exact-match'],
+            capture_output=True, text=True)
+        readme = os.path.join(deploy_dir, 'README.md')
+        errors = []
+        if code != 0:
+            errors.append(f'clone_repo_tag returned {code}')
+        if describe.stdout.strip() != 'R1.0.0':
+            errors.append(f'HEAD is not at R1.0.0: {describe.stderr.strip()}')
+        if not os.path.isfile(os.path.join(deploy_dir, 'firmware.bin')):
+            errors.append('firmware.bin was not checked out')
+        if (not os.path.isfile(readme)
+                or open(readme, encoding='utf-8').read()
+                != '# ioc-tst-BenchMark\n'):
+            errors.append('README.md was not checked out')
+        if errors:
+            print(f'Error: bad clone in {deploy_dir}: ' + ', '.join(errors))
+            sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        url_base = make_git_repo(tmpdir, blob_mb)
+        mirror_dir = os.path.join(tmpdir, 'mirrors')
+        results = {'no mirror': [deploy(url_base, '')
+                                 for _ in range(repeat)]}
+        # The first clone creates the mirror, the later ones only fetch it
+        runs = [deploy(url_base, mirror_dir) for _ in range(repeat + 1)]
+        results['cold mirror'] = runs[:1]
+        results['warm mirror'] = runs[1:]
+    print(f'ioc-deploy clone of a tag, {blob_mb} MB blob:')
+    base = min(t for t, _ in results['no mirror'])
+    print(f'{"benchmark":<24}{"best (s)":>12}{"cloned (kB)":>14}'
+          f'{"speedup":>10}')
+    for name, runs in results.items():
+        best = min(t for t, _ in runs)
+        print(f'{name:<24}{best:>12.4f}{runs[0][1] / 1e3:>14.1f}'
+              f'{base / best:>9.1f}x')
+
+
+# Timed in a fresh interpreter by bench_startup, prints the stage times
+_STARTUP_CODE = """
+import json, time
+t0 = time.perf_counter()
+import constants
+t1 = time.perf_counter()
+constants.get_valid_hutch()
+t2 = time.perf_counter()
+import {module}
+t3 = time.perf_counter()
+{build_parser}
+t4 = time.perf_counter()
+print(json.dumps({{'import constants': t1 - t0, 'get_valid_hutch': t2 - t1,
+                  'import {module}': t3 - t2, 'build parser': t4 - t3,
+                  'total to argparse': t4 - t0}}))
+"""
+
+
+def time_startup(module: str, build_parser: str, env: dict) -> dict:
+    """Times the import stages of 'module' in a new interpreter."""
+    code = _STARTUP_CODE.format(module=module, build_parser=build_parser)
+    proc = subprocess.run([sys.executable, '-c', code], env=env,
+                          cwd=os.path.dirname(os.path.abspath(__file__)),
+                          stdout=subprocess.PIPE, check=True)
+    return json.loads(proc.stdout)
+
+
+def bench_startup(repeat: int):
+    """
+    Times how long the CLIs take to reach argparse, with a cold hutch
+    cache and then a warm one.
+    """
+    for module, build_parser in (('grep_more_ioc',
+                                  'grep_more_ioc.build_parser()'),
+                                 ('getPVAliases', 'getPVAliases.parser')):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env = dict(os.environ, XDG_CACHE_HOME=tmpdir)
+            cold = time_startup(module, build_parser, env)
+            warm = [time_startup(module, build_parser, env)
+                    for _ in range(repeat)]
+        print(f'{module} startup:')
+        print(f'{"stage":<24}{"cold (ms)":>12}{"warm (ms)":>12}')
+        for stage, value in cold.items():
+            best = min(_w[stage] for _w in warm)
+            print(f'{stage:<24}{1e3 * value:>12.1f}{1e3 * best:>12.1f}')
+
+
+# IOC counts of the synthetic trees timed by the suite
+SUITE_SCALES = [10, 1000, 50000]
+
+# Ratio to the baseline above which the suite reports a regression
+SUITE_TOLERANCE = 1.5
+
+# Seconds under which a step is too noisy to report as a regression
+SUITE_MIN_TIME = 0.01
+
+# Timed in a fresh interpreter by bench_suite, with PCDS_ROOT set
+_SUITE_CODE = """
+import json, ioc_tools_bench
+print(json.dumps(ioc_tools_bench.time_suite({repeat})))
+"""
+
+
+def _best(func, repeat: int, setup=None) -> float:
+    """Returns the best time of 'func' over 'repeat' runs after 'setup'"""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def time_suite(repeat: int) -> dict[str, float]:
+    """
+    Times the main steps of grep_more_ioc and getPVAliases on the tree in
+    PCDS_ROOT. Run in a fresh interpreter by bench_suite, as the tree is
+    picked up when constants is imported.
+    """
+    import grep_more_ioc
+    from constants import CONFIG_DIR
+    from getPVAliases import process_alias_template
+    from grep_more_ioc import (ParentResolver, find_ioc, find_parent_ioc,
+                               fix_dir, search_file)
+
+    def reset_parents():
+        grep_more_ioc._PARENT_RESOLVER = ParentResolver(revalidate=True)
+
+    cfgs = sorted(gb.glob(f'{CONFIG_DIR}/*/iocmanager.cfg'))
+    data = find_ioc('all', '.')
+    children = [(_d['id'], _d['dir']) for _d in data]
+    files = [f'{fix_dir(d)}{ioc}.cfg' for ioc, d in children]
+    enabled = [_d for _d in data if _d.get('disable') is not True]
+    records = [(find_parent_ioc(_d['id'], _d['dir']), a)
+               for _d in enabled
+               for a in acquire_aliases(_d['dir'], _d['id'])]
+    return {
+        'find_ioc, no cache': _best(
+            lambda: find_ioc('all', '.', use_cache=False), repeat),
+        'find_ioc, cached': _best(lambda: find_ioc('all', '.'), repeat),
+        'fix_json pipeline': _best(
+            lambda: [legacy_parse_procmgr(cfg) for cfg in cfgs], repeat),
+        'search_file': _best(
+            lambda: [search_file(file=f, patt='^RELEASE', quiet=True)
+                     for f in files], repeat),
+        'find_parent_ioc': _best(
+            lambda: [find_parent_ioc(ioc, d) for ioc, d in children],
+            repeat, setup=reset_parents),
+        'process_alias_template': _best(
+            lambda: [process_alias_template(p, a['record'], a['alias'])
+                     for p, a in records],
+            repeat, setup=getPVAliases._ALIAS_TEMPLATES.clear),
+    }
+
+
+def bench_suite(scales: list[int], repeat: int, baseline: str = None,
+                save: str = None, tolerance: float = SUITE_TOLERANCE):
+    """
+    Times the suite on a synthetic tree of each size in 'scales', and
+    compares it with the timings in the json 'baseline'. Exits with 1 if
+    any step is more than 'tolerance' times slower than its baseline,
+    ignoring the steps faster than SUITE_MIN_TIME.
+    The timings are written to the json file 'save', to use as a baseline
+    later, with the python version, cpu count and repeats they were made
+    with. Timings depend on the host, so only compare with a baseline
+    saved on the same host and python, e.g. from a known good commit.
+    """
+    previous = {}
+    if baseline:
+        with open(baseline, 'r', encoding='utf-8') as _f:
+            previous = json.load(_f)
+        python = sys.version.split()[0]
+        if previous.get('python') != python:
+            print(f'The baseline {baseline} was made with python'
+                  f' {previous.get("python")}, not {python}, ratios are'
+                  ' only indicative.')
+        previous = previous['scales']
+    results = {}
+    regressions = []
+    for n_iocs in scales:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = os.path.join(tmpdir, 'pcds')
+            start = time.perf_counter()
+            make_pcds_tree(root, n_iocs,
+                           n_hutches=min(10, max(1, n_iocs // 10)))
+            made = time.perf_counter() - start
+            env = dict(os.environ, PCDS_ROOT=root,
+                       XDG_CACHE_HOME=os.path.join(tmpdir, 'cache'))
+            proc = subprocess.run(
+                [sys.executable, '-c', _SUITE_CODE.format(repeat=repeat)],
+                env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+                stdout=subprocess.PIPE, check=True)
+        timings = json.loads(proc.stdout.splitlines()[-1])
+        results[str(n_iocs)] = timings
+        base = previous.get(str(n_iocs), {})
+        print(f'{n_iocs} IOCs (tree made in {made:.1f} s):')
+        print(f'{"benchmark":<24}{"best (s)":>12}{"us/IOC":>12}'
+              f'{"baseline":>12}{"ratio":>8}')
+        for name, best in timings.items():
+            line = f'{name:<24}{best:>12.4f}{1e6 * best / n_iocs:>12.2f}'
+            if name in base:
+                ratio = best / base[name]
+                line += f'{base[name]:>12.4f}{ratio:>7.2f}x'
+                if ratio > tolerance and best > SUITE_MIN_TIME:
+                    regressions.append(f'{name} at {n_iocs} IOCs')
+                    line += ' !'
+            print(line)
+    if save is not None:
+        with open(save, 'w', encoding='utf-8') as _f:
+            json.dump({'python': sys.version.split()[0],
+                       'cpus': os.cpu_count(), 'repeat': repeat,
+                       'scales': results}, _f, indent=2)
+            _f.write('\n')
+        print(f'Saved the timings to {save}')
+    if len(regressions) > 0:
+        print(f'Slower than {tolerance}x the baseline: '
+              + ', '.join(regressions))
+        sys.exit(1)
+
+
+###############################################################################
+# %% Arg Parser
+###############################################################################
+
+
+def build_parser():
+    """
+    Builds the parser & subparsers for the benchmarks
+    """
+    parser = argparse.ArgumentParser(
+        prog='ioc_tools_bench',
+        description='Benchmarks for grep_more_ioc, getPVAliases and'
+                    ' ioc-deploy using synthetic data.')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='Number of repeats, the best is reported.')
+    subparsers = parser.add_subparsers(dest='bench', required=True)
+
+    procmgr = subparsers.add_parser('procmgr',
+                                    help='Parsing of iocmanager.cfg files')
+    procmgr.add_argument('-n', '--entries', type=int, default=20000,
+                         help='Number of procmgr_config entries.')
+
+    subparsers.add_parser('startup',
+                          help='Time for the CLIs to reach argparse')
+
+    aliases = subparsers.add_parser('aliases',
+                                    help='Expansion of the parent alias.db'
+                                    ' for the st.cmd records')
+    aliases.add_argument('-n', '--records', type=int, default=500,
+                         help='Number of alias records in the st.cmd.')
+
+    suite = subparsers.add_parser('suite',
+                                  help='The main steps of both tools on'
+                                  ' synthetic trees of increasing size')
+    suite.add_argument('-s', '--scales', type=int, nargs='+',
+                       default=SUITE_SCALES,
+                       help='Numbers of IOCs to time. Default: '
+                       + ' '.join(str(n) for n in SUITE_SCALES))
+    suite.add_argument('-b', '--baseline', type=str, default=None,
+                       help='json timings of a previous --save on the same'
+                       ' host and python to compare with. Default: none')
+    suite.add_argument('--save', type=str, default=None,
+                       help='Write the timings to this json file.')
+    suite.add_argument('-t', '--tolerance', type=float,
+                       default=SUITE_TOLERANCE,
+                       help='Ratio to the baseline that fails the suite.'
+                       f' Default: {SUITE_TOLERANCE}')
+
+    readme = subparsers.add_parser('readme',
+                                   help="Fetching a repo's README for the"
+                                   ' ioc-deploy casing check')
+    readme.add_argument('-m', '--blob_mb', type=int, default=50,
+                        help='Size of the binary blob in the repo, in MB.')
+
+    clone = subparsers.add_parser('clone',
+                                  help="ioc-deploy's clone of a tag from a"
+                                  ' local bare repo, with and without a'
+                                  ' mirror cache')
+    clone.add_argument('-m', '--blob_mb', type=int, default=10,
+                       help='Size of the binary blob in the repo, in MB.')
+    return parser
+
+###############################################################################
+# %% Main
+###############################################################################
+
+
+def main():
+    """
+    Main entry point of the program.
+    """
+    args = build_parser().parse_args()
+    if args.bench == 'procmgr':
+        bench_procmgr(args.entries, args.repeat)
+    elif args.bench == 'startup':
+        bench_startup(args.repeat)
+    elif args.bench == 'aliases':
+        bench_aliases(args.records, args.repeat)
+    elif args.bench == 'suite':
+        bench_suite(args.scales, args.repeat, baseline=args.baseline,
+                    save=args.save, tolerance=args.tolerance)
+    elif args.bench == 'readme':
+        bench_readme(args.blob_mb, args.repeat)
+    elif args.bench == 'clone':
+        bench_clone(args.blob_mb, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
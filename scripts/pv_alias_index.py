@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+An index of the PV <--> alias associations of every enabled child IOC,
+for finding the alias of a record, or the reverse, without knowing its IOC.
+
+Usage: python pv_alias_index.py {update,query} [-h]
+"""
+###############################################################################
+# %% Imports
+###############################################################################
+
+import argparse
+import os.path
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
+
+from colorama import Fore, Style
+from constants import CACHE_DIR
+from term_table import TermTable
+
+###############################################################################
+# %% Global settings
+###############################################################################
+
+# The PV <--> alias index
+INDEX_FILE = os.path.join(CACHE_DIR, 'pv_alias_index.sqlite')
+
+# 'iocs' keeps the st.cmd and parent alias.db each IOC was indexed from,
+# with their mtimes, so only the IOCs where either changed are expanded
+# again. A NULL mtime is a file that did not exist.
+_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS iocs (
+    ioc_key TEXT PRIMARY KEY,
+    st_cmd TEXT NOT NULL,
+    st_cmd_mtime_ns INTEGER,
+    alias_db TEXT NOT NULL,
+    alias_db_mtime_ns INTEGER
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS aliases (
+    record TEXT NOT NULL,
+    alias TEXT NOT NULL,
+    ioc TEXT NOT NULL,
+    hutch TEXT NOT NULL,
+    ioc_key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS aliases_record ON aliases (record);
+CREATE INDEX IF NOT EXISTS aliases_alias ON aliases (alias);
+CREATE INDEX IF NOT EXISTS aliases_ioc_key ON aliases (ioc_key);
+"""
+
+# The columns of a lookup result
+COLUMNS = ['record', 'alias', 'ioc', 'hutch']
+
+# Sorts after any text with the same prefix, for prefix range queries
+_MAX_CHAR = '\U0010ffff'
+
+###############################################################################
+# %% Functions
+###############################################################################
+
+
+def _mtime(file: str) -> Optional[int]:
+    """Returns the mtime_ns of 'file', None if it doesn't exist"""
+    try:
+        return os.stat(file).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _expand(ioc: dict, parent_release: str) -> list[tuple[str, str]]:
+    """
+    Returns the (record, alias) PV pairs that getPVAliases builds for a
+    child IOC from its st.cmd and its parent's alias.db.
+    """
+    from getPVAliases import acquire_aliases, process_alias_templates
+    alias_dicts = acquire_aliases(ioc['dir'], ioc['id'])
+    if len(alias_dicts) == 0:
+        return []
+    alias_lists = process_alias_templates(parent_release, alias_dicts)
+    if alias_lists is None:
+        return []
+    return [(al[0], al[-1]) for alias_list in alias_lists
+            for al in alias_list]
+
+
+class AliasIndex:
+    """
+    A PV <--> alias index of the child IOCs, stored in sqlite.
+
+    update only expands the IOCs whose st.cmd or parent alias.db changed
+    since they were indexed, and drops the IOCs that are gone or disabled.
+
+    Parameters
+    ----------
+    db_file : str, optional
+        The sqlite file of the index. The default is INDEX_FILE.
+    """
+
+    def __init__(self, db_file: str = None):
+        if db_file is None:
+            db_file = INDEX_FILE
+        os.makedirs(os.path.dirname(os.path.abspath(db_file)), exist_ok=True)
+        self.db_file = db_file
+        self._db = sqlite3.connect(db_file)
+        self._db.executescript(_INDEX_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Closes the sqlite connection"""
+        self._db.close()
+
+    def update(self, records: Iterable[dict]) -> dict[str, int]:
+        """
+        Brings the index up to date with 'records'.
+
+        Parameters
+        ----------
+        records : Iterable[dict]
+            The find_ioc records of all hutches, tagged with their 'hutch'.
+
+        Returns
+        -------
+        dict[str, int]
+            The number of 'updated', 'removed' and 'unchanged' IOCs, and
+            the number of 'aliases' in the index.
+        """
+        # imported here so queries don't pay for it
+        from grep_more_ioc import MAX_WORKERS, ParentResolver, fix_dir
+        from ioc_snapshot import ioc_keys
+        iocs = {key: record for key, record in ioc_keys(records).items()
+                if record.get('disable') is not True}
+        keys = list(iocs)
+        parents = dict(zip(keys, ParentResolver(persistent=True).resolve_all(
+            [(iocs[key]['id'], iocs[key]['dir']) for key in keys])))
+        st_cmds = [f"{fix_dir(iocs[key]['dir'])}build/iocBoot/"
+                   f"{iocs[key]['id']}/st.cmd" for key in keys]
+        alias_dbs = [f'{parents[key]}/db/alias.db' for key in keys]
+        known = {row[0]: row[1:] for row in self._db.execute(
+            'SELECT ioc_key, st_cmd, st_cmd_mtime_ns, alias_db,'
+            ' alias_db_mtime_ns FROM iocs')}
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            sources = dict(zip(keys, zip(
+                st_cmds, executor.map(_mtime, st_cmds),
+                alias_dbs, executor.map(_mtime, alias_dbs))))
+            changed = [key for key in keys if known.get(key) != sources[key]]
+            # nothing to expand without both files
+            pairs = executor.map(
+                lambda key: ([] if None in sources[key]
+                             else _expand(iocs[key], parents[key])),
+                changed)
+            pairs = dict(zip(changed, pairs))
+        removed = [key for key in known if key not in sources]
+        with self._db:
+            self._db.executemany('DELETE FROM aliases WHERE ioc_key = ?',
+                                 [(key,) for key in removed + changed])
+            self._db.executemany('DELETE FROM iocs WHERE ioc_key = ?',
+                                 [(key,) for key in removed])
+            self._db.executemany(
+                'INSERT INTO aliases (record, alias, ioc, hutch, ioc_key)'
+                ' VALUES (?, ?, ?, ?, ?)',
+                [(record, alias, iocs[key]['id'], iocs[key].get('hutch', ''),
+                  key) for key in changed for record, alias in pairs[key]])
+            self._db.executemany(
+                'INSERT OR REPLACE INTO iocs (ioc_key, st_cmd,'
+                ' st_cmd_mtime_ns, alias_db, alias_db_mtime_ns)'
+                ' VALUES (?, ?, ?, ?, ?)',
+                [(key, *sources[key]) for key in changed])
+        n_aliases, = self._db.execute('SELECT COUNT(*) FROM aliases'
+                                      ).fetchone()
+        return {'updated': len(changed), 'removed': len(removed),
+                'unchanged': len(keys) - len(changed), 'aliases': n_aliases}
+
+    def lookup(self, name: str, prefix: bool = False,
+               column: str = None) -> list[dict]:
+        """
+        Finds the PV <--> alias associations of a PV name.
+
+        Parameters
+        ----------
+        name : str
+            The PV name, or the start of it with 'prefix'.
+        prefix : bool, optional
+            Match the names starting with 'name'. The default is False, for
+            an exact match.
+        column : str, optional
+            Only match 'record' or 'alias' names. The default is None,
+            matching either.
+
+        Returns
+        -------
+        list[dict]
+            The 'record', 'alias', 'ioc' and 'hutch' of each match, sorted
+            by record.
+        """
+        columns = ['record', 'alias'] if column is None else [column]
+        if prefix:
+            where = '{} >= ? AND {} < ?'
+            params = (name, name + _MAX_CHAR)
+        else:
+            where = '{} = ?'
+            params = (name,)
+        query = ' UNION '.join(
+            f'SELECT {", ".join(COLUMNS)} FROM aliases'
+            f' WHERE {where.format(col, col)}' for col in columns)
+        rows = self._db.execute(query + ' ORDER BY record, alias',
+                                params * len(columns))
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+###############################################################################
+# %% Arg Parser
+###############################################################################
+
+
+def build_parser():
+    """
+    Builds the parser & subparsers for the main function
+    """
+    parser = argparse.ArgumentParser(
+        prog='pv_alias_index',
+        description='Indexes the PV <--> alias associations that'
+                    ' getPVAliases builds for every enabled child IOC, and'
+                    ' looks up records or aliases in it.',
+        epilog='e.g. pv_alias_index query -p XPP:USR:')
+    parser.add_argument('--db', type=str, default=INDEX_FILE,
+                        help=f'Index database. Default: {INDEX_FILE}')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('update', help='Index the IOCs whose st.cmd or'
+                          ' parent alias.db changed.')
+
+    query = subparsers.add_parser('query', help='Look up a record or alias.')
+    query.add_argument('name', type=str, help='PV name to look up.')
+    query.add_argument('-p', '--prefix', action='store_true', default=False,
+                       help='Match the PV names starting with NAME.')
+    only = query.add_mutually_exclusive_group()
+    only.add_argument('-r', '--record', action='store_const', dest='column',
+                      const='record', default=None,
+                      help='Only match record names.')
+    only.add_argument('-a', '--alias', action='store_const', dest='column',
+                      const='alias', help='Only match alias names.')
+    query.add_argument('-u', '--update', action='store_true', default=False,
+                       help='Update the index before the lookup.')
+    return parser
+
+###############################################################################
+# %% Main
+###############################################################################
+
+
+def main():
+    """
+    Main entry point of the program.
+    """
+    args = build_parser().parse_args()
+    with AliasIndex(args.db) as index:
+        if (args.command == 'update') or args.update:
+            from grep_more_ioc import iter_ioc
+            counts = index.update(iter_ioc('all', '', tag_hutch=True))
+            print(f'Updated {index.db_file}: '
+                  + ', '.join(f'{n} {k}' for k, n in counts.items()),
+                  file=sys.stderr if args.command == 'query' else sys.stdout)
+        if args.command == 'query':
+            result = index.lookup(args.name, prefix=args.prefix,
+                                  column=args.column)
+            if len(result) == 0:
+                print(f'{Fore.RED}No PV aliases found for{Style.RESET_ALL}'
+                      f' {args.name}')
+                sys.exit(1)
+            TermTable(COLUMNS, ([row[col] for col in COLUMNS]
+                                for row in result), align='l').print()
+
+
+if __name__ == '__main__':
+    main()
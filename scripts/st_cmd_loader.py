@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+Loads an IOC st.cmd the way iocsh runs it, following '<' includes and
+iocshLoad, to find every dbLoadRecords call with its macros.
+
+Usage: python st_cmd_loader.py [-h] st_cmd
+"""
+###############################################################################
+# %% Imports
+###############################################################################
+
+import argparse
+import os.path
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+###############################################################################
+# %% Global settings
+###############################################################################
+
+# Parsed files, as {path: ((mtime_ns, size), commands)}
+_COMMANDS = {}
+
+# Guards against scripts that include themselves
+MAX_INCLUDE_DEPTH = 20
+
+# A "quoted" or bare word of an iocsh command. $(VAR) and ${VAR} macros,
+# with one level of nesting in their defaults, are part of a bare word.
+_WORD = re.compile(r'"([^"]*)"|((?:\$\((?:[^()]|\([^()]*\))*\)'
+                   r'|\$\{(?:[^{}]|\{[^{}]*\})*\}|[^\s(),"])+)')
+
+# $(VAR), ${VAR} and the $(VAR=default) forms
+_MACRO = re.compile(r'\$(?:\(([^()$=]+)(?:=([^()$]*))?\)'
+                    r'|\{([^{}$=]+)(?:=([^{}$]*))?\})')
+
+###############################################################################
+# %% Functions
+###############################################################################
+
+
+@dataclass(frozen=True)
+class DbLoad:
+    """A dbLoadRecords call, with its macros expanded"""
+    file: str
+    macros: dict[str, str] = field(default_factory=dict)
+    source: str = ''
+    line: int = 0
+
+
+def split_command(line: str) -> list[str]:
+    """
+    Splits an iocsh command line into its words. As in iocsh, words are
+    separated by whitespace, commas or parentheses, and double quotes
+    group them. Returns [] for blank and comment lines.
+    """
+    line = line.strip()
+    if line.startswith('#'):
+        return []
+    return [quoted if bare == '' else bare
+            for quoted, bare in _WORD.findall(line)]
+
+
+def parse_file(file: str) -> Optional[list[tuple[int, list[str]]]]:
+    """
+    Returns the (line number, words) of each command in 'file', or None if
+    it can't be read. Each file is only parsed again when its mtime or
+    size changes.
+    """
+    try:
+        stat = os.stat(file)
+    except OSError:
+        return None
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _COMMANDS.get(file)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    try:
+        with open(file, 'r', encoding='utf-8', errors='replace') as _f:
+            lines = _f.readlines()
+    except OSError:
+        return None
+    commands = []
+    for i, line in enumerate(lines, start=1):
+        if line.lstrip().startswith('<'):
+            commands.append((i, ['<', line.lstrip()[1:].strip()]))
+            continue
+        words = split_command(line)
+        if len(words) > 0:
+            commands.append((i, words))
+    _COMMANDS[file] = (key, commands)
+    return commands
+
+
+def expand_macros(text: str, env: dict[str, str]) -> str:
+    """
+    Expands the $(VAR) and ${VAR} macros in 'text' from 'env', using the
+    $(VAR=default) default for undefined ones. Other undefined macros
+    are left as is.
+    """
+    if '$' not in text:
+        return text
+
+    def _sub(match):
+        name = match.group(1) or match.group(3)
+        default = match.group(2)
+        if default is None:
+            default = match.group(4)
+        if name in env:
+            return env[name]
+        return match.group(0) if default is None else default
+
+    for _ in range(MAX_INCLUDE_DEPTH):
+        expanded = _MACRO.sub(_sub, text)
+        # values can have macros of their own
+        if expanded == text:
+            break
+        text = expanded
+    return text
+
+
+def parse_macros(text: str) -> dict[str, str]:
+    """Parses a 'A=1,B=2' macro string into a dict"""
+    result = {}
+    for item in text.split(','):
+        if '=' in item:
+            name, value = item.split('=', maxsplit=1)
+            result[name.strip()] = value.strip()
+    return result
+
+
+class StCmdLoader:
+    """
+    Walks a st.cmd like iocsh runs it: 'epicsEnvSet' defines macros, 'cd'
+    changes the directory relative paths are resolved from, and '<' and
+    'iocshLoad' run other scripts, the latter with its own macros. Files
+    that don't exist are skipped.
+
+    Parameters
+    ----------
+    env : dict[str, str], optional
+        Macros defined before the st.cmd runs. The default is None.
+    """
+
+    def __init__(self, env: dict[str, str] = None):
+        self.env = dict(env or {})
+        self.loads = []
+        self.files = []
+        self._cwd = ''
+
+    def _path(self, file: str) -> str:
+        return os.path.normpath(os.path.join(self._cwd, file))
+
+    def load(self, file: str, depth: int = 0) -> list[DbLoad]:
+        """
+        Runs the script 'file', returning the dbLoadRecords calls found so
+        far, in order.
+        """
+        if depth > MAX_INCLUDE_DEPTH:
+            return self.loads
+        if depth == 0:
+            # st.cmd runs from its own directory
+            file = os.path.abspath(file)
+            self._cwd = os.path.dirname(file)
+        file = self._path(file)
+        commands = parse_file(file)
+        if commands is None:
+            return self.loads
+        self.files.append(file)
+        for line, words in commands:
+            words = [words[0]] + [expand_macros(w, self.env)
+                                  for w in words[1:]]
+            command, args = words[0], words[1:]
+            if command == 'epicsEnvSet' and len(args) > 0:
+                self.env[args[0]] = args[1] if len(args) > 1 else ''
+            elif command == 'cd' and len(args) > 0:
+                self._cwd = self._path(args[0])
+            elif command == '<' and len(args) > 0:
+                self.load(args[0], depth + 1)
+            elif command in ('iocshLoad', 'iocshRun') and len(args) > 0:
+                self._load_with(args[0],
+                                parse_macros(args[1]) if len(args) > 1
+                                else {}, depth + 1)
+            elif command == 'dbLoadRecords' and len(args) > 0:
+                self.loads.append(DbLoad(
+                    file=args[0],
+                    macros=parse_macros(args[1]) if len(args) > 1 else {},
+                    source=file, line=line))
+        return self.loads
+
+    def _load_with(self, file: str, macros: dict[str, str], depth: int):
+        """Loads 'file' with 'macros' defined only while it runs"""
+        saved = {name: self.env.get(name) for name in macros}
+        self.env.update(macros)
+        try:
+            self.load(file, depth)
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    self.env.pop(name, None)
+                else:
+                    self.env[name] = value
+
+
+def load_st_cmd(file: str, env: dict[str, str] = None) -> list[DbLoad]:
+    """
+    Returns every dbLoadRecords call of the st.cmd 'file' and the scripts
+    it includes, with their macros expanded, see StCmdLoader.
+    """
+    return StCmdLoader(env).load(file)
+
+###############################################################################
+# %% Arg Parser
+###############################################################################
+
+
+def build_parser():
+    """
+    Builds the parser for the loader
+    """
+    parser = argparse.ArgumentParser(
+        prog='st_cmd_loader',
+        description='Lists the dbLoadRecords calls of a st.cmd, following'
+                    ' its includes and expanding macros.')
+    parser.add_argument('st_cmd', type=str, help='Path to the st.cmd.')
+    return parser
+
+###############################################################################
+# %% Main
+###############################################################################
+
+
+def main():
+    """
+    Main entry point of the program.
+    """
+    args = build_parser().parse_args()
+    loader = StCmdLoader()
+    for load in loader.load(args.st_cmd):
+        print(f'{load.source}:{load.line}: {load.file} '
+              + ','.join(f'{k}={v}' for k, v in load.macros.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Wall and CPU time of the stages of a grep_more_ioc or getPVAliases run,
+for the --profile option.
+"""
+###############################################################################
+# %% Imports
+###############################################################################
+
+import argparse
+import cProfile
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Iterable, Optional
+
+###############################################################################
+# %% Global settings
+###############################################################################
+
+# The timer of the current run, None when not profiling
+_TIMER = None
+
+# Returned by stage when not profiling
+_NO_STAGE = nullcontext()
+
+###############################################################################
+# %% Functions
+###############################################################################
+
+
+class StageTimer:
+    """
+    Records the wall and CPU time spent in named stages.
+
+    Stages can be nested and can run on several threads. Each stage is
+    reported with its self time, without the stages nested in it, so the
+    times of the stages on one thread add up to that thread's time. The
+    stages run on worker threads overlap the main thread, so their times
+    can add up to more than the wall time.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.start_cpu = time.process_time()
+        # {name: [calls, self wall, self cpu]}
+        self.totals = {}
+        # {thread name: [(open, name, time)]}, for the speedscope trace
+        self.events = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Times the block as the stage 'name'"""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+            with self._lock:
+                self.events[threading.current_thread().name] = []
+        events = self.events[threading.current_thread().name]
+        # [name, start wall, start cpu, wall and cpu of nested stages]
+        frame = [name, time.perf_counter(), time.thread_time(), 0.0, 0.0]
+        stack.append(frame)
+        events.append((True, name, frame[1]))
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - frame[1]
+            cpu = time.thread_time() - frame[2]
+            events.append((False, name, frame[1] + wall))
+            stack.pop()
+            if len(stack) > 0:
+                stack[-1][3] += wall
+                stack[-1][4] += cpu
+            with self._lock:
+                totals = self.totals.setdefault(name, [0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1] += wall - frame[3]
+                totals[2] += cpu - frame[4]
+
+    def print_summary(self, file=None):
+        """Prints the calls, self wall and self CPU time of each stage"""
+        if file is None:
+            file = sys.stderr
+        wall = time.perf_counter() - self.start
+        cpu = time.process_time() - self.start_cpu
+        print(f'{"stage":<28}{"calls":>8}{"wall (ms)":>12}{"cpu (ms)":>12}'
+              f'{"wall %":>8}', file=file)
+        with self._lock:
+            totals = list(self.totals.items())
+        for name, (calls, stage_wall, stage_cpu) in totals:
+            print(f'{name:<28}{calls:>8}{1e3 * stage_wall:>12.1f}'
+                  f'{1e3 * stage_cpu:>12.1f}{100 * stage_wall / wall:>8.1f}',
+                  file=file)
+        print(f'{"total":<28}{"":>8}{1e3 * wall:>12.1f}{1e3 * cpu:>12.1f}',
+              file=file)
+
+    def speedscope(self, name: str = 'profile') -> dict:
+        """
+        Returns the stages as an evented speedscope profile, one per
+        thread. See https://www.speedscope.app/file-format-schema.json
+        """
+        frames = {}
+        profiles = []
+        end = time.perf_counter()
+        with self._lock:
+            threads = list(self.events.items())
+        for thread, events in threads:
+            profile_events = []
+            for is_open, stage, at in list(events):
+                frame = frames.setdefault(stage, len(frames))
+                profile_events.append({'type': 'O' if is_open else 'C',
+                                       'frame': frame,
+                                       'at': 1e3 * (at - self.start)})
+            profiles.append({'type': 'evented', 'name': thread,
+                             'unit': 'milliseconds', 'startValue': 0,
+                             'endValue': 1e3 * (end - self.start),
+                             'events': profile_events})
+        return {'$schema': 'https://www.speedscope.app/'
+                           'file-format-schema.json',
+                'name': name, 'exporter': name,
+                'shared': {'frames': [{'name': stage} for stage in frames]},
+                'profiles': profiles}
+
+
+def stage(name: str):
+    """
+    Times the block as the stage 'name' of the current profile, if any:
+    with stage('read'): ...
+    """
+    if _TIMER is None:
+        return _NO_STAGE
+    return _TIMER.stage(name)
+
+
+def timed_iter(iterable: Iterable, name: str) -> Iterable:
+    """
+    Times the time spent waiting on each item of 'iterable' as the stage
+    'name', like the results of an executor. Returns 'iterable' as is when
+    not profiling.
+    """
+    if _TIMER is None:
+        return iterable
+    return _timed_iter(iter(iterable), name)
+
+
+def _timed_iter(iterator, name: str):
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+@contextmanager
+def profiled(enabled: bool, output: Optional[str] = None,
+             name: str = 'profile'):
+    """
+    Profiles the block. The stage summary is printed to stderr when the
+    block exits, even through sys.exit.
+
+    Parameters
+    ----------
+    enabled : bool
+        Whether to profile, the block just runs otherwise.
+    output : str, optional
+        A .json file to write a speedscope trace of the stages to, or any
+        other file to write a cProfile dump of the main thread to. The
+        default is None, only the summary.
+    name : str, optional
+        The name of the speedscope profile. The default is 'profile'.
+    """
+    global _TIMER
+    if not enabled and output is None:
+        yield
+        return
+    _TIMER = StageTimer()
+    profiler = None
+    if output is not None and not output.endswith('.json'):
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(output)
+        elif output is not None:
+            with open(output, 'w', encoding='utf-8') as _f:
+                json.dump(_TIMER.speedscope(name), _f)
+        _TIMER.print_summary()
+        if output is not None:
+            print(f'Wrote the profile to {output}', file=sys.stderr)
+        _TIMER = None
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    """Adds the --profile and --profile_out options used by profiled"""
+    parser.add_argument('--profile', action='store_true', default=False,
+                        help='Prints the wall and CPU time of each stage to'
+                        ' stderr.')
+    parser.add_argument('--profile_out', type=str, metavar='FILE',
+                        default=None,
+                        help='Also writes the profile to FILE: a speedscope'
+                        ' trace of the stages\nfor .json, otherwise a'
+                        ' cProfile dump.')
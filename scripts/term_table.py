@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+A lightweight text table in PrettyTable's default style, rendered one line
+at a time, and a less-style pager for long terminal output.
+"""
+###############################################################################
+# %% Imports
+###############################################################################
+
+import shutil
+import subprocess
+import sys
+from itertools import chain, islice
+from typing import Iterable, Iterator
+
+from grep_more_ioc import clean_ansi
+from stage_profile import stage
+
+###############################################################################
+# %% Global settings
+###############################################################################
+
+# Pager for output taller than the terminal, -R keeps the ANSI colors
+PAGER = ['less', '-R', '-F', '-X']
+
+###############################################################################
+# %% Functions
+###############################################################################
+
+
+def cell_width(text: str) -> int:
+    """Returns the printed width of 'text', ignoring ANSI escapes"""
+    if '\x1b' in text:
+        return len(clean_ansi(text))
+    return len(text)
+
+
+def _justify(text: str, width: int, align: str) -> str:
+    """Pads 'text' to 'width' as PrettyTable does"""
+    excess = width - cell_width(text)
+    if align == 'l':
+        return text + ' ' * excess
+    if align == 'r':
+        return ' ' * excess + text
+    # centered, the odd space goes right of odd length text
+    if excess % 2 == 1 and cell_width(text) % 2 == 0:
+        return ' ' * (excess // 2 + 1) + text + ' ' * (excess // 2)
+    if excess % 2 == 1:
+        return ' ' * (excess // 2) + text + ' ' * (excess // 2 + 1)
+    return ' ' * (excess // 2) + text + ' ' * (excess // 2)
+
+
+class TermTable:
+    """
+    A text table that prints like PrettyTable's default style, for tables
+    too large for PrettyTable to render quickly.
+
+    The cells are converted to str once, the column widths are found in
+    one pass over each column, and the lines are generated as they are
+    printed. Widths ignore ANSI color codes, so colored headers and cells
+    line up.
+
+    Parameters
+    ----------
+    field_names : list[str]
+        The column headers.
+    rows : Iterable[list]
+        The rows, each a list of values in the order of 'field_names'.
+    align : str, optional
+        'l', 'c' or 'r' alignment of all the columns. The default is 'c'.
+    """
+
+    def __init__(self, field_names: list[str], rows: Iterable[list],
+                 align: str = 'c'):
+        self.field_names = [str(name) for name in field_names]
+        self.rows = [[str(value) for value in row] for row in rows]
+        self.align = align
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __str__(self) -> str:
+        return '\n'.join(self.lines())
+
+    def widths(self) -> list[int]:
+        """Returns the printed width of each column"""
+        return [max(map(cell_width, column))
+                for column in zip(self.field_names, *self.rows)]
+
+    def lines(self) -> Iterator[str]:
+        """Generates the lines of the table"""
+        widths = self.widths()
+        rule = '+' + '+'.join('-' * (w + 2) for w in widths) + '+'
+
+        def _line(cells):
+            return ('| ' + ' | '.join(_justify(c, w, self.align)
+                                      for c, w in zip(cells, widths))
+                    + ' |')
+
+        yield rule
+        yield _line(self.field_names)
+        yield rule
+        for row in self.rows:
+            yield _line(row)
+        yield rule
+
+    def print(self, page: bool = None):
+        """Prints the table, see page_lines"""
+        with stage('render'):
+            page_lines(self.lines(), page=page)
+
+
+def page_lines(lines: Iterable[str], page: bool = None):
+    """
+    Prints 'lines' to stdout, through PAGER if they are taller than the
+    terminal. Only the first screen is held before the pager starts, the
+    rest are streamed to it.
+
+    Parameters
+    ----------
+    lines : Iterable[str]
+        The lines to print, without line endings.
+    page : bool, optional
+        Whether to use the pager for long output. The default is None, to
+        only page when stdout is a terminal and the pager is installed.
+    """
+    if page is None:
+        page = sys.stdout.isatty() and shutil.which(PAGER[0]) is not None
+    lines = iter(lines)
+    first = []
+    if page:
+        height = shutil.get_terminal_size().lines
+        first = list(islice(lines, height))
+        page = len(first) >= height
+    if not page:
+        for line in chain(first, lines):
+            sys.stdout.write(line + '\n')
+        sys.stdout.flush()
+        return
+    sys.stdout.flush()
+    proc = subprocess.Popen(PAGER, stdin=subprocess.PIPE,
+                            encoding='utf-8', errors='replace')
+    try:
+        for line in chain(first, lines):
+            proc.stdin.write(line + '\n')
+        proc.stdin.close()
+    except BrokenPipeError:
+        # quit before the end
+        pass
+    proc.wait()